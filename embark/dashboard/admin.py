@@ -4,9 +4,10 @@ __license__ = 'MIT'
 
 from django.contrib import admin
 
-from dashboard.models import Result, Vulnerability, SoftwareInfo, SoftwareBillOfMaterial
+from dashboard.models import Result, ResultSummary, Vulnerability, SoftwareInfo, SoftwareBillOfMaterial
 
 admin.site.register(Result)
 admin.site.register(Vulnerability)
 admin.site.register(SoftwareInfo)
 admin.site.register(SoftwareBillOfMaterial)
+admin.site.register(ResultSummary)
@@ -3,8 +3,13 @@ __author__ = 'Benedikt Kuehne'
 __license__ = 'MIT'
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from dashboard.models import backfill_cve_counts  # pylint: disable=import-outside-toplevel
+        post_migrate.connect(backfill_cve_counts, sender=self)
@@ -0,0 +1,14 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+from django.core.management.base import BaseCommand
+
+from dashboard.models import ResultSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the aggregated statistics of the main dashboard from all results."
+
+    def handle(self, *args, **options):
+        summary = ResultSummary.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Aggregated {summary.total_firmwares} results"))
@@ -2,15 +2,31 @@ __copyright__ = 'Copyright 2022-2026 Siemens Energy AG'
 __author__ = 'Benedikt Kuehne'
 __license__ = 'MIT'
 
+import builtins
+import json
+import logging
 import os
 import uuid
+from operator import itemgetter
+
 from django.conf import settings
-from django.db import models
+from django.db import DatabaseError, models, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from django.core.validators import MinLengthValidator
 from django.utils import timezone
 
 from uploader.models import FirmwareAnalysis
 
+logger = logging.getLogger(__name__)
+
+CVE_FIELDS = ['cve_critical', 'cve_high', 'cve_medium', 'cve_low']
+# typed copies of the cve fields: <field>_count and <field>_bins
+CVE_COLUMNS = [f"{field}_{kind}" for field in CVE_FIELDS for kind in ('count', 'bins')]
+BACKFILL_BATCH = 500
+SUMMARY_TOP_BINS = 10
+
 
 class Vulnerability(models.Model):
     """
@@ -72,6 +88,15 @@ class Result(models.Model):
     cve_high = models.TextField(default='{}')
     cve_medium = models.TextField(default='{}')
     cve_low = models.TextField(default='{}')
+    # typed cve counts and the number of affected binaries, kept in sync with the fields above
+    cve_critical_count = models.IntegerField(null=True, blank=True)
+    cve_critical_bins = models.IntegerField(null=True, blank=True)
+    cve_high_count = models.IntegerField(null=True, blank=True)
+    cve_high_bins = models.IntegerField(null=True, blank=True)
+    cve_medium_count = models.IntegerField(null=True, blank=True)
+    cve_medium_bins = models.IntegerField(null=True, blank=True)
+    cve_low_count = models.IntegerField(null=True, blank=True)
+    cve_low_bins = models.IntegerField(null=True, blank=True)
     exploits = models.IntegerField(default=0, help_text='')
     metasploit_modules = models.IntegerField(default=0, help_text='')
 
@@ -107,3 +132,236 @@ class Result(models.Model):
 
     vulnerability = models.ManyToManyField(Vulnerability, help_text='CVE/Vulnerability', related_query_name='CVE', editable=True, blank=True)
     sbom = models.OneToOneField(SoftwareBillOfMaterial, help_text='Software Bill of Material', related_query_name='sbom', editable=True, blank=True, on_delete=models.CASCADE, null=True)
+
+    def sync_cve_counts(self):
+        """
+        fills the typed cve columns from the json encoded fields
+        """
+        for field in CVE_FIELDS:
+            count, bins = cve_pair(getattr(self, field))
+            setattr(self, f"{field}_count", count)
+            setattr(self, f"{field}_bins", bins)
+
+
+def cve_pair(value) -> tuple:
+    """
+    (count, binaries) of a cve field, stored as json encoded popitem() tuple like ["614", "17"]
+    """
+    try:
+        count, bins = json.loads(value)
+        return int(count), int(bins)
+    except (TypeError, ValueError):
+        return 0, 0
+
+
+def backfill_cve_counts(plan=None, **kwargs) -> int:
+    """
+    fills the typed cve columns of results stored before they existed (called on post_migrate)
+
+    :param plan: applied migrations, given by the post_migrate signal
+    :return: number of updated results
+    """
+    if plan is not None and not any(migration.app_label == 'dashboard' and not backwards for migration, backwards in plan):
+        # no dashboard migration ran, the columns can't be new
+        return 0
+    unset = Q()
+    for column in CVE_COLUMNS:
+        unset |= Q(**{f"{column}__isnull": True})
+    backfilled = 0
+    try:
+        while True:
+            batch = list(Result.objects.filter(unset).only('pk', *CVE_FIELDS)[:BACKFILL_BATCH])
+            if not batch:
+                break
+            for result in batch:
+                result.sync_cve_counts()
+            Result.objects.bulk_update(batch, CVE_COLUMNS)
+            backfilled += len(batch)
+    except DatabaseError as error:
+        logger.error("Backfill of the cve counts failed: %s", error)
+    if backfilled:
+        logger.info("Backfilled the cve counts of %d results", backfilled)
+    return backfilled
+
+
+def bin_counts(value) -> dict:
+    try:
+        return {key: int(count) for key, count in json.loads(value).items()}
+    except (TypeError, ValueError, AttributeError):
+        return {}
+
+
+def summary_fields() -> list:
+    """
+    numeric fields of Result that are summed up for the main dashboard
+    """
+    return [
+        field.name for field in Result._meta.concrete_fields
+        if isinstance(field, (models.IntegerField, models.FloatField, models.BooleanField)) and field.name not in CVE_COLUMNS
+    ] + CVE_FIELDS
+
+
+def result_contribution(result) -> dict:
+    """
+    the part of a single result in the ResultSummary
+    """
+    sums = {}
+    for field in summary_fields():
+        if field in CVE_FIELDS:
+            value = getattr(result, f"{field}_count")
+            sums[field] = value if value is not None else cve_pair(getattr(result, field))[0]
+        else:
+            sums[field] = getattr(result, field) or 0
+    return {
+        'sums': sums,
+        # same keys as json renders them
+        'os_verified': result.os_verified if result.os_verified is not None else 'null',
+        'architecture_verified': result.architecture_verified if result.architecture_verified is not None else 'null',
+        'strcpy_bins': bin_counts(result.strcpy_bin),
+        'system_bins': bin_counts(result.system_bin),
+    }
+
+
+def _count(counter, key, delta):
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+class ResultSummary(models.Model):
+    """
+    Materialized aggregate of all Result objects for the main dashboard (single row)
+    Kept up to date by the Result signals, rebuilt with ./manage.py rebuild_result_summary
+    """
+    SUMMARY_ID = 1
+
+    total_firmwares = models.IntegerField(default=0)
+    sums = models.JSONField(default=dict)
+    os_verified = models.JSONField(default=dict)
+    architecture_verified = models.JSONField(default=dict)
+    strcpy_bins = models.JSONField(default=dict)
+    system_bins = models.JSONField(default=dict)
+    updated = models.DateTimeField(auto_now=True)
+
+    def add(self, contribution, sign=1):
+        self.total_firmwares += sign
+        for field, value in contribution['sums'].items():
+            self.sums[field] = self.sums.get(field, 0) + sign * value
+        _count(self.os_verified, contribution['os_verified'], sign)
+        _count(self.architecture_verified, contribution['architecture_verified'], sign)
+        for key, value in contribution['strcpy_bins'].items():
+            _count(self.strcpy_bins, key, sign * value)
+        for key, value in contribution['system_bins'].items():
+            _count(self.system_bins, key, sign * value)
+
+    @classmethod
+    def apply(cls, old=None, new=None):
+        """
+        replaces the contribution of one result, nothing to do before the first rebuild
+
+        :param old: contribution to remove
+        :param new: contribution to add
+        """
+        with transaction.atomic():
+            summary = cls.objects.select_for_update().filter(pk=cls.SUMMARY_ID).first()
+            if summary is None:
+                return
+            if old is not None:
+                summary.add(old, -1)
+            if new is not None:
+                summary.add(new)
+            summary.save()
+
+    @classmethod
+    def rebuild(cls):
+        """
+        aggregates all results from scratch, sums and histograms are computed by the database
+
+        :return: ResultSummary
+        """
+        backfill_cve_counts()
+        aggregates = {'total_firmwares': Count('pk')}
+        for field in summary_fields():
+            if field in CVE_FIELDS:
+                aggregates[field] = Sum(f"{field}_count")
+            elif isinstance(Result._meta.get_field(field), models.BooleanField):
+                aggregates[field] = Count('pk', filter=Q(**{field: True}))
+            else:
+                aggregates[field] = Sum(field)
+        with transaction.atomic():
+            cls.objects.get_or_create(pk=cls.SUMMARY_ID)
+            summary = cls.objects.select_for_update().get(pk=cls.SUMMARY_ID)
+            totals = Result.objects.aggregate(**aggregates)
+            summary.total_firmwares = totals.pop('total_firmwares')
+            summary.sums = {field: value or 0 for field, value in totals.items()}
+            for histogram in ('os_verified', 'architecture_verified'):
+                setattr(summary, histogram, {
+                    (row[histogram] if row[histogram] is not None else 'null'): row['count']
+                    for row in Result.objects.values(histogram).annotate(count=Count('pk')).order_by()
+                })
+            summary.strcpy_bins = {}
+            summary.system_bins = {}
+            for strcpy_bin, system_bin in Result.objects.values_list('strcpy_bin', 'system_bin').iterator():
+                for key, value in bin_counts(strcpy_bin).items():
+                    _count(summary.strcpy_bins, key, value)
+                for key, value in bin_counts(system_bin).items():
+                    _count(summary.system_bins, key, value)
+            summary.save()
+        logger.info("Rebuilt the result summary of %d results", summary.total_firmwares)
+        return summary
+
+    @classmethod
+    def get_summary(cls):
+        summary = cls.objects.filter(pk=cls.SUMMARY_ID).first()
+        return summary if summary is not None else cls.rebuild()
+
+    def data(self) -> dict:
+        """
+        :return: dict in the format of get_accumulated_reports
+        """
+        data = {}
+        for field in summary_fields():
+            field_sum = self.sums.get(field, 0)
+            data[field] = {
+                'sum': field_sum,
+                'count': self.total_firmwares,
+                'mean': field_sum / self.total_firmwares if self.total_firmwares else 0
+            }
+        data['os_verified'] = self.os_verified
+        data['architecture_verified'] = self.architecture_verified
+        data['total_firmwares'] = self.total_firmwares
+        data['top_strcpy_bins'] = dict(sorted(self.strcpy_bins.items(), key=itemgetter(1), reverse=True)[:SUMMARY_TOP_BINS])
+        data['top_system_bins'] = dict(sorted(self.system_bins.items(), key=itemgetter(1), reverse=True)[:SUMMARY_TOP_BINS])
+        return data
+
+
+@receiver(pre_save, sender=Result)
+def result_pre_save(sender, instance, **kwargs):
+    """
+    syncs the typed cve columns and remembers the stored contribution of an updated result
+    """
+    instance.sync_cve_counts()
+    instance.previous_contribution = None
+    if instance._state.adding:  # pylint: disable=protected-access
+        return
+    stored = sender.objects.filter(pk=instance.pk).first()
+    if stored is not None:
+        instance.previous_contribution = result_contribution(stored)
+
+
+@receiver(post_save, sender=Result)
+def result_post_save(sender, instance, **kwargs):
+    try:
+        ResultSummary.apply(getattr(instance, 'previous_contribution', None), result_contribution(instance))
+    except builtins.Exception as error:
+        logger.error("Could not update the result summary with %s: %s", instance.pk, error)
+
+
+@receiver(post_delete, sender=Result)
+def result_post_delete(sender, instance, **kwargs):
+    try:
+        ResultSummary.apply(result_contribution(instance), None)
+    except builtins.Exception as error:
+        logger.error("Could not remove %s from the result summary: %s", instance.pk, error)
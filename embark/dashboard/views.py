@@ -7,7 +7,6 @@ import json
 import logging
 import os
 from pathlib import Path
-import signal
 
 from django.conf import settings
 from django.shortcuts import render
@@ -18,6 +17,7 @@ from django.contrib import messages
 from django.shortcuts import redirect
 
 from embark.helper import user_is_auth
+from embark.logviewer import INDEX_SUFFIX
 from tracker.forms import AssociateForm
 from uploader.boundedexecutor import BoundedExecutor
 from uploader.forms import LabelForm
@@ -72,11 +72,10 @@ def stop_analysis(request):
         try:
             BoundedExecutor.submit_kill(analysis.id)
 
+            # the local process group is signalled by submit_kill
             if analysis.running_on_worker:
                 worker = Worker.objects.get(analysis_id=analysis.id)
                 stop_remote_analysis.delay(worker.id)
-            else:
-                os.killpg(os.getpgid(pid), signal.SIGTERM)  # kill proc group too
 
             form = StopAnalysisForm()
             form.fields['analysis'].queryset = FirmwareAnalysis.objects.filter(user=request.user).filter(finished=False)
@@ -234,7 +233,8 @@ def show_logviewer(request, analysis_id):
     # get the file path
     log_file_path_ = f"{Path(analysis.path_to_logs).parent}/emba_run.log"
     if os.path.isfile(log_file_path_):
-        if os.path.getsize(log_file_path_) > 10000000:  # bigger than 10MB
+        # only the first viewer has to build the line index
+        if not os.path.isfile(log_file_path_ + INDEX_SUFFIX) and os.path.getsize(log_file_path_) > 10000000:  # bigger than 10MB
             messages.info(request, "The Log is very big, give it some time to open")
         return render(request, 'dashboard/logViewer.html', {'analysis_id': analysis_id, 'username': request.user.username})
     messages.error(request, "File is not yet available")
@@ -263,7 +263,6 @@ def delete_analysis(request, analysis_id):
         if not analysis.finished:
             try:
                 BoundedExecutor.submit_kill(analysis.id)
-                os.killpg(os.getpgid(analysis.pid), signal.SIGTERM)  # kill proc group too
             except builtins.Exception as error:
                 logger.error("Error %s when stopping", error)
                 messages.error(request, 'Error when stopping Analysis')
@@ -8,14 +8,32 @@ import logging
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from uploader.models import FirmwareAnalysis
 
 logger = logging.getLogger(__name__)
 
+PROGRESS_PROTOCOL_VERSION = 2
+
 
 # consumer class for synchronous/asynchronous websocket communication
 class ProgressConsumer(AsyncWebsocketConsumer):
+    """
+    Progress of the analyses of a user
+
+    protocol (version 2):
+        client -> {"version": 2, "action": "subscribe", "cursor": <cursor of the last snapshot or null>}
+        server -> {"version": 2, "type": "snapshot", "cursor": <cursor>, "analyses": {<id>: <status>}}
+                  all analyses without cursor, otherwise only running analyses and analyses changed since the cursor
+        server -> {"version": 2, "type": "delta", "analyses": {<id>: <status>}}
+                  every following status change
+    legacy clients send "Reload" and get the status of all analyses as {<id>: <status>}
+    """
+
+    protocol_version = 1
 
     @database_sync_to_async
     def get_message(self):
@@ -28,6 +46,29 @@ class ProgressConsumer(AsyncWebsocketConsumer):
             return message
         return "Please Wait"
 
+    @database_sync_to_async
+    def get_snapshot(self, cursor):
+        """
+        status of all analyses (same set as the legacy protocol), with a cursor
+        only the running analyses and the ones changed since the cursor
+            :param cursor: datetime of the last snapshot or None
+            :return: snapshot message
+        """
+        new_cursor = timezone.now()
+        analysis_list = FirmwareAnalysis.objects.filter(user=self.scope['user']).exclude(failed=True)
+        if cursor is not None:
+            # the client already shows everything older
+            analysis_list = analysis_list.filter(Q(finished=False) | Q(status_updated__gt=cursor))
+        analysis_list = analysis_list.values_list('id', 'status')
+        analyses = {str(analysis_id): status for analysis_id, status in analysis_list}
+        logger.debug("Snapshot for user %s since %s contains %d analyses", self.scope['user'], cursor, len(analyses))
+        return {
+            "version": PROGRESS_PROTOCOL_VERSION,
+            "type": "snapshot",
+            "cursor": new_cursor.isoformat(),
+            "analyses": analyses,
+        }
+
     # this method is executed when the connection to the frontend is established
     async def connect(self):
         logger.info("WS - connect")
@@ -45,8 +86,24 @@ class ProgressConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data=None, bytes_data=None):
         logger.info("WS - receive")
         if text_data == "Reload":
-            # Send message to room group
-            await self.channel_layer.group_send(self.room_group_name, {"type": 'send.message', "message": await self.get_message()})
+            # legacy client, only answer this connection
+            self.protocol_version = 1
+            await self.send(json.dumps(await self.get_message(), sort_keys=False))
+            return
+        try:
+            request = json.loads(text_data)
+        except (TypeError, ValueError):
+            logger.error("WS - invalid message: %s", text_data)
+            return
+        if not isinstance(request, dict) or request.get("action") != "subscribe":
+            logger.error("WS - unknown request: %s", text_data)
+            return
+        self.protocol_version = PROGRESS_PROTOCOL_VERSION
+        try:
+            cursor = parse_datetime(request["cursor"]) if isinstance(request.get("cursor"), str) else None
+        except ValueError:
+            cursor = None
+        await self.send(json.dumps(await self.get_snapshot(cursor), sort_keys=False))
 
     # called when websocket connection is closed
     async def disconnect(self, code):
@@ -59,5 +116,11 @@ class ProgressConsumer(AsyncWebsocketConsumer):
         message = event['message']
         # logger.info(f"WS - send message: " + str(message))
         logger.info("WS - send message")
+        if self.protocol_version >= PROGRESS_PROTOCOL_VERSION:
+            message = {
+                "version": PROGRESS_PROTOCOL_VERSION,
+                "type": "delta",
+                "analyses": message,
+            }
         # Send message to WebSocket
         await self.send(json.dumps(message, sort_keys=False))
@@ -4,6 +4,8 @@ __license__ = 'MIT'
 
 import re
 import socket
+import threading
+import time
 from random import randrange
 import os
 from pathlib import Path
@@ -12,8 +14,15 @@ from git import Repo, GitError
 import docker
 from docker.errors import ImageNotFound, DockerException
 import logging
+import mimetypes
 
 from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+FILE_CHUNK_SIZE = 1 << 16
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
 def rnd_rgb_color():
@@ -115,6 +124,201 @@ def count_emba_modules(module_dict):
     return s_module_cnt, p_module_cnt, q_module_cnt, l_module_cnt, f_module_cnt, d_module_cnt
 
 
+# used whenever there is no EMBA installation to read the modules from
+EMBA_MODULES_FALLBACK = {
+    'D_Modules': [
+        ('d10', 'D10_firmware_diffing'),
+        ('d02', 'D02_firmware_diffing_bin_details'),
+        ('d05', 'D05_firmware_diffing_extractor')
+    ],
+    'F_Modules': [
+        ('f02', 'F02_toolchain'),
+        ('f50', 'F50_base_aggregator'),
+        ('f15', 'F15_cyclonedx_sbom'),
+        ('f05', 'F05_qs_resolver'),
+        ('f10', 'F10_license_summary'),
+        ('f20', 'F20_vul_aggregator')
+    ],
+    'L_Modules': [
+        ('l99', 'L99_cleanup'),
+        ('l35', 'L35_metasploit_check'),
+        ('l10', 'L10_system_emulation'),
+        ('l23', 'L23_vnc_checks'),
+        ('l25', 'L25_web_checks'),
+        ('l20', 'L20_snmp_checks'),
+        ('l22', 'L22_upnp_hnap_checks'),
+        ('l15', 'L15_emulated_checks_nmap')
+    ],
+    'P_Modules': [
+        ('p15', 'P15_ubi_extractor'),
+        ('p60', 'P60_deep_extractor'),
+        ('p02', 'P02_firmware_bin_file_check'),
+        ('p35', 'P35_UEFI_extractor'),
+        ('p14', 'P14_ext_mounter'),
+        ('p07', 'P07_windows_exe_extract'),
+        ('p25', 'P25_android_ota'),
+        ('p18', 'P18_BMC_decryptor'),
+        ('p99', 'P99_prepare_analyzer'),
+        ('p50', 'P50_binwalk_extractor'),
+        ('p20', 'P20_foscam_decryptor'),
+        ('p40', 'P40_DJI_extractor'),
+        ('p22', 'P22_Zyxel_zip_decrypt'),
+        ('p17', 'P17_gpg_decompress'),
+        ('p65', 'P65_package_extractor'),
+        ('p21', 'P21_buffalo_decryptor'),
+        ('p19', 'P19_bsd_ufs_mounter'),
+        ('p23', 'P23_qemu_qcow_mounter'),
+        ('p55', 'P55_unblob_extractor'),
+        ('p10', 'P10_vmdk_extractor')
+    ],
+    'Q_Modules': [('q02', 'Q02_openai_question')],
+    'S_Modules': [
+        ('s100', 'S100_command_inj_check'),
+        ('s99', 'S99_grepit'),
+        ('s90', 'S90_mail_check'),
+        ('s03', 'S03_firmware_bin_base_analyzer'),
+        ('s20', 'S20_shell_check'),
+        ('s02', 'S02_UEFI_FwHunt'),
+        ('s45', 'S45_pass_file_check'),
+        ('s12', 'S12_binary_protection'),
+        ('s23', 'S23_lua_check'),
+        ('s110', 'S110_yara_check'),
+        ('s60', 'S60_cert_file_check'),
+        ('s35', 'S35_http_file_check'),
+        ('s24', 'S24_kernel_bin_identifier'),
+        ('s16', 'S16_ghidra_decompile_checks'),
+        ('s50', 'S50_authentication_check'),
+        ('s108', 'S108_stacs_password_search'),
+        ('s21', 'S21_python_check'),
+        ('s109', 'S109_jtr_local_pw_cracking'),
+        ('s17', 'S17_cwe_checker'),
+        ('s25', 'S25_kernel_check'),
+        ('s09', 'S09_firmware_base_version_check'),
+        ('s65', 'S65_config_file_check'),
+        ('s18', 'S18_capa_checker'),
+        ('s36', 'S36_lighttpd'),
+        ('s05', 'S05_firmware_details'),
+        ('s115', 'S115_usermode_emulator'),
+        ('s55', 'S55_history_file_check'),
+        ('s27', 'S27_perl_check'),
+        ('s80', 'S80_cronjob_check'),
+        ('s19', 'S19_apk_check'),
+        ('s95', 'S95_interesting_files_check'),
+        ('s75', 'S75_network_check'),
+        ('s106', 'S106_deep_key_search'),
+        ('s107', 'S107_deep_password_search'),
+        ('s15', 'S15_radare_decompile_checks'),
+        ('s07', 'S07_bootloader_check'),
+        ('s22', 'S22_php_check'),
+        ('s26', 'S26_kernel_vuln_verifier'),
+        ('s85', 'S85_ssh_check'),
+        ('s10', 'S10_binaries_basic_check'),
+        ('s13', 'S13_weak_func_check'),
+        ('s08', 'S08_main_package_sbom'),
+        ('s40', 'S40_weak_perm_check'),
+        ('s118', 'S118_busybox_verifier'),
+        ('s14', 'S14_weak_func_radare_check'),
+        ('s116', 'S116_qemu_version_detection'),
+        ('s04', 'S04_windows_basic_analysis'),
+        ('s06', 'S06_distribution_identification')
+    ]
+}
+
+
+class EmbaModuleRegistry:
+    """
+    Caches the module catalog of an EMBA installation
+    The modules directory is only parsed again when its mtime or the git HEAD of EMBA changed,
+    that check itself runs at most every CHECK_INTERVAL seconds
+    """
+    CHECK_INTERVAL = 60     # s
+
+    def __init__(self, emba_dir_path=None):
+        self.emba_dir_path = emba_dir_path
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.last_check = None
+        self.module_dict = None
+        self.module_counts = None
+
+    def get_emba_dir_path(self):
+        return self.emba_dir_path or settings.EMBA_ROOT
+
+    def get_stamp(self):
+        """
+        mtime of the modules directory and of the git HEAD (plus the branch it points to)
+        """
+        emba_dir_path = self.get_emba_dir_path()
+        stamp = [os.stat(f"{emba_dir_path}/modules").st_mtime_ns]
+        head_path = f"{emba_dir_path}/.git/HEAD"
+        try:
+            stamp.append(os.stat(head_path).st_mtime_ns)
+            with open(head_path, 'r', encoding='UTF-8') as head_file:
+                head = head_file.read().strip()
+            if head.startswith("ref: "):
+                stamp.append(os.stat(f"{emba_dir_path}/.git/{head[5:]}").st_mtime_ns)
+        except OSError:
+            # no git checkout (or packed refs only)
+            pass
+        return tuple(stamp)
+
+    def refresh(self, force=False):
+        """
+        re-reads the catalog if it is stale
+            :param force: skip the CHECK_INTERVAL throttling
+        """
+        with self.lock:
+            now = time.monotonic()
+            if not force and self.last_check is not None and now - self.last_check < self.CHECK_INTERVAL:
+                return
+            self.last_check = now
+            try:
+                stamp = self.get_stamp()
+                if stamp == self.stamp and self.module_dict is not None:
+                    return
+                module_dict = get_emba_modules(self.get_emba_dir_path())
+            except FileNotFoundError:
+                if self.module_dict is not EMBA_MODULES_FALLBACK:
+                    logging.warning("No EMBA modules found in %s, using fallback module list", self.get_emba_dir_path())
+                stamp = None
+                module_dict = EMBA_MODULES_FALLBACK
+            self.stamp = stamp
+            self.module_dict = module_dict
+            self.module_counts = count_emba_modules(module_dict)
+
+    def invalidate(self):
+        """
+        forces a re-read on the next access (e.g. after an EMBA update)
+        """
+        with self.lock:
+            self.last_check = None
+            self.stamp = None
+
+    def modules(self) -> dict:
+        """
+        same structure as get_emba_modules(), must not be modified by the caller
+        """
+        self.refresh()
+        return self.module_dict
+
+    def counts(self):
+        """
+        same as count_emba_modules(self.modules())
+        """
+        self.refresh()
+        return self.module_counts
+
+    def module_choices(self):
+        """
+        choices for the scan_modules selection
+        """
+        module_dict = self.modules()
+        return module_dict['F_Modules'] + module_dict['L_Modules'] + module_dict['P_Modules'] + module_dict['S_Modules'] + module_dict['Q_Modules']
+
+
+emba_module_registry = EmbaModuleRegistry()
+
+
 def get_version_strings():
     if Path(f"{settings.BASE_DIR}/VERSION.txt").exists():
         with open(Path(f"{settings.BASE_DIR}/VERSION.txt"), 'r', encoding='UTF-8') as embark_version_file:
@@ -302,6 +506,97 @@ def is_ip_local_host(ip_address: str) -> bool:
         return False
 
 
+def _file_range(range_header, size):
+    """
+    parses a single byte range, multiple ranges are answered with the whole file
+
+    :return: (first, last) byte, None for the whole file or False if not satisfiable
+    """
+    match = RANGE_PATTERN.match(range_header.replace(" ", ""))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0:
+            return False
+        # suffix range, the last n bytes
+        return max(0, size - int(last)), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return False
+    return first, last
+
+
+def _read_range(file_path, first, last):
+    with open(file_path, 'rb') as file_:
+        file_.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = file_.read(min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, file_path, content_type=None, filename=None, as_attachment=False, max_age=None):
+    """
+    streams a file with ETag/Last-Modified (304) and single byte range (206) support,
+    hands the transfer to the front end if EMBARK_SENDFILE is set
+
+    :param request: HTTP request
+    :param file_path: path of the file, has to be checked by the caller
+    :param content_type: defaults to the guessed type
+    :param filename: name for the Content-Disposition header
+    :param as_attachment: download instead of inline
+    :param max_age: seconds the browser may cache the file without revalidation
+    :return: response, raises FileNotFoundError
+    """
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    etag = f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = http_date(stat.st_mtime)
+    content_type = content_type or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        byte_range = None
+        range_header = request.headers.get('Range')
+        if range_header and request.method == 'GET':
+            if_range = request.headers.get('If-Range')
+            if if_range is None or if_range == etag or parse_http_date_safe(if_range) == int(stat.st_mtime):
+                byte_range = _file_range(range_header, stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif getattr(settings, 'EMBARK_SENDFILE', '') and byte_range is None:
+            # apache (mod_xsendfile) or nginx send the file and answer ranges themselves
+            response = HttpResponse(content_type=content_type)
+            if settings.EMBARK_SENDFILE == 'x-accel-redirect':
+                relative_path = os.path.relpath(file_path, settings.EMBARK_SENDFILE_ROOT)
+                response['X-Accel-Redirect'] = settings.EMBARK_SENDFILE_URL + relative_path
+            else:
+                response['X-Sendfile'] = file_path
+        elif byte_range is not None:
+            first, last = byte_range
+            response = StreamingHttpResponse(_read_range(file_path, first, last), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {first}-{last}/{stat.st_size}'
+            response['Content-Length'] = str(last - first + 1)
+        else:
+            # the wsgi file wrapper lets mod_wsgi send the file without copying it through python
+            response = FileResponse(open(file_path, 'rb'), content_type=content_type)   # pylint: disable=consider-using-with
+        if filename is not None:
+            disposition = 'attachment' if as_attachment else 'inline'
+            response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    if max_age is not None:
+        patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
 if __name__ == '__main__':
     # import pprint
     # TEST_STRING = 'Linux / v2.6.33.2'
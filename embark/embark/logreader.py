@@ -5,24 +5,26 @@ __author__ = 'Benedikt Kuehne, m-1-k-3, diegiesskanne, Maximilian Wagner, Garima
 __license__ = 'MIT'
 
 import builtins
-import difflib
-import pathlib
+import json
+import os
 import re
+import threading
 import time
 import logging
 
-import rx
-import rx.operators as ops
+from dataclasses import dataclass
 
 from inotify_simple import INotify, flags
 from asgiref.sync import async_to_sync
 
 from channels.layers import get_channel_layer
 from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
 from django.utils import timezone
 
-from uploader.models import FirmwareAnalysis
-from embark.helper import count_emba_modules, get_emba_modules
+from uploader.models import AnalysisProgressEvent, FirmwareAnalysis
+from embark.helper import emba_module_registry
 
 
 logger = logging.getLogger(__name__)
@@ -34,27 +36,229 @@ EMBA_S_PHASE = 1
 EMBA_L_PHASE = 2
 EMBA_F_PHASE = 3
 
+# log events, same values as the AnalysisProgressEvent types
+EVENT_PHASE = AnalysisProgressEvent.PHASE
+EVENT_MODULE_FINISHED = AnalysisProgressEvent.MODULE_FINISHED
+EVENT_FAILED = AnalysisProgressEvent.FAILED
+EVENT_TEST_ENDED = AnalysisProgressEvent.TEST_ENDED
+
+COLOR_PATTERN = re.compile(r"\x1b\[.{1,5}m")
+STATUS_PATTERN = re.compile(r"\[\*\]*")
+PHASE_PATTERN = re.compile(r"\[\!\]*")
+Q_MODULE_PATTERN = re.compile(r"Q[0-9][0-9]")
+D_MODULE_PATTERN = re.compile(r"D[0-9][0-9]")
+TEST_ENDED_MARKER = "Test ended"
+FAILED_MARKER = "EMBA failed in docker mode!"
+
+
+@dataclass
+class LogEvent:
+    kind: str
+    text: str       # phase message or name of the finished module
+
+
+def classify_lines(lines):
+    """
+    Turns emba.log lines into LogEvents, lines without meaning for the progress are skipped
+    Works on any iterable of lines, e.g. the output of LogTail.read().splitlines() or an open emba.log
+        :param lines: iterable of log lines
+        :return: generator of LogEvent
+    """
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if "\x1b" in line:
+            line = COLOR_PATTERN.sub('', line)
+        if STATUS_PATTERN.match(line):
+            # [*] <date> - <module> finished
+            message = line.split("- ")
+            if len(message) < 2:
+                continue
+            message = message[1].split(" ")
+            if len(message) > 1 and message[1] == 'finished':
+                yield LogEvent(EVENT_MODULE_FINISHED, message[0])
+        elif PHASE_PATTERN.match(line):
+            # [!] <phase message>
+            message = line.split(" ", 1)
+            if len(message) < 2 or not message[1]:
+                continue
+            if TEST_ENDED_MARKER in message[1]:
+                yield LogEvent(EVENT_TEST_ENDED, message[1])
+            elif FAILED_MARKER in message[1]:
+                yield LogEvent(EVENT_FAILED, message[1])
+            else:
+                yield LogEvent(EVENT_PHASE, message[1])
+
+
+class LogTail:
+    """
+    Incremental tail of a growing log file
+    Only the bytes appended since the last read are consumed, the position is kept
+    in a small checkpoint file (inode + byte offset) so a restarted reader continues where it stopped.
+    The checkpoint is written by the caller once the lines are processed, at most every CHECKPOINT_INTERVAL
+    """
+    CHECKPOINT_INTERVAL = 1.0   # s
+
+    def __init__(self, path, checkpoint_path=None):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.inode = None
+        self.offset = 0
+        self.saved = None       # (inode, offset) of the checkpoint file
+        self.last_save = None
+        self.load_checkpoint()
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.isfile(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            self.inode = checkpoint["inode"]
+            self.offset = int(checkpoint["offset"])
+            self.saved = (self.inode, self.offset)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logger.error("Ignoring unreadable checkpoint %s: %s", self.checkpoint_path, error)
+            self.inode = None
+            self.offset = 0
+
+    def save_checkpoint(self, force=False):
+        """
+        stores the current position, a failed write is retried with the next call
+            :param force: ignore CHECKPOINT_INTERVAL
+        """
+        if not self.checkpoint_path or self.saved == (self.inode, self.offset):
+            return
+        if not force and self.last_save is not None and time.monotonic() - self.last_save < self.CHECKPOINT_INTERVAL:
+            return
+        self.last_save = time.monotonic()
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as checkpoint_file:
+                json.dump({"inode": self.inode, "offset": self.offset}, checkpoint_file)
+            os.replace(tmp_path, self.checkpoint_path)
+        except OSError as error:
+            logger.error("Could not save checkpoint %s: %s", self.checkpoint_path, error)
+            return
+        self.saved = (self.inode, self.offset)
+
+    def read(self):
+        """
+        Reads all complete lines appended since the last call
+        A trailing line without newline is left in the file until it is completed
+            :return: new text (may be empty)
+        """
+        try:
+            with open(self.path, 'rb') as log_file:
+                stat = os.fstat(log_file.fileno())
+                if stat.st_ino != self.inode:
+                    # first read or the log got rotated/replaced
+                    if self.inode is not None:
+                        logger.info("Log %s was replaced, reading from the start", self.path)
+                    self.inode = stat.st_ino
+                    self.offset = 0
+                elif stat.st_size < self.offset:
+                    logger.info("Log %s was truncated, reading from the start", self.path)
+                    self.offset = 0
+                if stat.st_size == self.offset:
+                    return ""
+                log_file.seek(self.offset)
+                data = log_file.read(stat.st_size - self.offset)
+        except FileNotFoundError:
+            return ""
+        end = data.rfind(b'\n')
+        if end < 0:
+            return ""
+        data = data[:end + 1]
+        self.offset += len(data)
+        return data.decode('utf-8', errors='replace')
+
+
+class ProgressPublisher:
+    """
+    Coalesces the status updates of an analysis
+    The status is written to the db and sent to the websocket group at most every FLUSH_INTERVAL,
+    phase changes and the end of the analysis are sent right away
+    """
+    FLUSH_INTERVAL = 1.0    # s
+
+    def __init__(self, analysis, room_group_name):
+        self.analysis = analysis
+        self.room_group_name = room_group_name
+        self.channel_layer = get_channel_layer()
+        self.dirty = False
+        self.last_flush = None
+        self.events = []
+
+    def due(self):
+        return self.last_flush is None or time.monotonic() - self.last_flush >= self.FLUSH_INTERVAL
+
+    def publish(self, urgent=False, event=None):
+        """
+        marks the status as changed, flushes if urgent or the last flush is long enough ago
+            :param event: AnalysisProgressEvent to store with the next flush
+        """
+        self.dirty = True
+        if event is not None:
+            self.events.append(event)
+        if urgent or self.due():
+            self.flush()
+
+    def tick(self):
+        """
+        flushes changes held back by publish(), called periodically by the LogFollower
+        """
+        if self.dirty and self.due():
+            self.flush()
+
+    def flush(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        events, self.events = self.events, []
+        if events:
+            AnalysisProgressEvent.objects.bulk_create(events)
+        if self.analysis.status.get("finished"):
+            self.analysis.save(update_fields=["status"], force_update=True)
+        else:
+            self.analysis.save(update_fields=["status"])
+        logger.debug("Checking status: %s", self.analysis.status)
+        # send it to group
+        async_to_sync(self.channel_layer.group_send)(
+            self.room_group_name, {
+                "type": 'send.message',
+                "message": {str(self.analysis.id): self.analysis.status}
+            }
+        )
+
 
 class LogReader:
+    """
+    Parses the emba.log of a single analysis into status updates
+    The lines are fed by the LogFollower, see LogFollower.follow()
+    """
     def __init__(self, firmware_id):
 
         # global module count and status_msg directory
         self.module_cnt = 0
         self.firmware_id = firmware_id
         self.firmware_id_str = str(self.firmware_id)
+
+        # variables for cleanup
+        self.finish = False
+
         try:
             self.analysis = FirmwareAnalysis.objects.get(id=self.firmware_id)
         except FirmwareAnalysis.DoesNotExist:
             logger.error("No Analysis with this id (%s)", self.firmware_id_str)
+            self.analysis = None
+            self.finish = True
+            return
 
         # set variables for channels communication
         self.user = self.analysis.user
         self.room_group_name = f"services_{self.user}"
-        self.channel_layer = get_channel_layer()
-
-        # variables for cleanup
-        self.finish = False
-        # self.wd = None
+        self.publisher = ProgressPublisher(self.analysis, self.room_group_name)
 
         # status update dict (appended to db)
         self.status_msg = {
@@ -63,14 +267,20 @@ class LogReader:
             "phase": "",
         }
 
-        # start processing
-        time.sleep(10)   # embas dep-check takes some time
-        if self.analysis:
-            self.read_loop()
-        else:
-            self.cleanup()
+        # continue where a previous reader stopped (e.g. before a restart)
+        self.status_msg["percentage"] = self.analysis.status.get("percentage", 0)
+        self.status_msg["module"] = self.analysis.status.get("last_module", "")
+        self.status_msg["phase"] = self.analysis.status.get("last_phase", "")
+        last_phase_event = AnalysisProgressEvent.objects.filter(analysis=self.analysis, event_type=EVENT_PHASE).order_by('-id').first()
+        if last_phase_event is not None:
+            self.module_cnt = AnalysisProgressEvent.objects.filter(
+                analysis=self.analysis, event_type=EVENT_MODULE_FINISHED, id__gt=last_phase_event.id
+            ).count()
+
+        self.emba_log_path = f"{self.analysis.path_to_logs}/emba.log"
+        self.log_tail = LogTail(self.emba_log_path, f"{settings.EMBA_LOG_ROOT}/{self.firmware_id}/logreader.offset")
 
-    def save_status(self):
+    def save_status(self, event_type):
         logger.debug("Appending status with message: %s", self.status_msg)
         # append message to the json-field structure of the analysis
         self.analysis.status["percentage"] = self.status_msg["percentage"]
@@ -79,22 +289,34 @@ class LogReader:
         if self.status_msg["module"] != self.analysis.status["last_module"]:
             self.analysis.status["last_module"] = self.status_msg["module"]
             self.analysis.status["module_list"].append(self.status_msg["module"])
+        urgent = False
         if self.status_msg["phase"] != self.analysis.status["last_phase"]:
             self.analysis.status["last_phase"] = self.status_msg["phase"]
             self.analysis.status["phase_list"].append(self.status_msg["phase"])
+            urgent = True
         if self.status_msg["percentage"] == 100:
             self.analysis.status["finished"] = True
-            self.analysis.save(update_fields=["status"], force_update=True)
-        else:
-            self.analysis.save(update_fields=["status"])
-        logger.debug("Checking status: %s", self.analysis.status)
-        # send it to group
-        async_to_sync(self.channel_layer.group_send)(
-            self.room_group_name, {
-                "type": 'send.message',
-                "message": {str(self.analysis.id): self.analysis.status}
-            }
+            urgent = True
+        event = AnalysisProgressEvent(
+            analysis=self.analysis,
+            event_type=event_type,
+            phase=self.status_msg["phase"][:255],
+            module=self.status_msg["module"][:100],
+            percentage=self.status_msg["percentage"]
         )
+        self.publisher.publish(urgent=urgent, event=event)
+
+    def tick(self):
+        """
+        Sends status changes that got held back
+        """
+        self.publisher.tick()
+        self.save_checkpoint()
+
+    def save_checkpoint(self, force=False):
+        # the log position must not run ahead of the stored status
+        if not self.publisher.dirty:
+            self.log_tail.save_checkpoint(force)
 
     @staticmethod
     def phase_identify(status_message):
@@ -104,129 +326,27 @@ class LogReader:
         simulation_phase_pattern = "System emulation phase"     # L-Modules
         reporting_phase_pattern = "Reporting phase"             # P-Modules
         done_pattern = "Test ended on"
-        failed_pattern = "EMBA failed in docker mode!"
-        try:
-            emba_module_dict = get_emba_modules(settings.EMBA_ROOT)
-        except FileNotFoundError:
-            emba_module_dict = {
-                'D_Modules': [
-                    ('d10', 'D10_firmware_diffing'),
-                    ('d02', 'D02_firmware_diffing_bin_details'),
-                    ('d05', 'D05_firmware_diffing_extractor')
-                ],
-                'F_Modules': [
-                    ('f02', 'F02_toolchain'),
-                    ('f50', 'F50_base_aggregator'),
-                    ('f15', 'F15_cyclonedx_sbom'),
-                    ('f05', 'F05_qs_resolver'),
-                    ('f10', 'F10_license_summary'),
-                    ('f20', 'F20_vul_aggregator')
-                ],
-                'L_Modules': [
-                    ('l99', 'L99_cleanup'),
-                    ('l35', 'L35_metasploit_check'),
-                    ('l10', 'L10_system_emulation'),
-                    ('l23', 'L23_vnc_checks'),
-                    ('l25', 'L25_web_checks'),
-                    ('l20', 'L20_snmp_checks'),
-                    ('l22', 'L22_upnp_hnap_checks'),
-                    ('l15', 'L15_emulated_checks_nmap')
-                ],
-                'P_Modules': [
-                    ('p15', 'P15_ubi_extractor'),
-                    ('p60', 'P60_deep_extractor'),
-                    ('p02', 'P02_firmware_bin_file_check'),
-                    ('p35', 'P35_UEFI_extractor'),
-                    ('p14', 'P14_ext_mounter'),
-                    ('p07', 'P07_windows_exe_extract'),
-                    ('p25', 'P25_android_ota'),
-                    ('p18', 'P18_BMC_decryptor'),
-                    ('p99', 'P99_prepare_analyzer'),
-                    ('p50', 'P50_binwalk_extractor'),
-                    ('p20', 'P20_foscam_decryptor'),
-                    ('p40', 'P40_DJI_extractor'),
-                    ('p22', 'P22_Zyxel_zip_decrypt'),
-                    ('p17', 'P17_gpg_decompress'),
-                    ('p65', 'P65_package_extractor'),
-                    ('p21', 'P21_buffalo_decryptor'),
-                    ('p19', 'P19_bsd_ufs_mounter'),
-                    ('p23', 'P23_qemu_qcow_mounter'),
-                    ('p55', 'P55_unblob_extractor'),
-                    ('p10', 'P10_vmdk_extractor')
-                ],
-                'Q_Modules': [('q02', 'Q02_openai_question')],
-                'S_Modules': [
-                    ('s100', 'S100_command_inj_check'),
-                    ('s99', 'S99_grepit'),
-                    ('s90', 'S90_mail_check'),
-                    ('s03', 'S03_firmware_bin_base_analyzer'),
-                    ('s20', 'S20_shell_check'),
-                    ('s02', 'S02_UEFI_FwHunt'),
-                    ('s45', 'S45_pass_file_check'),
-                    ('s12', 'S12_binary_protection'),
-                    ('s23', 'S23_lua_check'),
-                    ('s110', 'S110_yara_check'),
-                    ('s60', 'S60_cert_file_check'),
-                    ('s35', 'S35_http_file_check'),
-                    ('s24', 'S24_kernel_bin_identifier'),
-                    ('s16', 'S16_ghidra_decompile_checks'),
-                    ('s50', 'S50_authentication_check'),
-                    ('s108', 'S108_stacs_password_search'),
-                    ('s21', 'S21_python_check'),
-                    ('s109', 'S109_jtr_local_pw_cracking'),
-                    ('s17', 'S17_cwe_checker'),
-                    ('s25', 'S25_kernel_check'),
-                    ('s09', 'S09_firmware_base_version_check'),
-                    ('s65', 'S65_config_file_check'),
-                    ('s18', 'S18_capa_checker'),
-                    ('s36', 'S36_lighttpd'),
-                    ('s05', 'S05_firmware_details'),
-                    ('s115', 'S115_usermode_emulator'),
-                    ('s55', 'S55_history_file_check'),
-                    ('s27', 'S27_perl_check'),
-                    ('s80', 'S80_cronjob_check'),
-                    ('s19', 'S19_apk_check'),
-                    ('s95', 'S95_interesting_files_check'),
-                    ('s75', 'S75_network_check'),
-                    ('s106', 'S106_deep_key_search'),
-                    ('s107', 'S107_deep_password_search'),
-                    ('s15', 'S15_radare_decompile_checks'),
-                    ('s07', 'S07_bootloader_check'),
-                    ('s22', 'S22_php_check'),
-                    ('s26', 'S26_kernel_vuln_verifier'),
-                    ('s85', 'S85_ssh_check'),
-                    ('s10', 'S10_binaries_basic_check'),
-                    ('s13', 'S13_weak_func_check'),
-                    ('s08', 'S08_main_package_sbom'),
-                    ('s40', 'S40_weak_perm_check'),
-                    ('s118', 'S118_busybox_verifier'),
-                    ('s14', 'S14_weak_func_radare_check'),
-                    ('s116', 'S116_qemu_version_detection'),
-                    ('s04', 'S04_windows_basic_analysis'),
-                    ('s06', 'S06_distribution_identification')
-                ]
-            }
-        emba_s_mod_cnt, emba_p_mod_cnt, _emba_q_mod_cnt, emba_l_mod_cnt, emba_f_mod_cnt, _emba_d_mod_cnt = count_emba_modules(emba_module_dict)
+        emba_s_mod_cnt, emba_p_mod_cnt, _emba_q_mod_cnt, emba_l_mod_cnt, emba_f_mod_cnt, _emba_d_mod_cnt = emba_module_registry.counts()
         del _emba_q_mod_cnt, _emba_d_mod_cnt
         # calculate percentage
         max_module = -2
         phase_nmbr = -2
-        if re.search(pattern=re.escape(pre_checker_phase_pattern), string=status_message["phase"]):
+        if pre_checker_phase_pattern in status_message["phase"]:
             max_module = emba_p_mod_cnt
             phase_nmbr = EMBA_P_PHASE
-        elif re.search(pattern=re.escape(testing_phase_pattern), string=status_message["phase"]):
+        elif testing_phase_pattern in status_message["phase"]:
             max_module = emba_s_mod_cnt
             phase_nmbr = EMBA_S_PHASE
-        elif re.search(pattern=re.escape(simulation_phase_pattern), string=status_message["phase"]):
+        elif simulation_phase_pattern in status_message["phase"]:
             max_module = emba_l_mod_cnt
             phase_nmbr = EMBA_L_PHASE
-        elif re.search(pattern=re.escape(reporting_phase_pattern), string=status_message["phase"]):
+        elif reporting_phase_pattern in status_message["phase"]:
             max_module = emba_f_mod_cnt
             phase_nmbr = EMBA_F_PHASE
-        elif re.search(pattern=re.escape(done_pattern), string=status_message["phase"]):
+        elif done_pattern in status_message["phase"]:
             max_module = 0
             phase_nmbr = EMBA_PHASE_CNT
-        elif re.search(pattern=re.escape(failed_pattern), string=status_message["phase"]):
+        elif FAILED_MARKER in status_message["phase"]:
             max_module = -1
             phase_nmbr = EMBA_PHASE_CNT
         else:
@@ -235,7 +355,7 @@ class LogReader:
         return max_module, phase_nmbr
 
     # update our dict whenever a new module is being processed
-    def update_status(self, stream_item_list):
+    def update_status(self, module):
         percentage = 0
         max_module, phase_nmbr = self.phase_identify(self.status_msg)
         if max_module == 0:
@@ -256,183 +376,286 @@ class LogReader:
         logger.debug("Status is %d, in phase %d, with modules %d", percentage, phase_nmbr, max_module)
 
         # set attributes of current message
-        self.status_msg["module"] = stream_item_list[0]
+        self.status_msg["module"] = module
 
         # ignore all Q-modules for percentage calc
-        if not re.match(".*Q[0-9][0-9]", stream_item_list[0]):
+        if not Q_MODULE_PATTERN.search(module):
             self.status_msg["percentage"] = percentage
         # ignore all D-modules for percentage calc
-        elif not re.match(".*D[0-9][0-9]", stream_item_list[0]):
+        elif not D_MODULE_PATTERN.search(module):
             self.status_msg["percentage"] = percentage
 
         # get copy of the current status message
-        self.save_status()
+        self.save_status(EVENT_MODULE_FINISHED)
 
     # update dictionary with phase changes
-    def update_phase(self, stream_item_list):
+    def update_phase(self, phase, event_type=EVENT_PHASE):
         self.module_cnt = 0
-        self.status_msg["phase"] = stream_item_list[1]
-        if "Test ended" in stream_item_list[1]:
+        self.status_msg["phase"] = phase
+        if TEST_ENDED_MARKER in phase:
             self.finish = True
             self.status_msg["percentage"] = 100
 
         # get copy of the current status message
-        self.save_status()
-
-    def read_loop(self):
-        """
-        Infinite Loop for waiting for emba.log changes
-            :param: None
-            :exit condition: Not in this Function, but if emba has terminated this process is also killed
-            :return: None
-       """
-        logger.info("read loop started for %s", self.firmware_id)
-
-        # if file does not exist create it otherwise delete its content
-        pat = f"{settings.EMBA_LOG_ROOT}/{self.firmware_id}/logreader.log"
-        if not pathlib.Path(pat).exists():
-            with open(pat, 'x', encoding='utf-8'):
-                pass
-
-        while not self.finish:
-            emba_log_path = f"{self.analysis.path_to_logs}/emba.log"
-            if not pathlib.Path(emba_log_path).exists():
-                time.sleep(5)
-                continue
-
-            # look for new events in log
-            logger.debug("looking for events in %s", emba_log_path)
-            got_event = self.inotify_events(emba_log_path)
-
-            for eve in got_event:
-                for flag in flags.from_mask(eve.mask):
-                    # Ignore irrelevant flags TODO: add other possible flags
-                    if flag is flags.CLOSE_NOWRITE or flag is flags.CLOSE_WRITE:
-                        pass
-                    # Act on file change
-                    elif flag is flags.MODIFY:
-                        # get the actual difference
-                        tmp = self.get_diff(emba_log_path)
-                        logger.debug("Got diff-output: %s", tmp)
-                        # send changes to frontend
-                        self.input_processing(tmp)
-                        # copy diff to tmp file
-                        self.copy_file_content(tmp)
-
-        self.cleanup()
-        logger.info("read loop done for %s", self.firmware_id)
-        # return
+        self.save_status(event_type)
 
     def cleanup(self):
         """
         Called when logreader should be cleaned up
         """
-        # inotify = INotify()
-        # inotify.rm_watch(self.wd)
+        if self.analysis:
+            self.publisher.flush()
+            self.save_checkpoint(force=True)
         logger.debug("Log reader cleaned up for %s", self.firmware_id)
-        # TODO do cleanup of emba_new_<self.firmware_id>.log
-
-    @classmethod
-    def process_line(cls, inp, pat):
 
+    def process_new_lines(self):
         """
-        Regex function for lambda
-            :param inp: String to apply regex to
-            :param pat: Regex pattern
-            :return: True if regex matches otherwise False
+        Helper function to hand the lines appended to emba.log to the status processing
+            :return: None
         """
-        if re.match(pat, inp):
-            return True
-        return False
+        tmp = self.log_tail.read()
+        if tmp:
+            logger.debug("Got new log lines: %s", tmp)
+            # send changes to frontend
+            self.input_processing(tmp)
+            self.save_checkpoint()
 
-    def copy_file_content(self, diff):
+    def input_processing(self, tmp_inp):
         """
-        Helper function to copy new emba log messages to temporary file continuously
-            :param diff: new line in emba log
+        Processes new log lines in order and triggers the status updates
+            :param tmp_inp: new lines of the emba log
             :return: None
         """
-        with open(f"{settings.EMBA_LOG_ROOT}/{self.firmware_id}/logreader.log", 'a+', encoding='utf-8') as diff_file:
-            diff_file.write(diff)
-        logger.debug("wrote file-diff")
-
-    def get_diff(self, log_file):
+        for event in classify_lines(tmp_inp.splitlines()):
+            if event.kind == EVENT_MODULE_FINISHED:
+                self.update_status(event.text)
+            elif event.kind == EVENT_FAILED:
+                self.finish = True
+                self.status_msg["percentage"] = 100
+                self.update_phase(event.text, event.kind)
+                logger.error("EMBA failed with  %s ", self.status_msg)
+            else:
+                self.update_phase(event.text, event.kind)
+            if self.finish:
+                break
+
+
+class LogFollower:
+    """
+    Follows the emba.log of all active analyses with a single inotify fd and a single thread
+    Every log gets a watch on itself and on its directory (to catch creation and rotation),
+    directories that don't exist yet are retried every READ_TIMEOUT
+    """
+    READ_TIMEOUT = 1000         # ms
+    STATE_CHECK_INTERVAL = 30   # s, drop readers of analyses that ended without a final log line
+    LOG_DIR_FLAGS = flags.CREATE | flags.MOVED_TO
+    LOG_FILE_FLAGS = flags.MODIFY | flags.DELETE_SELF | flags.MOVE_SELF
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.inotify = None
+        self.readers = {}       # analysis id -> LogReader
+        self.pending = set()    # analysis ids waiting for their watches
+        self.removed = set()    # analysis ids to drop
+        # only touched by the follower thread
+        self.watches = {}       # wd -> analysis id
+        self.dir_wds = {}       # analysis id -> wd of the log directory
+        self.file_wds = {}      # analysis id -> wd of emba.log
+        self.last_state_check = 0
+
+    def follow(self, analysis_id):
         """
-        Get diff between two files via difflib
-        copied from stack overflow : https://stackoverflow.com/questions/15864641/python-difflib-comparing-files
-            :param: None
-            :return: result of difflib call without preceding symbols
+        Starts following the emba.log of the analysis
+            :param analysis_id: id of the FirmwareAnalysis
+            :return: None
         """
-        # open the two files to get diff from
-        logger.debug("getting diff from %s", log_file)
-        with open(log_file, mode='r', encoding='utf-8') as old_file, open(f"{settings.EMBA_LOG_ROOT}/{self.firmware_id}/logreader.log", encoding='utf-8') as new_file:
-            diff = difflib.ndiff(old_file.readlines(), new_file.readlines())
-            return ''.join(x[2:] for x in diff if x.startswith('- '))
-
-    def input_processing(self, tmp_inp):
+        key = str(analysis_id)
+        with self.lock:
+            if key in self.readers:
+                logger.debug("Already following %s", key)
+                return
+        reader = LogReader(analysis_id)
+        if reader.finish:
+            return
+        with self.lock:
+            self.readers.setdefault(key, reader)
+            self.removed.discard(key)
+            self.pending.add(key)
+            if self.thread is None or not self.thread.is_alive():
+                if self.inotify is None:
+                    self.inotify = INotify()
+                self.thread = threading.Thread(target=self.run, name="logfollower", daemon=True)
+                self.thread.start()
+        logger.info("Following log of %s", key)
+
+    def unfollow(self, analysis_id):
+        with self.lock:
+            self.removed.add(str(analysis_id))
+
+    def stop(self):
         """
-        RxPy Function for processing the file diffs and trigger send packet to frontend
-            :param tmp_inp: file diff = new line in emba log
-            :return: None
+        Stops the follower thread, registered readers are dropped
         """
-        logger.debug("starting observers for log file %s", self.analysis.path_to_logs)
-
-        status_pattern = "\\[\\*\\]*"
-        phase_pattern = "\\[\\!\\]*"
-
-        color_pattern = "\\x1b\\[.{1,5}m"
-
-        cur_ar = tmp_inp.splitlines()
-
-        # create observable
-        source_stream = rx.from_iterable(cur_ar)
-
-        # observer for status messages
-        source_stream.pipe(
-            ops.map(lambda s: re.sub(color_pattern, '', s)),
-            ops.filter(lambda s: self.process_line(s, status_pattern)),
-            ops.map(lambda a: a.split("- ")),
-            ops.map(lambda t: t[1]),
-            ops.map(lambda b: b.split(" ")),
-            ops.filter(lambda c: c[1] == 'finished')
-        ).subscribe(
-            lambda x: [self.update_status(x)]    # , self.test_list1.append(x)]
-        )
-
-        # observer for phase messages
-        source_stream.pipe(
-            ops.map(lambda s: re.sub(color_pattern, '', s)),
-            ops.filter(lambda u: self.process_line(u, phase_pattern)),
-            ops.map(lambda v: v.split(" ", 1)),
-            ops.filter(lambda w: w[1])
-        ).subscribe(
-            lambda x: [self.update_phase(x)]     # , self.test_list2.append(x)
-        )
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+            self.removed.update(self.readers.keys())
+        if thread is not None:
+            thread.join(timeout=(self.READ_TIMEOUT / 1000) * 2)
+
+    def run(self):
+        logger.info("log follower started")
+        while self.thread is threading.current_thread():
+            self.attach_pending()
+            try:
+                events = self.inotify.read(timeout=self.READ_TIMEOUT)
+            except OSError as error:
+                logger.error("inotify read error: %s", error)
+                events = []
+
+            changed = set()
+            for event in events:
+                key = self.watches.get(event.wd)
+                if key is None:
+                    continue
+                event_flags = flags.from_mask(event.mask)
+                if event.wd == self.dir_wds.get(key):
+                    if flags.IGNORED in event_flags:
+                        # log directory is gone, wait for it to come back
+                        self.drop_watches(key)
+                        with self.lock:
+                            self.pending.add(key)
+                    elif event.name == "emba.log":
+                        self.watch_file(key)
+                        changed.add(key)
+                elif flags.IGNORED in event_flags or flags.DELETE_SELF in event_flags or flags.MOVE_SELF in event_flags:
+                    # rotated or deleted, the directory watch picks up the new file
+                    self.drop_file_watch(key)
+                elif flags.MODIFY in event_flags:
+                    changed.add(key)
+
+            for key in changed:
+                self.process(key)
+            self.tick()
+            self.check_states()
+            self.drop_removed()
+        # thread got stopped
+        self.drop_removed()
+        logger.info("log follower stopped")
+
+    def attach_pending(self):
+        with self.lock:
+            keys = list(self.pending)
+        for key in keys:
+            reader = self.readers.get(key)
+            if reader is None:
+                continue
+            try:
+                wd = self.inotify.add_watch(os.path.dirname(reader.emba_log_path), self.LOG_DIR_FLAGS)
+            except OSError:
+                # log directory not created yet
+                continue
+            self.dir_wds[key] = wd
+            self.watches[wd] = key
+            with self.lock:
+                self.pending.discard(key)
+            # the log may have been written before the watch existed
+            if os.path.isfile(reader.emba_log_path):
+                self.watch_file(key)
+                self.process(key)
+
+    def watch_file(self, key):
+        self.drop_file_watch(key)
+        try:
+            wd = self.inotify.add_watch(self.readers[key].emba_log_path, self.LOG_FILE_FLAGS)
+        except OSError as error:
+            logger.debug("Could not watch log of %s: %s", key, error)
+            return
+        self.file_wds[key] = wd
+        self.watches[wd] = key
+
+    def drop_file_watch(self, key):
+        wd = self.file_wds.pop(key, None)
+        if wd is None:
+            return
+        self.watches.pop(wd, None)
+        try:
+            self.inotify.rm_watch(wd)
+        except OSError:
+            # watch was already removed by the kernel
+            pass
+
+    def drop_watches(self, key):
+        self.drop_file_watch(key)
+        wd = self.dir_wds.pop(key, None)
+        if wd is not None:
+            self.watches.pop(wd, None)
+            try:
+                self.inotify.rm_watch(wd)
+            except OSError:
+                pass
 
-    @classmethod
-    def inotify_events(cls, path):
-        inotify = INotify()
-        watch_flags = flags.CREATE | flags.DELETE | flags.MODIFY | flags.DELETE_SELF | flags.CLOSE_NOWRITE | flags.CLOSE_WRITE
+    def process(self, key):
+        reader = self.readers.get(key)
+        if reader is None:
+            return
         try:
-            # add watch on file
-            inotify.add_watch(path, watch_flags)
-            return inotify.read()
+            reader.process_new_lines()
         except builtins.Exception as error:
-            logger.error("inotify_event error in %s:%s", path, error)
-            return []
-
-
-if __name__ == "__main__":
-    PHASE = "\\[\\!\\]*"
-    test_dir = pathlib.Path(__file__).resolve().parent.parent.parent
-    status_msg = {
-        "firmwarename": "LogTestFirmware",
-        "percentage": 0,
-        "module": "",
-        "phase": "",
-    }
-
-    with open(f"{test_dir}/test/logreader/test-run-good.log", 'r', encoding='UTF-8') as test_file:
-        for line in test_file:
-            if re.match(PHASE, line) is not None:
-                status_msg["phase"] = line
-            LogReader.phase_identify(status_msg)
+            logger.error("Log reader for %s failed: %s", key, error)
+        if reader.finish:
+            self.unfollow(key)
+
+    def tick(self):
+        with self.lock:
+            readers = list(self.readers.items())
+        for key, reader in readers:
+            try:
+                reader.tick()
+            except builtins.Exception as error:
+                logger.error("Status update for %s failed: %s", key, error)
+
+    def check_states(self):
+        if time.monotonic() - self.last_state_check < self.STATE_CHECK_INTERVAL:
+            return
+        self.last_state_check = time.monotonic()
+        with self.lock:
+            keys = list(self.readers.keys())
+        if keys:
+            try:
+                active = {str(analysis_id) for analysis_id in FirmwareAnalysis.objects.filter(id__in=keys).exclude(Q(finished=True) | Q(failed=True)).values_list('id', flat=True)}
+                for key in keys:
+                    if key not in active:
+                        # ended (or deleted), pick up whatever was written last
+                        self.process(key)
+                        self.unfollow(key)
+            except builtins.Exception as error:
+                logger.error("Log follower state check failed: %s", error)
+        close_old_connections()
+
+    def drop_removed(self):
+        with self.lock:
+            keys = list(self.removed)
+            self.removed.clear()
+        for key in keys:
+            self.drop_watches(key)
+            with self.lock:
+                self.pending.discard(key)
+                reader = self.readers.pop(key, None)
+            if reader is not None:
+                try:
+                    reader.cleanup()
+                except builtins.Exception as error:
+                    logger.error("Cleanup of log reader for %s failed: %s", key, error)
+                logger.info("Stopped following log of %s", key)
+
+
+log_follower = LogFollower()
+
+
+def get_log_follower():
+    """
+    Returns the global LogFollower, its thread gets started with the first followed analysis
+    """
+    return log_follower
@@ -0,0 +1,214 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+import gzip
+import json
+import logging
+import os
+import re
+
+from embark.logviewer import LineCache
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CHUNK = 1 << 20          # bytes of the log matched at once, always cut at a line end
+SEARCH_PAGE = 100               # default number of matches per page
+SEARCH_PAGE_MAX = 1000
+SEARCH_BUDGET = 64 << 20        # bytes scanned per page, the cursor continues the scan
+SEARCH_SNIPPET = 300            # bytes of a matching line sent back
+SEARCH_PATTERN_MAX = 256
+ANSI_PATTERN = re.compile(rb"\x1b\[[0-9;]*[A-Za-z]")
+
+# block level trigram index of final logs for whole-word literal queries
+TRIGRAM_SUFFIX = ".tri.gz"
+TRIGRAM_BLOCK_LINES = 4096
+WORD_PATTERN = re.compile(rb"\w{3,}")
+# words glued to ansi color codes (e.g. \x1b[31mError) still start at a word boundary
+WORD_START = rb"(?:(?<!\w)|(?<=\x1b\[\dm)|(?<=\x1b\[\d\dm)|(?<=;\dm)|(?<=;\d\dm))"
+WORD_END = rb"(?!\w)"
+
+
+class SearchQuery:
+    """
+    Compiled regex or literal query, matched against the raw bytes of the log
+    """
+
+    def __init__(self, query: str, regex=False, ignore_case=False, whole_word=False) -> None:
+        if not query or len(query) > SEARCH_PATTERN_MAX:
+            raise ValueError(f"The query must have 1 to {SEARCH_PATTERN_MAX} characters")
+        pattern = query.encode() if regex else re.escape(query.encode())
+        if whole_word:
+            pattern = WORD_START + rb"(?:" + pattern + rb")" + WORD_END
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        try:
+            self.pattern = re.compile(pattern, flags)
+        except re.error as error:
+            raise ValueError(f"Invalid regular expression: {error}") from error
+        # only whole-word literals can be looked up in the trigram index
+        self.word = query.encode().lower() if whole_word and not regex and WORD_PATTERN.fullmatch(query.encode()) else None
+
+
+def trigrams(word: bytes) -> set:
+    return {word[pos:pos + 3] for pos in range(len(word) - 2)}
+
+
+def _line_range_bytes(line_cache: LineCache, first_line: int, end_line: int):
+    end_byte = line_cache.line_start(end_line) if end_line < line_cache.num_lines() else line_cache.file_size
+    return line_cache.line_start(first_line), end_byte
+
+
+def build_trigram_index(line_cache: LineCache, log_path: str) -> dict:
+    """
+    builds the trigram -> blocks index of a final log and caches it next to the log
+    """
+    logger.info("Building trigram index of %s", log_path)
+    num_lines = line_cache.num_lines()
+    grams = {}
+    for block, first_line in enumerate(range(0, num_lines, TRIGRAM_BLOCK_LINES)):
+        start_byte, end_byte = _line_range_bytes(line_cache, first_line, min(first_line + TRIGRAM_BLOCK_LINES, num_lines))
+        data = os.pread(line_cache.filehandle.fileno(), end_byte - start_byte, start_byte).lower()
+        block_grams = set()
+        for word in set(WORD_PATTERN.findall(data)):
+            block_grams.update(trigrams(word))
+        for gram in block_grams:
+            grams.setdefault(gram.decode("latin-1"), []).append(block)
+    index = {
+        "inode": line_cache.inode,
+        "size": line_cache.file_size,
+        "block_lines": TRIGRAM_BLOCK_LINES,
+        "trigrams": grams,
+    }
+    tmp_path = f"{log_path}{TRIGRAM_SUFFIX}.{os.getpid()}"
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as index_file:
+            json.dump(index, index_file)
+        os.replace(tmp_path, log_path + TRIGRAM_SUFFIX)
+    except OSError as error:
+        logger.warning("Could not cache the trigram index of %s: %s", log_path, error)
+    return index
+
+
+def load_trigram_index(line_cache: LineCache, log_path: str) -> dict:
+    """
+    cached trigram index of a final log, built on first use
+
+    :return: index dict
+    """
+    try:
+        with gzip.open(log_path + TRIGRAM_SUFFIX, "rt", encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        if index["inode"] == line_cache.inode and index["size"] == line_cache.file_size:
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return build_trigram_index(line_cache, log_path)
+
+
+def candidate_ranges(index: dict, word: bytes, num_lines: int) -> list:
+    """
+    line ranges of the blocks that contain all trigrams of the word
+    """
+    blocks = None
+    for gram in trigrams(word):
+        gram_blocks = set(index["trigrams"].get(gram.decode("latin-1"), ()))
+        blocks = gram_blocks if blocks is None else blocks & gram_blocks
+        if not blocks:
+            return []
+    block_lines = index["block_lines"]
+    return [(block * block_lines, min((block + 1) * block_lines, num_lines)) for block in sorted(blocks)]
+
+
+def iter_matches(line_cache: LineCache, query: SearchQuery, ranges: list):
+    """
+    scans the line ranges chunk by chunk
+
+    :return: generator of (line, text) per matching line and (next line, None) after every chunk
+    """
+    fileno = line_cache.filehandle.fileno()
+    for first_line, end_line in ranges:
+        position, end_byte = _line_range_bytes(line_cache, first_line, end_line)
+        line = first_line
+        while position < end_byte:
+            read_size = SEARCH_CHUNK
+            while True:
+                chunk = os.pread(fileno, min(read_size, end_byte - position), position)
+                cut = len(chunk) if position + len(chunk) >= end_byte else chunk.rfind(b"\n") + 1
+                if cut > 0 or not chunk:
+                    break
+                # single line longer than the chunk
+                read_size *= 2
+            if not chunk:
+                break
+            chunk = chunk[:cut]
+            search_pos = 0
+            counted_pos = 0
+            while True:
+                match = query.pattern.search(chunk, search_pos)
+                if match is None:
+                    break
+                line += chunk.count(b"\n", counted_pos, match.start())
+                line_begin = chunk.rfind(b"\n", 0, match.start()) + 1
+                line_end = chunk.find(b"\n", match.start())
+                if line_end == -1:
+                    line_end = len(chunk)
+                text = ANSI_PATTERN.sub(b"", chunk[line_begin:min(line_end, line_begin + SEARCH_SNIPPET)])
+                yield line, text.decode("utf-8", errors="replace").rstrip("\r")
+                # one result per line
+                counted_pos = line_end
+                search_pos = line_end + 1
+            line += chunk.count(b"\n", counted_pos)
+            position += len(chunk)
+            yield line, None
+
+
+def search_log(log_path: str, query: SearchQuery, after=0, limit=SEARCH_PAGE, final=False, cancelled=None, on_matches=None) -> dict:
+    """
+    searches a log page by page, lines are counted from the start of the file
+
+    :param log_path: path of the log
+    :param after: line to start at (cursor of the previous page)
+    :param limit: maximum number of matches
+    :param final: the log doesn't change anymore, whole-word literals use the trigram index
+    :param cancelled: callable, stops the search if it returns True
+    :param on_matches: called with the matches of every chunk (streaming)
+    :return: dict with matches, the cursor of the next page (None if done) and the number of lines
+    """
+    line_cache = LineCache(log_path)
+    try:
+        num_lines = line_cache.num_lines()
+        after = max(0, min(after, num_lines))
+        if final and query.word is not None:
+            ranges = []
+            for first_line, end_line in candidate_ranges(load_trigram_index(line_cache, log_path), query.word, num_lines):
+                if end_line > after:
+                    ranges.append((max(first_line, after), end_line))
+        else:
+            ranges = [(after, num_lines)]
+
+        matches = []
+        batch = []
+        cursor = None
+        scanned = 0
+        for line, text in iter_matches(line_cache, query, ranges):
+            if text is None:
+                cursor = line
+                scanned += SEARCH_CHUNK
+                if batch and on_matches is not None:
+                    on_matches(batch)
+                    batch = []
+                if (cancelled is not None and cancelled()) or scanned >= SEARCH_BUDGET:
+                    break
+                continue
+            match = {"line": line, "text": text}
+            matches.append(match)
+            batch.append(match)
+            cursor = line + 1
+            if len(matches) >= limit:
+                break
+        else:
+            cursor = None
+        if batch and on_matches is not None:
+            on_matches(batch)
+        return {"matches": matches, "next": cursor, "num_lines": num_lines}
+    finally:
+        line_cache.close()
@@ -3,11 +3,16 @@ __author__ = 'Christian Bieg, Benedikt Kuehne'
 __license__ = 'MIT'
 
 import asyncio
+import functools
 import os
-import base64
+import fcntl
 import logging
 import json
+import struct
+import sys
+import threading
 
+from array import array
 from pathlib import Path
 
 from django.conf import settings
@@ -21,6 +26,9 @@ from uploader.models import FirmwareAnalysis
 
 logger = logging.getLogger(__name__)
 
+# binary frames: length of the json header, json header, raw log content
+FRAME_HEADER = struct.Struct(">I")
+
 
 class LogConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
@@ -29,9 +37,14 @@ class LogConsumer(AsyncWebsocketConsumer):
         self.log_file_path = None
         self.line_cache = None
         self.file_view = None
-        self.observer = None
-
-    def load_file_content(self):
+        # log size the client has seen, to detect appends and rewrites
+        self.sent_bytes = 0
+        # finished logs can use the trigram index when searching
+        self.log_final = False
+        self.search_cancel = None
+        self.disconnected = False
+
+    def load_file_content(self) -> bytes:
         logger.info(
             'Getting file content for path "%s"; view: %s',
             self.log_file_path,
@@ -50,18 +63,57 @@ class LogConsumer(AsyncWebsocketConsumer):
         self.file_view.offset = offset
 
         content = self.line_cache.read_lines(offset, offset + limit - 1)
-        self.file_view.content = base64.b64encode(content).decode("ascii")
         self.file_view.num_lines = num_lines
+        self.sent_bytes = self.line_cache.file_size
+        return content
 
     async def connect(self):
         pass
 
     async def send_file_content(self) -> None:
-        self.load_file_content()
-        await self.send_message({"file_view": self.file_view.__dict__})
+        content = self.load_file_content()
+        await self.send_frame({"type": "file_view", "file_view": self.file_view.header()}, content)
 
     async def update_lines(self) -> None:
-        self.line_cache.refresh()
+        """
+        follow-tail: a client at the end of the log only gets the appended lines,
+        a client scrolled away keeps its lines and only gets the new line count
+        """
+        # the shared line cache was already refreshed by the registry
+        if self.file_view is None:
+            return
+        sent_lines = self.file_view.num_lines
+        # a scrolled away client needs no content, only the unfinished last line is read then
+        first_line = max(sent_lines - 1, 0) if self.file_view.offset == 0 else sys.maxsize
+        content, num_lines, file_size = self.line_cache.read_tail(first_line)
+        if num_lines < sent_lines or file_size < self.sent_bytes:
+            # the log was rewritten
+            self.file_view.offset = 0
+            await self.send_file_content()
+            return
+        if file_size == self.sent_bytes:
+            return
+        self.file_view.num_lines = num_lines
+        self.sent_bytes = file_size
+        if self.file_view.offset > 0:
+            # offsets are counted from the end of the log
+            self.file_view.offset += num_lines - sent_lines
+            await self.send_frame({"type": "num_lines", "file_view": self.file_view.header()})
+            return
+        # replaces the last (incomplete) line the client has
+        await self.send_frame({"type": "append", "file_view": self.file_view.header()}, content)
+
+    async def watch_log(self) -> None:
+        """
+        attaches to the shared line cache and file watch of the log and sends the first view
+        """
+        line_cache = await get_log_registry().acquire(self.log_file_path, self)
+        if self.disconnected:
+            # gone while the log was indexed
+            get_log_registry().release(self.log_file_path, self)
+            return
+        self.line_cache = line_cache
+        self.file_view = FileView()
         await self.send_file_content()
 
     async def receive(self, text_data: str = "", bytes_data=None) -> None:
@@ -73,19 +125,76 @@ class LogConsumer(AsyncWebsocketConsumer):
                 logger.info(data["file_view"])
                 self.file_view = FileView(**data["file_view"])
                 await self.send_file_content()
+            elif data["action"] == "search":
+                logger.info("WS - action: search")
+                self.start_search(data)
+            elif data["action"] == "cancel_search":
+                logger.info("WS - action: cancel search")
+                self.cancel_search()
             else:
                 raise NotImplementedError("Unknown action")
         except Exception as exception:
             logger.error(exception)
             await self.send_message({"error": "Unknown error"})
 
+    def start_search(self, data: dict) -> None:
+        """
+        runs the search in a thread, the matches are streamed as they are found, a new search cancels the running one
+        """
+        from embark.logsearch import SEARCH_PAGE, SEARCH_PAGE_MAX, SearchQuery  # pylint: disable=import-outside-toplevel
+        self.cancel_search()
+        search_id = data.get("search_id")
+        try:
+            query = SearchQuery(
+                str(data.get("query", "")), regex=bool(data.get("regex")), ignore_case=bool(data.get("ignore_case")), whole_word=bool(data.get("whole_word"))
+            )
+            after = int(data.get("after") or 0)
+            limit = min(int(data.get("limit") or SEARCH_PAGE), SEARCH_PAGE_MAX)
+        except ValueError as error:
+            asyncio.ensure_future(self.send_message({"search_done": {"search_id": search_id, "error": str(error)}}))
+            return
+        self.search_cancel = threading.Event()
+        asyncio.ensure_future(self.run_search(search_id, query, after, limit, self.search_cancel))
+
+    async def run_search(self, search_id, query, after: int, limit: int, cancel: threading.Event) -> None:
+        from embark.logsearch import search_log  # pylint: disable=import-outside-toplevel
+        loop = asyncio.get_running_loop()
+
+        def on_matches(matches):
+            # waiting for the send keeps the search from running ahead of a slow client
+            asyncio.run_coroutine_threadsafe(
+                self.send_message({"search_results": {"search_id": search_id, "matches": matches}}), loop
+            ).result()
+
+        try:
+            result = await loop.run_in_executor(None, functools.partial(
+                search_log, self.log_file_path, query, after=after, limit=limit, final=self.log_final,
+                cancelled=cancel.is_set, on_matches=on_matches
+            ))
+        except Exception as exception:
+            logger.error("Search in %s failed: %s", self.log_file_path, exception)
+            await self.send_message({"search_done": {"search_id": search_id, "error": "Search failed"}})
+            return
+        await self.send_message({"search_done": {
+            "search_id": search_id, "next": result["next"], "num_lines": result["num_lines"], "cancelled": cancel.is_set()
+        }})
+
+    def cancel_search(self) -> None:
+        if self.search_cancel is not None:
+            self.search_cancel.set()
+            self.search_cancel = None
+
     async def disconnect(self, code):
         logger.info("WS - disconnected: %s", code)
+        self.disconnected = True
+        self.cancel_search()
         if self.line_cache:
-            self.line_cache.close()
+            get_log_registry().release(self.log_file_path, self)
+            self.line_cache = None
 
-        if self.observer:
-            self.observer.stop()
+    async def send_frame(self, header: dict, content: bytes = b"") -> None:
+        header_bytes = json.dumps(header).encode()
+        await self.send(bytes_data=FRAME_HEADER.pack(len(header_bytes)) + header_bytes + content)
 
     # send data to frontend
     async def send_message(self, message: dict) -> None:
@@ -102,14 +211,27 @@ class FileView:
         self.content = content
         self.num_lines = num_lines
 
+    def header(self) -> dict:
+        # the content itself is sent raw behind the header
+        return {"offset": self.offset, "limit": self.limit, "num_lines": self.num_lines}
 
-REFRESH_LINES = 10  # This will define how many of the last lines will be refreshed
+
+# sidecar next to the log: header (magic, inode of the log), then the offset after every newline
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"EMBAIDX1"
+INDEX_HEADER = struct.Struct("<8sQ")
+INDEX_ENTRY = struct.Struct("<Q")
+INDEX_CHUNK = 1 << 20   # bytes of the log scanned at once
 
 
 class LineCache:
+    """
+    Line offsets of a (growing) log file, persisted in <log>.idx and extended incrementally.
+    Offsets are read from the sidecar on demand, opening a log of any size doesn't scan it again
+    and nothing per line is kept in memory. Lines are counted from the end of the file.
+    """
+
     def __init__(self, filepath: str) -> None:
-        self.line_beginnings = [0]
-        self.line_endings = [0]
         # Intentionally not using with to save resources
         # because we don't have to open the file as often
         # pylint: disable-next=consider-using-with
@@ -117,44 +239,115 @@ class LineCache:
             self.filehandle = open(filepath, "rb")
         except FileNotFoundError:
             raise FileNotFoundError(f"The file {filepath} does not exist.")
+        self.index_path = filepath + INDEX_SUFFIX
+        self.index_fd = None
+        # fallback if the sidecar can't be written, still 8 bytes per line
+        self.memory_index = None
+        self.indexed_lines = 0
+        self.indexed_bytes = 0
+        self.file_size = 0
+        self.inode = os.fstat(self.filehandle.fileno()).st_ino
+        # shared by the consumers of the log, refreshed from the watch thread
+        self.lock = threading.RLock()
+        try:
+            self.index_fd = os.open(self.index_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as error:
+            logger.warning("Line index %s not available, indexing in memory: %s", self.index_path, error)
+            self.memory_index = array("Q")
         self.refresh()
 
-    def refresh(self) -> None:
-        # Make sure to not go out of bounds
-        refresh_from_line = min(len(self.line_beginnings), REFRESH_LINES)
-        refresh_from_byte = self.line_beginnings[-refresh_from_line]
-
-        # Remove the line beginnings and endings to be refreshed
-        self.line_beginnings = self.line_beginnings[:-refresh_from_line]
-        self.line_endings = self.line_endings[:-refresh_from_line]
-
-        logger.debug(
-            "Start refreshing line cache from line %s (start counting from end of the file)", refresh_from_line
-        )
-        logger.debug("Start refreshing line cache from byte %s", refresh_from_byte)
-
-        self.filehandle.seek(refresh_from_byte)
-
-        while True:
-            line_beginning = self.filehandle.tell()
-            line = self.filehandle.readline()
-
-            line_ending = self.filehandle.tell()
-
-            if len(line) > 0 and line[-1:] == b'\n':
-                line_ending = line_ending - 1
+    def _lock(self, operation) -> None:
+        if operation == fcntl.LOCK_UN:
+            if self.index_fd is not None:
+                fcntl.flock(self.index_fd, operation)
+            self.lock.release()
+            return
+        self.lock.acquire()
+        if self.index_fd is not None:
+            fcntl.flock(self.index_fd, operation)
+
+    def _entry(self, line: int) -> int:
+        """
+        offset after the newline of a complete line (counted from the start of the file)
+        """
+        if self.memory_index is not None:
+            return self.memory_index[line]
+        return INDEX_ENTRY.unpack(os.pread(self.index_fd, INDEX_ENTRY.size, INDEX_HEADER.size + line * INDEX_ENTRY.size))[0]
+
+    def _reset_index(self) -> None:
+        logger.debug("Rebuilding line index %s", self.index_path)
+        self.indexed_lines = 0
+        self.indexed_bytes = 0
+        if self.memory_index is not None:
+            self.memory_index = array("Q")
+            return
+        os.ftruncate(self.index_fd, 0)
+        os.pwrite(self.index_fd, INDEX_HEADER.pack(INDEX_MAGIC, self.inode), 0)
+
+    def _load_index(self) -> None:
+        """
+        picks up what other viewers of the same log already indexed
+        """
+        if self.memory_index is not None:
+            return
+        index_size = os.fstat(self.index_fd).st_size
+        if index_size < INDEX_HEADER.size or INDEX_HEADER.unpack(os.pread(self.index_fd, INDEX_HEADER.size, 0)) != (INDEX_MAGIC, self.inode):
+            self._reset_index()
+            return
+        self.indexed_lines = (index_size - INDEX_HEADER.size) // INDEX_ENTRY.size
+        # drop a partially written entry
+        os.ftruncate(self.index_fd, INDEX_HEADER.size + self.indexed_lines * INDEX_ENTRY.size)
+        self.indexed_bytes = self._entry(self.indexed_lines - 1) if self.indexed_lines else 0
 
-            if len(line) > 1 and line[-2:] == b'\r\n':
-                line_ending = line_ending - 1
+    def refresh(self) -> None:
+        self._lock(fcntl.LOCK_EX)
+        try:
+            self._load_index()
+            fileno = self.filehandle.fileno()
+            file_size = os.fstat(fileno).st_size
+            # the log was truncated and rewritten (e.g. emba_update.log)
+            if file_size < self.indexed_bytes or (self.indexed_bytes and os.pread(fileno, 1, self.indexed_bytes - 1) != b"\n"):
+                self._reset_index()
+
+            logger.debug("Start refreshing line cache from byte %s", self.indexed_bytes)
+            new_entries = array("Q")
+            position = self.indexed_bytes
+            while position < file_size:
+                chunk = os.pread(fileno, min(INDEX_CHUNK, file_size - position), position)
+                if not chunk:
+                    break
+                newline = chunk.find(b"\n")
+                while newline != -1:
+                    new_entries.append(position + newline + 1)
+                    newline = chunk.find(b"\n", newline + 1)
+                position += len(chunk)
+
+            if new_entries:
+                if self.memory_index is not None:
+                    self.memory_index.extend(new_entries)
+                else:
+                    os.pwrite(self.index_fd, new_entries.tobytes(), INDEX_HEADER.size + self.indexed_lines * INDEX_ENTRY.size)
+                self.indexed_lines += len(new_entries)
+                self.indexed_bytes = new_entries[-1]
+            self.file_size = file_size
+        finally:
+            self._lock(fcntl.LOCK_UN)
 
-            self.line_beginnings.append(line_beginning)
-            self.line_endings.append(line_ending)
+    def num_lines(self) -> int:
+        # the last line is the (possibly empty) rest after the last newline
+        return self.indexed_lines + 1
 
-            if len(line) == 0 or line[-1:] != b'\n':
-                break
+    def line_start(self, line: int) -> int:
+        return self._entry(line - 1) if line > 0 else 0
 
-    def num_lines(self) -> int:
-        return len(self.line_beginnings)
+    def line_end(self, line: int) -> int:
+        if line >= self.indexed_lines:
+            return self.file_size
+        # strip \n and \r\n
+        end = self._entry(line) - 1
+        if end > self.line_start(line) and os.pread(self.filehandle.fileno(), 1, end - 1) == b"\r":
+            end -= 1
+        return end
 
     def read_lines(self, first_line: int, last_line: int) -> bytes:
         num_lines = self.num_lines()
@@ -168,17 +361,170 @@ class LineCache:
         if last_line >= num_lines:
             raise IndexError("The first line cannot be equal or above the number of lines")
 
-        first_byte = self.line_beginnings[num_lines - last_line - 1]
-        last_byte = self.line_endings[num_lines - first_line - 1]
-        self.filehandle.seek(first_byte)
-        output = self.filehandle.read(last_byte - first_byte)
+        self._lock(fcntl.LOCK_SH)
+        try:
+            first_byte = self.line_start(num_lines - last_line - 1)
+            last_byte = self.line_end(num_lines - first_line - 1)
+            output = os.pread(self.filehandle.fileno(), last_byte - first_byte, first_byte)
+        finally:
+            self._lock(fcntl.LOCK_UN)
 
         return output
 
+    def read_tail(self, first_line: int):
+        """
+        reads from the beginning of a line (counted from the start of the file) to the end of the log
+
+        :return: content, number of lines, log size
+        """
+        self._lock(fcntl.LOCK_SH)
+        try:
+            first_line = min(first_line, self.indexed_lines)
+            first_byte = self.line_start(first_line)
+            content = os.pread(self.filehandle.fileno(), self.file_size - first_byte, first_byte)
+            return content, self.num_lines(), self.file_size
+        finally:
+            self._lock(fcntl.LOCK_UN)
+
     def close(self) -> None:
+        if self.index_fd is not None:
+            os.close(self.index_fd)
+            self.index_fd = None
         self.filehandle.close()
 
 
+WATCH_DEBOUNCE = 0.25    # s, bursts of modify events result in one refresh
+
+
+class SharedLog:
+    """
+    One LineCache and one file watch of a log, shared by all consumers viewing it
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.line_cache = LineCache(path)
+        self.consumers = {}     # consumer -> event loop of the consumer
+        self.watch = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def changed(self) -> None:
+        """
+        called from the observer thread, debounces the refresh
+        """
+        with self.lock:
+            if self.timer is None:
+                self.timer = threading.Timer(WATCH_DEBOUNCE, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            self.timer = None
+            consumers = list(self.consumers.items())
+        if not consumers:
+            return
+        self.line_cache.refresh()
+        for consumer, loop in consumers:
+            try:
+                loop.call_soon_threadsafe(lambda consumer=consumer: asyncio.ensure_future(consumer.update_lines()))
+            except RuntimeError:
+                # loop already closed, the consumer is about to be released
+                pass
+
+
+class LogRegistry:
+    """
+    Refcounted registry of the viewed logs with a single watchdog observer for all of them
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.logs = {}      # path -> SharedLog
+        self.observer = None
+
+    async def acquire(self, path: str, consumer) -> LineCache:
+        """
+        registers a consumer of the log, it gets update_lines() calls in its event loop.
+        Indexing and refreshing run in the default executor, neither the event loop
+        nor the viewers of other logs wait for a large log
+
+        :param path: path of the log file
+        :param consumer: LogConsumer
+        :return: shared LineCache of the log
+        """
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            shared = self._register(path, consumer, loop)
+        if shared is not None:
+            await loop.run_in_executor(None, shared.line_cache.refresh)
+            return shared.line_cache
+        built = await loop.run_in_executor(None, SharedLog, path)
+        with self.lock:
+            shared = self._register(path, consumer, loop)
+            if shared is None:
+                shared = built
+                if self.observer is None:
+                    self.observer = Observer()
+                    self.observer.daemon = True
+                    self.observer.start()
+                shared.watch = self.observer.schedule(ModifyEventHandler(shared), path)
+                self.logs[path] = shared
+                self._register(path, consumer, loop)
+                # picks up what was appended while indexing, before the watch existed
+                shared.changed()
+        if shared is not built:
+            # another consumer registered the log in the meantime
+            built.line_cache.close()
+            await loop.run_in_executor(None, shared.line_cache.refresh)
+        return shared.line_cache
+
+    def _register(self, path: str, consumer, loop):
+        # caller holds self.lock
+        shared = self.logs.get(path)
+        if shared is not None:
+            with shared.lock:
+                shared.consumers[consumer] = loop
+            logger.debug("%d viewer(s) of %s", len(shared.consumers), path)
+        return shared
+
+    def release(self, path: str, consumer) -> None:
+        with self.lock:
+            shared = self.logs.get(path)
+            if shared is None:
+                return
+            with shared.lock:
+                shared.consumers.pop(consumer, None)
+                if shared.consumers:
+                    return
+                if shared.timer is not None:
+                    shared.timer.cancel()
+                    shared.timer = None
+            del self.logs[path]
+            self.observer.unschedule(shared.watch)
+            shared.line_cache.close()
+
+
+class ModifyEventHandler(FileSystemEventHandler):
+    def __init__(self, shared: SharedLog) -> None:
+        super().__init__()
+        self.shared = shared
+
+    def on_modified(self, event):
+        self.shared.changed()
+
+
+log_registry = LogRegistry()
+
+
+def get_log_registry() -> LogRegistry:
+    """
+    Returns the LogRegistry of this process
+    """
+    return log_registry
+
+
 class AnalysisLogConsumer(LogConsumer):
 
     def __init__(self, *args, **kwargs):
@@ -212,28 +558,14 @@ class AnalysisLogConsumer(LogConsumer):
             return
 
         self.log_file_path = f"{Path(firmware.path_to_logs).parent}/emba_run.log"
+        self.log_final = firmware.finished
 
         if not os.path.isfile(self.log_file_path):
             await self.send_message({"error": "The log file does not exist, yet."})
             await self.close()
+            return
 
-        self.line_cache = LineCache(self.log_file_path)
-
-        self.file_view = FileView()
-
-        this = self
-
-        class ModifyEventHandler(FileSystemEventHandler):
-            def on_modified(self, _event):
-                asyncio.run(this.update_lines())
-
-        event_handler = ModifyEventHandler()
-
-        self.observer = Observer()
-        self.observer.schedule(event_handler, self.log_file_path)
-        self.observer.start()
-
-        await self.update_lines()
+        await self.watch_log()
 
 
 class UpdateLogConsumer(LogConsumer):
@@ -252,20 +584,4 @@ class UpdateLogConsumer(LogConsumer):
             await self.close()
             return
 
-        self.line_cache = LineCache(self.log_file_path)
-
-        self.file_view = FileView()
-
-        this = self
-
-        class ModifyEventHandler(FileSystemEventHandler):
-            def on_modified(self, _event):
-                asyncio.run(this.update_lines())
-
-        event_handler = ModifyEventHandler()
-
-        self.observer = Observer()
-        self.observer.schedule(event_handler, self.log_file_path)
-        self.observer.start()
-
-        await self.update_lines()
+        await self.watch_log()
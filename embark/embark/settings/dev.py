@@ -19,6 +19,16 @@ ALLOWED_HOSTS = ['*']
 EMBA_ROOT = os.path.join(BASE_DIR.parent, 'emba')
 EMBA_LOG_ROOT = os.path.join(BASE_DIR.parent, 'emba_logs')
 EMBA_LOG_URL = 'emba_logs/'
+# maximum number of concurrent local EMBA runs on this host (over all server processes)
+EMBA_MAX_CONCURRENT_ANALYSES = int(os.environ.get('EMBA_MAX_CONCURRENT_ANALYSES', 4))
+# admission ceilings for local EMBA runs, projected from live readings plus the estimates of running analyses
+EMBA_ADMISSION_MAX_CPU_PERCENT = float(os.environ.get('EMBA_ADMISSION_MAX_CPU_PERCENT', 90))
+EMBA_ADMISSION_MAX_MEMORY_PERCENT = float(os.environ.get('EMBA_ADMISSION_MAX_MEMORY_PERCENT', 85))
+EMBA_ADMISSION_MIN_FREE_DISK = int(os.environ.get('EMBA_ADMISSION_MIN_FREE_DISK', 10 * 1024 ** 3))   # bytes under EMBA_LOG_ROOT
+# report files and downloads are handed to the front end: '' (served by django), 'x-sendfile' (apache mod_xsendfile) or 'x-accel-redirect' (nginx)
+EMBARK_SENDFILE = os.environ.get('EMBARK_SENDFILE', '')
+EMBARK_SENDFILE_ROOT = str(BASE_DIR.parent)
+EMBARK_SENDFILE_URL = os.environ.get('EMBARK_SENDFILE_URL', '/protected/')   # internal location of EMBARK_SENDFILE_ROOT (x-accel-redirect)
 NVD_ROOT = os.path.join(EMBA_ROOT, 'external/nvd-json-data-feeds')
 
 DEBUG = True
@@ -7,14 +7,17 @@ import logging
 import os
 import time
 import re
+import tempfile
 import uuid
 
 from unittest import skipIf
+from unittest.mock import patch
 from django.conf import settings
 from django.test import TestCase
 from uploader.models import FirmwareAnalysis
 
-from embark.logreader import EMBA_F_PHASE, EMBA_L_PHASE, EMBA_P_PHASE, EMBA_PHASE_CNT, EMBA_S_PHASE, LogReader
+from embark.logreader import EMBA_F_PHASE, EMBA_L_PHASE, EMBA_P_PHASE, EMBA_PHASE_CNT, EMBA_S_PHASE, LogReader, LogTail
+from embark.logreader import EVENT_FAILED, EVENT_MODULE_FINISHED, EVENT_PHASE, EVENT_TEST_ENDED, classify_lines
 from embark.helper import count_emba_modules, get_emba_modules
 
 logger = logging.getLogger(__name__)
@@ -128,3 +131,88 @@ class TestLogreader(TestCase):
         self.file_test(self.test_file_good)
         os.remove(f"{settings.EMBA_LOG_ROOT}/{self.analysis_id}/emba_logs/emba.log")
         # self.file_test(self.test_file_bad)
+
+
+class TestLogTail(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()   # pylint: disable=consider-using-with
+        self.log_path = os.path.join(self.tmp_dir.name, "emba.log")
+        self.checkpoint_path = os.path.join(self.tmp_dir.name, "logreader.offset")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def append(self, text):
+        with open(self.log_path, 'a', encoding='UTF-8') as file:
+            file.write(text)
+
+    def test_partial_lines_and_checkpoint(self):
+        tail = LogTail(self.log_path, self.checkpoint_path)
+        self.assertEqual(tail.read(), "")
+        self.append("[*] first\n[*] sec")
+        self.assertEqual(tail.read(), "[*] first\n")
+        self.append("ond\n")
+        self.assertEqual(tail.read(), "[*] second\n")
+        tail.save_checkpoint(force=True)
+        # a new tail continues from the checkpoint
+        self.append("[!] third\n")
+        self.assertEqual(LogTail(self.log_path, self.checkpoint_path).read(), "[!] third\n")
+
+    def test_checkpoint_after_processing(self):
+        tail = LogTail(self.log_path, self.checkpoint_path)
+        self.append("[*] first\n")
+        tail.read()
+        tail.save_checkpoint()
+        self.append("[*] second\n")
+        self.assertEqual(tail.read(), "[*] second\n")
+        # throttled, lines read but not saved are read again after a restart
+        tail.save_checkpoint()
+        self.assertEqual(LogTail(self.log_path, self.checkpoint_path).read(), "[*] second\n")
+        # a failed write keeps the old checkpoint and is retried
+        with patch('embark.logreader.os.replace', side_effect=OSError):
+            tail.save_checkpoint(force=True)
+        self.assertEqual(LogTail(self.log_path, self.checkpoint_path).read(), "[*] second\n")
+        tail.save_checkpoint(force=True)
+        self.assertEqual(LogTail(self.log_path, self.checkpoint_path).read(), "")
+
+    def test_truncate_and_rotate(self):
+        tail = LogTail(self.log_path, self.checkpoint_path)
+        self.append("[*] first line\n")
+        tail.read()
+        # truncated in place
+        with open(self.log_path, 'w', encoding='UTF-8') as file:
+            file.write("[*] new\n")
+        self.assertEqual(tail.read(), "[*] new\n")
+        # replaced by a new file
+        os.rename(self.log_path, f"{self.log_path}.1")
+        self.append("[*] rotated line\n")
+        self.assertEqual(tail.read(), "[*] rotated line\n")
+
+
+class TestClassifyLines(TestCase):
+
+    def test_good_log(self):
+        with open(os.path.join(settings.BASE_DIR.parent, "test/logreader/good-log"), 'r', encoding='UTF-8') as test_file:
+            events = list(classify_lines(test_file))
+        self.assertEqual(events[0].kind, EVENT_PHASE)
+        self.assertTrue(events[0].text.startswith("Pre-checking phase"))
+        self.assertEqual(events[1].kind, EVENT_MODULE_FINISHED)
+        self.assertEqual(events[1].text, "P02_firmware_bin_file_check")
+        self.assertEqual(events[-1].kind, EVENT_TEST_ENDED)
+        self.assertEqual(len([event for event in events if event.kind == EVENT_PHASE]), 5)
+
+    def test_colors_and_failure(self):
+        lines = [
+            "\x1b[0;33m[*]\x1b[0m Wed May 10 11:20:09 CEST 2023 - S05_firmware_details finished",
+            "[*] Wed May 10 11:20:09 CEST 2023 - S06_distribution_identification started",
+            "[*] no module here",
+            "[!] EMBA failed in docker mode!",
+        ]
+        events = list(classify_lines(lines))
+        self.assertEqual([(event.kind, event.text) for event in events], [
+            (EVENT_MODULE_FINISHED, "S05_firmware_details"),
+            (EVENT_FAILED, "EMBA failed in docker mode!"),
+        ])
@@ -0,0 +1,58 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+import asyncio
+import os
+import tempfile
+import time
+
+from unittest.mock import patch
+from django.test import TestCase
+
+from embark.logviewer import INDEX_SUFFIX, LineCache, LogRegistry
+
+
+class TestLogRegistry(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()   # pylint: disable=consider-using-with
+        self.log_path = os.path.join(self.tmp_dir.name, "emba_run.log")
+        with open(self.log_path, 'w', encoding='UTF-8') as file:
+            file.write("first\nsecond\nthird")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_acquire_doesnt_block(self):
+        """
+        Test that the event loop keeps running while the line index of a log is built.
+        """
+        registry = LogRegistry()
+        consumers = [object(), object()]
+        refresh = LineCache.refresh
+
+        def slow_refresh(line_cache):
+            # stands in for indexing a large log without a sidecar
+            time.sleep(0.5)
+            refresh(line_cache)
+
+        async def connect():
+            ticks = 0
+            acquired = asyncio.gather(*[registry.acquire(self.log_path, consumer) for consumer in consumers])
+            while not acquired.done():
+                ticks += 1
+                await asyncio.sleep(0.05)
+            return ticks, acquired.result()
+
+        with patch.object(LineCache, 'refresh', slow_refresh):
+            ticks, line_caches = asyncio.run(connect())
+        self.assertGreater(ticks, 5)
+        # both consumers share one index
+        self.assertIs(line_caches[0], line_caches[1])
+        self.assertEqual(line_caches[0].num_lines(), 3)
+        self.assertTrue(os.path.isfile(self.log_path + INDEX_SUFFIX))
+        for consumer in consumers:
+            registry.release(self.log_path, consumer)
+        self.assertEqual(registry.logs, {})
@@ -1,3 +1,4 @@
+# pylint: disable=C0413
 """
 WSGI config for djangoProject project.
 
@@ -10,6 +11,7 @@ __copyright__ = 'Copyright 2021-2026 Siemens Energy AG, Copyright 2021 The AMOS
 __author__ = 'Benedikt Kuehne, diegiesskanne'
 __license__ = 'MIT'
 
+import logging
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -17,3 +19,16 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'embark.settings.deploy')
 
 application = get_wsgi_application()
+
+from django.db import DatabaseError
+
+from uploader.boundedexecutor import BoundedExecutor
+
+logger = logging.getLogger(__name__)
+
+# re-adopt emba runs that survived the restart and pick up analyses that were queued before the last shutdown
+try:
+    BoundedExecutor.recover_running()
+    BoundedExecutor.resume_queue()
+except DatabaseError as db_error:
+    logger.error("Could not resume the analysis queue: %s", db_error)
@@ -8,18 +8,22 @@ import logging
 import csv
 import json
 import os
+import time
+import uuid
 
 from pathlib import Path
 import re
 
 from django.conf import settings
-from django.db import DatabaseError
+from django.db import DatabaseError, transaction
 
 from dashboard.models import SoftwareBillOfMaterial, SoftwareInfo, Vulnerability, Result
 from uploader.models import FirmwareAnalysis
 
 logger = logging.getLogger(__name__)
 
+SBOM_BATCH_SIZE = 1000
+
 
 def result_read_in(analysis_id):
     """
@@ -62,37 +66,48 @@ def result_read_in(analysis_id):
     return res
 
 
+def iter_csv_records(path):
+    """
+    reads an emba csv file row by row
+    :return: generator of rows without their trailing empty and NA cells, empty rows are skipped
+    """
+    with open(path, mode='r', encoding='utf-8') as csv_file:
+        for row in csv.reader(csv_file, delimiter=';'):
+            end = len(row)
+            while end > 0 and row[end - 1] in ('', 'NA'):
+                end -= 1
+            if end > 0:
+                yield row[:end]
+
+
+def build_csv_dict(records):
+    """
+    builds the nested result dict in one pass
+        key;value -> {key: value} (first one wins)
+        key;sub;value -> {key: {sub: value}}
+        key;sub;name;value... -> {key: {sub: {name: {...}}}}
+    :return: result_dict
+    """
+    res_dict = {}
+    for ele in records:
+        if len(ele) == 2:
+            res_dict.setdefault(ele[0], ele[1])
+        elif len(ele) > 2:
+            entry = res_dict.setdefault(ele[0], {})
+            if len(ele) > 3:
+                entry.setdefault(ele[1], {})[ele[2]] = {ele[_info]: ele[_info + 1] for _info in range(1, len(ele) - 1, 2)}
+            else:
+                entry[ele[1]] = ele[2]
+    return res_dict
+
+
 def read_csv(path):
     """
     This job reads the csv file
     :return: result_dict
     """
-    res_dict = {}
-    with open(path, mode='r', encoding='utf-8') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=';')
-        csv_list = []
-        for row in csv_reader:
-            # remove NAs and other unwanted chars from csv
-            while row[-1] == '':
-                row.pop(-1)
-            while row[-1] == 'NA':
-                row.pop(-1)
-            csv_list.append(row)
-            for ele in csv_list:
-                if len(ele) == 2:
-                    if not ele[0] in res_dict.keys():
-                        res_dict[ele[0]] = ele[1]
-                elif len(ele) > 2:
-                    if not ele[0] in res_dict.keys():
-                        res_dict[ele[0]] = {}
-                    if len(ele[2:]) > 1:
-                        if not ele[1] in res_dict[ele[0]].keys():
-                            res_dict[ele[0]][ele[1]] = {}
-                        res_dict[ele[0]][ele[1]][ele[2]] = {ele[_info]: ele[_info + 1] for _info in range(1, len(ele[1:]), 2)}
-                    else:
-                        res_dict[ele[0]][ele[1]] = ele[2]
-
-    logger.info("result dict: %s", res_dict)
+    res_dict = build_csv_dict(iter_csv_records(path))
+    logger.debug("read %d entries from %s", len(res_dict), path)
     return res_dict
 
 
@@ -224,34 +239,15 @@ def sbom_json(_file_path, _analysis_id):
     json_data = read_cyclone_dx_json(_file_path)
     sbom_uuid = json_data['serialNumber'].split(":")[2]
     logger.debug("Reading sbom uuid=%s", sbom_uuid)
-    sbom_obj, created_sbom = SoftwareBillOfMaterial.objects.get_or_create(id=sbom_uuid)
-    logger.debug("SBOM with uuid %s created", sbom_obj.id)
-    logger.debug("setting File path  to: %s", _file_path)
-    sbom_obj.file = _file_path
-    if created_sbom:
-        logger.debug("Trying to read %s", json_data['components'])
-        for component_ in json_data['components']:
-            logger.debug("Component is %s", component_)
-            try:
-                new_sitem, add_sitem = SoftwareInfo.objects.get_or_create(
-                    id=component_['bom-ref'],
-                    name=component_['name'],
-                    type=component_['type'],
-                    supplier=component_['supplier'] or 'NA',
-                    license=json.dumps(component_['licenses']) or 'NA',
-                    group=component_['group'] or 'NA',
-                    version=component_['version'] or 'NA',
-                    hashes=[f"{json.dumps(entry)}" for entry in component_['hashes']],
-                    cpe=component_['cpe'] or 'NA',
-                    purl=component_['purl'] or 'NA',
-                    properties=component_['properties'] or 'NA'
-                )
-                logger.debug("Was new? %s", add_sitem)
-                logger.debug("Adding SBOM item: %s to sbom %s", new_sitem, sbom_obj)
-                sbom_obj.component.add(new_sitem)
-            except builtins.Exception as error_:
-                logger.error("Error in sbom readin: %s", error_)
-    sbom_obj.save()
+    # a failed read-in leaves no half imported sbom behind
+    with transaction.atomic():
+        sbom_obj, created_sbom = SoftwareBillOfMaterial.objects.get_or_create(id=sbom_uuid)
+        logger.debug("SBOM with uuid %s created", sbom_obj.id)
+        logger.debug("setting File path  to: %s", _file_path)
+        sbom_obj.file = _file_path
+        if created_sbom:
+            sbom_components(sbom_obj, json_data['components'])
+        sbom_obj.save()
     res, _ = Result.objects.get_or_create(
         firmware_analysis=FirmwareAnalysis.objects.get(id=_analysis_id),
     )
@@ -261,6 +257,67 @@ def sbom_json(_file_path, _analysis_id):
     return res
 
 
+def software_info(component_):
+    """
+    maps a CycloneDX component to an unsaved SoftwareInfo, raises for invalid components
+    """
+    sitem = SoftwareInfo(
+        id=uuid.UUID(component_['bom-ref']),
+        name=component_['name'],
+        type=component_['type'],
+        # optional in CycloneDX
+        supplier=component_.get('supplier') or 'NA',
+        license=json.dumps(component_['licenses']) if component_.get('licenses') else 'NA',
+        group=component_.get('group') or 'NA',
+        version=component_.get('version') or 'NA',
+        hashes=str([f"{json.dumps(entry)}" for entry in component_.get('hashes', [])]),
+        cpe=component_.get('cpe') or 'NA',
+        purl=component_.get('purl') or 'NA',
+        properties=component_.get('properties') or 'NA'
+    )
+    # one bad row must not fail the whole bulk insert
+    for field in SoftwareInfo._meta.concrete_fields:
+        value = getattr(sitem, field.attname)
+        if field.get_internal_type() == 'CharField' and len(str(value)) > field.max_length:
+            raise ValueError(f"{field.name} is longer than {field.max_length} characters")
+    return sitem
+
+
+def sbom_components(sbom_obj, components):
+    """
+    stores the components of a new sbom with set based inserts,
+    existing components (same bom-ref) are only linked
+    :return: number of linked components
+    """
+    start = time.monotonic()
+    sitems = {}
+    for component_ in components:
+        try:
+            sitem = software_info(component_)
+        except (KeyError, TypeError, ValueError, AttributeError) as error_:
+            logger.error("Error in sbom readin: %s", error_)
+            continue
+        sitems.setdefault(sitem.id, sitem)
+    existing = set()
+    ids = list(sitems)
+    for offset in range(0, len(ids), SBOM_BATCH_SIZE):
+        existing.update(SoftwareInfo.objects.filter(id__in=ids[offset:offset + SBOM_BATCH_SIZE]).values_list('id', flat=True))
+    new_sitems = [sitem for sitem_id, sitem in sitems.items() if sitem_id not in existing]
+    SoftwareInfo.objects.bulk_create(new_sitems, batch_size=SBOM_BATCH_SIZE, ignore_conflicts=True)
+    through = SoftwareBillOfMaterial.component.through
+    through.objects.bulk_create(
+        [through(softwarebillofmaterial_id=sbom_obj.id, softwareinfo_id=sitem_id) for sitem_id in ids],
+        batch_size=SBOM_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    duration = time.monotonic() - start
+    logger.info(
+        "Imported %d SBOM components (%d new) of %s in %.2fs (%.0f components/s)",
+        len(ids), len(new_sitems), sbom_obj.id, duration, len(ids) / duration if duration > 0 else len(ids)
+    )
+    return len(ids)
+
+
 def read_cyclone_dx_json(_file_path):
     """
     returns json
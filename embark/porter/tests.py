@@ -1,7 +1,24 @@
-# __copyright__ = 'Copyright 2022-2026 Siemens Energy AG'
-# __author__ = 'Benedikt Kuehne'
-# __license__ = 'MIT'
-#
+__copyright__ = 'Copyright 2022-2026 Siemens Energy AG'
+__author__ = 'Benedikt Kuehne'
+__license__ = 'MIT'
+
+import logging
+import os
+import tempfile
+import time
+
+from unittest import skipIf
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+from dashboard.models import SoftwareBillOfMaterial, SoftwareInfo
+from porter.importer import build_csv_dict, iter_csv_records, read_csv, read_cyclone_dx_json, sbom_components, sbom_json
+from uploader.models import FirmwareAnalysis
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
 # import json
 # import logging
 # import os
@@ -71,3 +88,69 @@
 #             self.assertNotEqual(str(messages[0]), 'form invalid')
 #         except FileNotFoundError as exce:
 #             print(f"Test file is not in folder, skipping...{exce}")
+
+
+class TestCsvReader(SimpleTestCase):
+
+    def setUp(self):
+        self.f50_csv = os.path.join(settings.BASE_DIR.parent, "test/porter/f50_test.csv")
+        self.tmp_dir = tempfile.TemporaryDirectory()   # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write_csv(self, lines):
+        path = os.path.join(self.tmp_dir.name, "test.csv")
+        with open(path, "w", encoding="utf-8") as csv_file:
+            for line in lines:
+                csv_file.write(line + "\n")
+        return path
+
+    def test_f50(self):
+        res_dict = read_csv(self.f50_csv)
+        self.assertEqual(res_dict['files'], '1099')
+        self.assertEqual(res_dict['os_verified'], 'Linux / v2.6.33.2')
+        self.assertEqual(res_dict['kernel_verified'], {'131': '0'})
+        self.assertEqual(len(res_dict['strcpy_bin']), 10)
+        self.assertEqual(res_dict['strcpy_bin']['igmpproxy'], '37')
+        self.assertEqual(res_dict['system_bin']['logd'], '2')
+
+    def test_records(self):
+        path = self.write_csv(["key;value;NA;NA;", "", "only;NA;;", "key;other", "nested;sub;a;b;c;d"])
+        self.assertEqual(list(iter_csv_records(path)), [['key', 'value'], ['only'], ['key', 'other'], ['nested', 'sub', 'a', 'b', 'c', 'd']])
+        self.assertEqual(read_csv(path), {'key': 'value', 'nested': {'sub': {'a': {'sub': 'a', 'b': 'c'}}}})
+
+    def test_large_input(self):
+        records = [['strcpy_bin', f'bin{row}', str(row)] for row in range(80000)]
+        self.assertEqual(len(build_csv_dict(records)['strcpy_bin']), 80000)
+        path = self.write_csv(f"system_bin;bin{row};{row};NA;NA;NA;" for row in range(80000))
+        self.assertEqual(len(read_csv(path)['system_bin']), 80000)
+
+    @skipIf(os.environ.get('EMBARK_BENCHMARK') != "1", "Wall-clock benchmark, set EMBARK_BENCHMARK=1 to run it")
+    def test_benchmark(self):
+        """
+        the reader has to stay linear in the number of rows
+        """
+        timings = {}
+        for rows in (20000, 80000):
+            records = [['strcpy_bin', f'bin{row}', str(row)] for row in range(rows)]
+            start = time.perf_counter()
+            build_csv_dict(records)
+            timings[rows] = time.perf_counter() - start
+            logger.info("build_csv_dict: %d rows in %.3fs", rows, timings[rows])
+        # 4 times the rows, quadratic growth would be 16 times slower
+        self.assertLess(timings[80000], timings[20000] * 10 + 0.05)
+
+
+class TestSbomImport(TestCase):
+
+    def test_sbom_json(self):
+        sbom_file = os.path.join(settings.BASE_DIR.parent, "test/porter/EMBA_cyclonedx_sbom.json")
+        analysis = FirmwareAnalysis.objects.create(user=User.objects.create(username='test-sbom'))
+        result = sbom_json(sbom_file, analysis.id)
+        self.assertEqual(str(result.sbom.id), "ab5fec85-060a-4b1b-9750-836bcfefc04b")
+        self.assertEqual(result.sbom.component.count(), 165)
+
+        # a second sbom with the same components only links them
+        other = SoftwareBillOfMaterial.objects.create()
+        sbom_components(other, read_cyclone_dx_json(sbom_file)['components'])
+        self.assertEqual(other.component.count(), 165)
+        self.assertEqual(SoftwareInfo.objects.count(), 165)
@@ -20,7 +20,6 @@ from uploader.boundedexecutor import BoundedExecutor
 from uploader.forms import DeviceForm, LabelForm, VendorForm
 from uploader.models import FirmwareAnalysis
 from porter.exporter import result_json
-from porter.importer import result_read_in
 from porter.models import LogZipFile
 from porter.forms import FirmwareAnalysisImportForm, FirmwareAnalysisExportForm, DeleteZipForm, RetryImportForm
 
@@ -234,16 +233,12 @@ def retry_import(request):
             return redirect('..')
         # trying to re-import
         logger.info("Importing analysis with %s", analysis.id)
-        # TODO
-        if result_read_in(analysis.id) is not None:
-            analysis.finished = True
-            analysis.failed = False
-            analysis.save(update_fields=["finished", "failed"])
+        if BoundedExecutor.submit_retry_import(analysis.id) is not None:
             # success
             logger.info("Successfully submitted for re-import %s", analysis.id)
             messages.info(request, 'import submitted for ' + str(analysis.id))
             return redirect('..')
-        messages.error(request, 're-import failed')
+        messages.error(request, 're-import failed, queue full?')
         return redirect('..')
     messages.error(request, 'form invalid')
     return HttpResponseBadRequest("invalid form")
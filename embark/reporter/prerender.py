@@ -0,0 +1,216 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+import builtins
+import gzip
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template import engines
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+
+from embark.helper import serve_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_DIR = "html_cache"     # next to emba_logs, not part of the exported zip
+REPORT_CONTENT_TYPE = "text/html; charset=utf-8"
+TEMPLATE_CACHE_SIZE = 32
+PRERENDER_WORKERS = min(8, os.cpu_count() or 1)
+TEXT_SUFFIXES = {".html", ".txt", ".css", ".js"}
+# precompressed variants, preferred in this order
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")] if brotli is not None else [("gzip", ".gz")]
+
+
+def report_root(analysis_id) -> Path:
+    return Path(f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_logs/html-report")
+
+
+def cache_root(analysis_id) -> Path:
+    return Path(f"{settings.EMBA_LOG_ROOT}/{analysis_id}/{REPORT_CACHE_DIR}")
+
+
+def report_context() -> dict:
+    return {'embarkBackUrl': reverse('embark-ReportDashboard')}
+
+
+def read_page(page_path) -> str:
+    """
+    reads a report page, pages that aren't valid utf-8 (not normalized yet) are read as latin-1
+    """
+    with open(page_path, "rb") as page_file:
+        data = page_file.read()
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        logger.warning("%s is not utf-8, reading it as latin-1", page_path)
+        return data.decode("latin-1")
+
+
+def _write(target, data):
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "wb") as target_file:
+        target_file.write(data)
+    os.replace(tmp_path, target)
+
+
+def normalize_file(file_path) -> bool:
+    """
+    transcodes a latin-1 file to utf-8, the file is replaced atomically
+
+    :param file_path: path of a text file of the html-report
+    :return: True if the file was transcoded
+    """
+    try:
+        with open(file_path, "rb") as source_file:
+            data = source_file.read()
+        try:
+            data.decode("utf-8")
+            return False
+        except UnicodeDecodeError:
+            pass
+        _write(file_path, data.decode("latin-1").encode("utf-8"))
+        logger.debug("Transcoded %s from latin-1 to utf-8", file_path)
+        return True
+    except OSError as error:
+        logger.error("Could not normalize the encoding of %s: %s", file_path, error)
+        return False
+
+
+def normalize_report(analysis_id) -> int:
+    """
+    import stage, transcodes all text files of the html-report that aren't utf-8 (in parallel)
+
+    :param analysis_id: primary key for firmware-analysis entry
+    :return: number of transcoded files
+    """
+    files = [path for path in report_root(analysis_id).rglob("*") if path.suffix in TEXT_SUFFIXES and path.is_file()]
+    with ThreadPoolExecutor(max_workers=PRERENDER_WORKERS, thread_name_prefix="normalize") as pool:
+        transcoded = sum(pool.map(normalize_file, files))
+    logger.info("Transcoded %d of %d report files of %s to utf-8", transcoded, len(files), analysis_id)
+    return transcoded
+
+
+def prerender_page(analysis_id, page_path) -> bool:
+    """
+    renders one report page with the back link and stores it as utf-8 with its compressed variants
+
+    :param analysis_id: primary key for firmware-analysis entry
+    :param page_path: path of the page inside the html-report
+    :return: True on success
+    """
+    relative_path = Path(page_path).relative_to(report_root(analysis_id))
+    target = cache_root(analysis_id) / relative_path
+    try:
+        content = engines['django'].from_string(read_page(page_path)).render(report_context()).encode("utf-8")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # variants first, the plain page marks the cache entry as complete
+        _write(f"{target}.gz", gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(f"{target}.br", brotli.compress(content, mode=brotli.MODE_TEXT))
+        _write(target, content)
+        return True
+    except builtins.Exception as error:
+        logger.error("Could not prerender %s: %s", page_path, error)
+        return False
+
+
+def prerender_report(analysis_id) -> int:
+    """
+    post-import stage, prerenders all pages of the html-report of an analysis
+
+    :param analysis_id: primary key for firmware-analysis entry
+    :return: number of prerendered pages
+    """
+    pages = list(report_root(analysis_id).rglob("*.html"))
+    if not pages:
+        logger.info("No html-report to prerender for %s", analysis_id)
+        return 0
+    with ThreadPoolExecutor(max_workers=PRERENDER_WORKERS, thread_name_prefix="prerender") as pool:
+        rendered = sum(pool.map(lambda page: prerender_page(analysis_id, page), pages))
+    logger.info("Prerendered %d of %d report pages of %s", rendered, len(pages), analysis_id)
+    return rendered
+
+
+def import_report(analysis_id):
+    """
+    post-import stages of the html-report, runs after the read-in of the results
+
+    :param analysis_id: primary key for firmware-analysis entry
+    """
+    normalize_report(analysis_id)
+    prerender_report(analysis_id)
+
+
+def cached_page(analysis_id, page_path):
+    """
+    :return: path of the prerendered page, None if missing or older than the page
+    """
+    try:
+        target = cache_root(analysis_id) / Path(page_path).relative_to(report_root(analysis_id))
+        if target.stat().st_mtime_ns >= os.stat(page_path).st_mtime_ns:
+            return target
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def accepted_encodings(header) -> set:
+    encodings = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _compiled_template(page_path, _mtime_ns, _size):
+    return engines['django'].from_string(read_page(page_path))
+
+
+def render_page(request, page_path):
+    """
+    dynamic rendering for pages without a prerendered copy, compiled templates are kept in a LRU
+    """
+    stat = os.stat(page_path)
+    template = _compiled_template(str(page_path), stat.st_mtime_ns, stat.st_size)
+    return HttpResponse(template.render(report_context(), request), content_type=REPORT_CONTENT_TYPE)
+
+
+def serve_page(request, analysis_id, page_path):
+    """
+    serves a report page, the prerendered and precompressed copy if there is one
+
+    :param request: HTTP request
+    :param analysis_id: primary key for firmware-analysis entry
+    :param page_path: path of the page inside the html-report, has to be checked by the caller
+    :return: response
+    """
+    target = cached_page(analysis_id, page_path)
+    if target is None:
+        return render_page(request, page_path)
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    for encoding, suffix in ENCODINGS:
+        variant = f"{target}{suffix}"
+        if encoding in accepted and os.path.isfile(variant):
+            response = serve_file(request, variant, content_type=REPORT_CONTENT_TYPE)
+            response['Content-Encoding'] = encoding
+            break
+    else:
+        response = serve_file(request, target, content_type=REPORT_CONTENT_TYPE)
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -2,13 +2,20 @@ __copyright__ = 'Copyright 2025 The AMOS Projects'
 __author__ = 'Luka Dekanozishvili'
 __license__ = 'MIT'
 
+import os
 import secrets
+import shutil
 from http import HTTPStatus
+from pathlib import Path
 from django.test import TestCase
-from django.test import Client
+from django.test import Client, RequestFactory
+from django.db.models import Sum
 
+from dashboard.models import Result, ResultSummary, backfill_cve_counts
+from embark.helper import serve_file
+from reporter.prerender import cache_root, normalize_report, prerender_report, serve_page
 from users.models import User
-from uploader.models import FirmwareAnalysis, LogZipFile
+from uploader.models import AnalysisProgressEvent, FirmwareAnalysis, LogZipFile
 
 
 class TestReporter(TestCase):
@@ -126,3 +133,157 @@ class TestReporter(TestCase):
             '/status_report/invalid_uuid',
         )
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_progress_events_cursor(self):
+        for module in ['P02_firmware_bin_file_check', 'P55_unblob_extractor', 'S05_firmware_details']:
+            AnalysisProgressEvent.objects.create(analysis=self.analysis1, event_type=AnalysisProgressEvent.MODULE_FINISHED, module=module)
+
+        response = self.regular_client.get(f'/progress_events/{self.analysis1.id}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        events = response.json()['events']
+        self.assertEqual([event['module'] for event in events], ['P02_firmware_bin_file_check', 'P55_unblob_extractor', 'S05_firmware_details'])
+
+        cursor = events[1]['id']
+        response = self.regular_client.get(f'/progress_events/{self.analysis1.id}?after={cursor}')
+        self.assertEqual([event['module'] for event in response.json()['events']], ['S05_firmware_details'])
+        self.assertEqual(response.json()['cursor'], events[2]['id'])
+
+        # other users may not read them
+        response = self.regular_client.get(f'/progress_events/{self.analysis3.id}')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_log_search(self):
+        self.analysis2.create_log_dir()
+        log_dir = Path(self.analysis2.path_to_logs).parent
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        with open(log_dir / "emba_run.log", "wb") as log_file:
+            for line in range(20):
+                log_file.write(b"[-] \x1b[31mError\x1b[0m in module\n" if line % 5 == 0 else b"[*] all fine\n")
+
+        response = self.regular_client.get(f'/log_search/{self.analysis2.id}?q=error&ignore_case=1&whole_word=1&limit=2')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual([match['line'] for match in response.json()['matches']], [0, 5])
+        self.assertEqual(response.json()['matches'][0]['text'], '[-] Error in module')
+
+        response = self.regular_client.get(f'/log_search/{self.analysis2.id}?q=error&ignore_case=1&after={response.json()["next"]}')
+        self.assertEqual([match['line'] for match in response.json()['matches']], [10, 15])
+        self.assertIsNone(response.json()['next'])
+
+        response = self.regular_client.get(f'/log_search/{self.analysis2.id}?q=(&regex=1')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_serve_file(self):
+        self.analysis2.create_log_dir()
+        log_dir = Path(self.analysis2.path_to_logs).parent
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        file_path = log_dir / "style.css"
+        file_path.write_bytes(b"0123456789")
+        factory = RequestFactory()
+
+        response = serve_file(factory.get('/'), file_path, content_type="text/css", max_age=60)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertIn('max-age=60', response['Cache-Control'])
+        etag = response['ETag']
+        response.close()
+
+        response = serve_file(factory.get('/', HTTP_IF_NONE_MATCH=etag), file_path)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        response = serve_file(factory.get('/', HTTP_RANGE='bytes=2-5'), file_path)
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+
+        response = serve_file(factory.get('/', HTTP_RANGE='bytes=-3'), file_path)
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        response = serve_file(factory.get('/', HTTP_RANGE='bytes=20-'), file_path)
+        self.assertEqual(response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        # stale If-Range, the whole file is sent
+        response = serve_file(factory.get('/', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outdated"'), file_path)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response.close()
+
+    def test_report_prerender(self):
+        self.analysis2.create_log_dir()
+        log_dir = Path(self.analysis2.path_to_logs).parent
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        report_dir = Path(self.analysis2.path_to_logs) / "html-report"
+        (report_dir / "p99").mkdir(parents=True)
+        page = report_dir / "p99" / "page.html"
+        page.write_bytes(b'<a href="{{ embarkBackUrl }}">back</a> caf\xe9')
+        factory = RequestFactory()
+
+        self.assertEqual(prerender_report(self.analysis2.id), 1)
+        rendered = (cache_root(self.analysis2.id) / "p99" / "page.html").read_text(encoding="utf-8")
+        self.assertNotIn("embarkBackUrl", rendered)
+        self.assertIn("caf\u00e9", rendered)
+
+        response = serve_page(factory.get('/', HTTP_ACCEPT_ENCODING='gzip'), self.analysis2.id, page)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response.close()
+
+        # pages changed after the import are rendered again
+        page.write_text('{{ embarkBackUrl }} new', encoding="utf-8")
+        os.utime(page, ns=(page.stat().st_mtime_ns + 10**9, page.stat().st_mtime_ns + 10**9))
+        response = serve_page(factory.get('/'), self.analysis2.id, page)
+        self.assertTrue(response.content.endswith(b' new'))
+        self.assertNotIn(b'embarkBackUrl', response.content)
+
+    def test_report_normalize(self):
+        self.analysis2.create_log_dir()
+        log_dir = Path(self.analysis2.path_to_logs).parent
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        report_dir = Path(self.analysis2.path_to_logs) / "html-report"
+        report_dir.mkdir(parents=True)
+        (report_dir / "latin.html").write_bytes(b'caf\xe9')
+        (report_dir / "utf8.html").write_bytes('café'.encode("utf-8"))
+        (report_dir / "image.png").write_bytes(b'\x89PNG\xff')
+
+        self.assertEqual(normalize_report(self.analysis2.id), 1)
+        self.assertEqual((report_dir / "latin.html").read_text(encoding="utf-8"), 'café')
+        self.assertEqual((report_dir / "utf8.html").read_text(encoding="utf-8"), 'café')
+        self.assertEqual((report_dir / "image.png").read_bytes(), b'\x89PNG\xff')
+        self.assertEqual(normalize_report(self.analysis2.id), 0)
+
+    def test_result_summary(self):
+        Result.objects.create(firmware_analysis=self.analysis2, os_verified='Linux', files=10, cve_high='["3", "2"]', strcpy_bin='{"busybox": "4"}')
+        summary = ResultSummary.get_summary()
+        self.assertEqual(summary.total_firmwares, 1)
+
+        # incremental updates
+        result = Result.objects.create(firmware_analysis=self.analysis3, os_verified='Linux', files=5, cve_high='["1", "1"]', strcpy_bin='{"busybox": "1", "httpd": "2"}')
+        result.files = 6
+        result.save()
+        data = ResultSummary.get_summary().data()
+        self.assertEqual(data['total_firmwares'], 2)
+        self.assertEqual(data['files'], {'sum': 16, 'count': 2, 'mean': 8})
+        self.assertEqual(data['cve_high']['sum'], 4)
+        self.assertEqual(data['os_verified'], {'Linux': 2})
+        self.assertEqual(data['top_strcpy_bins'], {'busybox': 5, 'httpd': 2})
+
+        result.delete()
+        data = ResultSummary.get_summary().data()
+        self.assertEqual(data['total_firmwares'], 1)
+        self.assertEqual(data['files']['sum'], 10)
+        self.assertEqual(data['top_strcpy_bins'], {'busybox': 4})
+        self.assertEqual(ResultSummary.rebuild().data(), data)
+
+    def test_cve_columns(self):
+        result = Result.objects.create(firmware_analysis=self.analysis2, cve_high='["614", "17"]')
+        self.assertEqual((result.cve_high_count, result.cve_high_bins), (614, 17))
+        self.assertEqual(result.cve_low_count, 0)
+
+        Result.objects.filter(pk=result.pk).update(cve_high_count=None, cve_high_bins=None)
+        # a migrate without dashboard migrations doesn't scan the results
+        self.assertEqual(backfill_cve_counts(plan=[]), 0)
+        self.assertEqual(backfill_cve_counts(), 1)
+        result.refresh_from_db()
+        self.assertEqual((result.cve_high_count, result.cve_high_bins), (614, 17))
+
+        Result.objects.create(firmware_analysis=self.analysis3, cve_high='["6", "1"]')
+        self.assertEqual(Result.objects.aggregate(high=Sum('cve_high_count'))['high'], 620)
+        self.assertEqual(Result.objects.filter(cve_high_count__gt=100).count(), 1)
@@ -19,4 +19,6 @@ urlpatterns = [
     path('get_accumulated_reports/', views.get_accumulated_reports, name='embark-get-accumulated-reports'),
     path('download_zipped/<uuid:analysis_id>/', views.download_zipped, name='embark-download'),
     path('status_report/<uuid:analysis_id>', views.status_report, name='embark-status-report'),
+    path('progress_events/<uuid:analysis_id>', views.progress_events, name='embark-progress-events'),
+    path('log_search/<uuid:analysis_id>', views.log_search, name='embark-log-search'),
 ]
@@ -9,31 +9,29 @@ import json
 import os
 import logging
 
-from operator import itemgetter
 from http import HTTPStatus
 import re
-from shutil import move
-import codecs
-from uuid import UUID
 
 from django.conf import settings
 from django.forms import model_to_dict
-from django.shortcuts import redirect, render
+from django.shortcuts import redirect
 from django.contrib import messages
-from django.template.loader import get_template
 from django.http import HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required, permission_required
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse
-from embark.helper import cleanup_charfield, user_is_auth
+from embark.helper import serve_file, user_is_auth
+from embark.logsearch import SEARCH_PAGE, SEARCH_PAGE_MAX, SearchQuery, search_log
+from reporter.prerender import serve_page
 from uploader.boundedexecutor import BoundedExecutor
 
-from uploader.models import FirmwareAnalysis, ResourceTimestamp
-from dashboard.models import Result
+from uploader.models import AnalysisProgressEvent, AnalysisQueueEntry, FirmwareAnalysis, ResourceTimestamp
+from dashboard.models import Result, ResultSummary
 
 from users.decorators import require_api_key
 
-BLOCKSIZE = 1048576     # for codec change
+REPORT_RESOURCE_MAX_AGE = 86400     # s, report styles and images don't change after the run
+PROGRESS_EVENT_LIMIT = 500
 
 
 logger = logging.getLogger(__name__)
@@ -54,9 +52,8 @@ def html_report(request, analysis_id, html_file):
     if FirmwareAnalysis.objects.filter(id=analysis_id).exists() and bool(re.match(html_file_pattern, html_file)):
         analysis = FirmwareAnalysis.objects.get(id=analysis_id)
         if user_is_auth(request.user, analysis.user):
-            html_body = get_template(str(report_path))
             logger.debug("html_report - analysis_id: %s html_file: %s", analysis_id, html_file)
-            return HttpResponse(html_body.render({'embarkBackUrl': reverse('embark-ReportDashboard')}))
+            return serve_page(request, analysis_id, report_path)
         messages.error(request, "User not authorized")
     logger.error("could  not get template - %s", request)
     return redirect("..")
@@ -79,39 +76,18 @@ def html_report_path(request, analysis_id, html_path, file):
             parent_path = os.path.abspath(f'{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_logs/html-report/')
             if os.path.commonpath([parent_path, resource_path]) == parent_path:
                 if file.endswith(".tar.gz"):
-                    content_type = "text/plain"
                     try:
-                        with open(resource_path, 'rb') as requested_file:
-                            response = HttpResponse(requested_file.read(), content_type=content_type)
-                            response['Content-Disposition'] = f'attachment; filename="{file}"'
-                            logger.info("html_report - analysis_id: %s html_path: %s download_file: %s", analysis_id, html_path, resource_path)
-                            return response
+                        response = serve_file(request, resource_path, content_type="application/gzip", filename=file, as_attachment=True)
+                        logger.info("html_report - analysis_id: %s html_path: %s download_file: %s", analysis_id, html_path, resource_path)
+                        return response
                     except FileNotFoundError:
                         messages.error(request, "File not found on the server")
                         logger.error("Couldn't find %s", resource_path)
                         return redirect("embark-ReportDashboard")
 
                 elif file.endswith(".html"):
-                    content_type = "text/html"
                     logger.debug("html_report - analysis_id: %s path: %s html_file: %s", analysis_id, html_path, file)
-                    try:
-                        return render(request, resource_path, {'embarkBackUrl': reverse('embark-ReportDashboard')}, content_type=content_type)
-                    except UnicodeDecodeError as decode_error:
-                        logger.error("{%s} with error: %s", resource_path, decode_error)
-                        # removes all non utf8 chars from html USING: https://stackoverflow.com/questions/191359/how-to-convert-a-file-to-utf-8-in-python
-                        # CodeQL issue is not relevant
-                        with codecs.open(resource_path, "r", encoding='latin1') as source_file:
-                            with codecs.open(f'{resource_path}.new', "w", "utf-8") as target_file:
-                                while True:
-                                    contents = source_file.read(BLOCKSIZE)
-                                    if not contents:
-                                        break
-                                    target_file.write(contents)
-                        # exchange files
-                        move(resource_path, f'{resource_path}.old')
-                        move(f'{resource_path}.new', resource_path)
-                        logger.debug("Removed problematic char from %s", resource_path)
-                        return render(request, resource_path, {'embarkBackUrl': reverse('embark-ReportDashboard')}, content_type=content_type)
+                    return serve_page(request, analysis_id, resource_path)
                 messages.error(request, "Can't server that file")
                 logger.error("Server can't handle that file - %s", request)
                 return redirect("embark-ReportDashboard")
@@ -150,8 +126,7 @@ def html_report_resource(request, analysis_id, img_file):
 
                 try:
                     # CodeQL issue is not relevant as the urls are defined via urls.py
-                    with open(resource_path, "rb") as file_:
-                        return HttpResponse(file_.read(), content_type=content_type)
+                    return serve_file(request, resource_path, content_type=content_type, max_age=REPORT_RESOURCE_MAX_AGE)
                 except IOError as error:
                     logger.error(error)
                     logger.error(request.path)
@@ -222,83 +197,8 @@ def get_accumulated_reports(request):
             'all int fields in Result Model': {'sum': float/int, 'count': int, 'mean': float/int}
         }
     """
-    results = Result.objects.all()
-    charfields = ['os_verified', 'architecture_verified']
-    data = {}
-    strcpy_bins = {}
-    system_bin_dict = {}
-    for result in results:
-        result = model_to_dict(result)
-        # Pop all unnecessary data
-        result.pop('vulnerability', None)   # FIXME this is disabled for now
-        result.pop('firmware', None)
-        result.pop('emba_command', None)
-        result.pop('date', None)
-
-        # architecture FIXME
-        # architecture = result.pop('architecture_verified', '{}')
-        # if isinstance(architecture, dict):
-        #     # clean-up for architecture descriptions
-        #     for key_, value_ in architecture.items():
-        #         if value_.lower() == 'el':
-        #             data['architecture_verified'] += f"{key_}-Little Endian "
-        #         elif value_.lower() == 'eb':
-        #             data['architecture_verified'] += f"{key_}-Big Endian "
-        #         else:
-        #             data['architecture_verified'] += f"{key_}-{value_} "
-        # else:
-        #     data['architecture_verified'] = str(architecture)
-
-        # Get counts for all strcpy_bin and system_bin values
-        system_bin = json.loads(result.pop('system_bin', '{}'))
-        strcpy_bin = json.loads(result.pop('strcpy_bin', '{}'))
-        for key in strcpy_bin:
-            if key not in strcpy_bins:
-                strcpy_bins[key] = 0
-            strcpy_bins[key] += int(strcpy_bin[key])
-        for key in system_bin:
-            if key not in system_bin_dict:
-                system_bin_dict[key] = 0
-            system_bin_dict[key] += int(system_bin[key])
-
-        # os_verified
-        for charfield in charfields:
-            charfield = cleanup_charfield(charfield)
-            if charfield not in data:
-                data[charfield] = {}
-            value = result.pop(charfield)
-            if value not in data[charfield]:
-                data[charfield][value] = 0
-            data[charfield][value] += 1
-
-        for field in result:
-            if field not in data:
-                data[field] = {'sum': 0, 'count': 0}
-            data[field]['count'] += 1
-            logger.debug("result-field %s", result[field])
-            if result[field] is not None:
-                if isinstance(result[field], UUID):
-                    pass
-                elif field in ['cve_critical', 'cve_high', 'cve_medium', 'cve_low']:
-                    cve_value = json.loads(result[field])
-                    data[field]['sum'] += int(cve_value[0])
-                else:
-                    data[field]['sum'] += result[field]
-
-    for field in data:
-        if field not in charfields:
-            data[field]['mean'] = data[field]['sum'] / data[field]['count']
-    data['total_firmwares'] = len(results)
-
-    # Taking top 10 most commonly occurring strcpy_bin values
-    strcpy_bins = dict(sorted(strcpy_bins.items(), key=itemgetter(1), reverse=True)[:10])
-    data['top_strcpy_bins'] = strcpy_bins
-
-    # Taking top 10 occurring system binaries
-    system_bin_dict = dict(sorted(system_bin_dict.items(), key=itemgetter(1), reverse=True)[:10])
-    data['top_system_bins'] = system_bin_dict
-
-    return JsonResponse(data=data, status=HTTPStatus.OK)
+    # maintained by the Result signals, see dashboard.models.ResultSummary
+    return JsonResponse(data=ResultSummary.get_summary().data(), status=HTTPStatus.OK)
 
 
 @permission_required("users.reporter_permission", login_url='/')
@@ -320,10 +220,10 @@ def download_zipped(request, analysis_id):
         # look for LogZipFile
         if firmware.zip_file:
             logger.debug("searching for file here: %s", firmware.zip_file.file)
-            with open(firmware.zip_file.file.path, 'rb') as requested_log_dir:
-                response = HttpResponse(requested_log_dir.read(), content_type="application/zip")
-                response['Content-Disposition'] = 'inline; filename=' + str(firmware.id) + '.zip'
-                return response
+            try:
+                return serve_file(request, firmware.zip_file.file.path, content_type="application/zip", filename=f"{firmware.id}.zip")
+            except FileNotFoundError:
+                logger.error("Zip of %s is missing: %s", analysis_id, firmware.zip_file.file.path)
         logger.error("FirmwareAnalysis with ID: %s does exist, but doesn't have a valid zip in its directory", analysis_id)
         messages.error(request, "Logs couldn't be downloaded")
         return redirect('..')
@@ -421,6 +321,18 @@ def status_report(request, analysis_id):
                 }
                 response_status = HTTPStatus.OK
 
+        # Queued
+        elif not analysis.finished and AnalysisQueueEntry.objects.filter(analysis=analysis, dispatched=False).exists():
+            position = analysis.queue_entry.queue_position()
+            eta = BoundedExecutor.queue_eta(position)
+            response_data = {
+                "status": "queued",
+                "message": f"Analysis is queued at position {position}.",
+                "queue_position": position,
+                "eta": eta.total_seconds() if eta is not None else None,
+            }
+            response_status = HTTPStatus.ACCEPTED
+
         # Running
         elif not analysis.finished:
             response_data = {
@@ -474,3 +386,66 @@ def status_report(request, analysis_id):
 
     # Return the selected message
     return JsonResponse(response_data, status=response_status)
+
+
+@require_api_key
+@require_http_methods(["GET"])
+def progress_events(request, analysis_id):
+    """
+    Gets the progress events of the analysis newer than the cursor (?after=<event id>),
+    at most PROGRESS_EVENT_LIMIT per request. The returned cursor is used for the next request.
+    """
+    try:
+        analysis = FirmwareAnalysis.objects.get(id=analysis_id)
+    except FirmwareAnalysis.DoesNotExist:
+        return JsonResponse({"status": "error", "error": "The analysis with the provided UUID doesn't exist."}, status=HTTPStatus.NOT_FOUND)
+    if not analysis.user == request.api_user and not request.api_user.is_superuser:
+        return JsonResponse({"status": "forbidden", "error": "You're not allowed to access this resource."}, status=HTTPStatus.FORBIDDEN)
+    try:
+        cursor = int(request.GET.get("after", 0))
+    except ValueError:
+        return JsonResponse({"status": "error", "error": "Invalid cursor"}, status=HTTPStatus.BAD_REQUEST)
+
+    events = [event.to_dict() for event in AnalysisProgressEvent.objects.filter(analysis=analysis, id__gt=cursor).order_by('id')[:PROGRESS_EVENT_LIMIT]]
+    if events:
+        cursor = events[-1]["id"]
+    return JsonResponse({
+        "status": "ok",
+        "events": events,
+        "cursor": cursor,
+        "percentage": analysis.status.get("percentage", 0),
+        "finished": analysis.finished,
+        "failed": analysis.failed,
+    }, status=HTTPStatus.OK)
+
+
+@require_api_key
+@require_http_methods(["GET"])
+def log_search(request, analysis_id):
+    """
+    Searches the emba_run.log of the analysis (?q=<query>&regex=1&ignore_case=1&whole_word=1),
+    lines are counted from the start of the log. The returned cursor is passed as ?after= to get the next page.
+    """
+    try:
+        analysis = FirmwareAnalysis.objects.get(id=analysis_id)
+    except FirmwareAnalysis.DoesNotExist:
+        return JsonResponse({"status": "error", "error": "The analysis with the provided UUID doesn't exist."}, status=HTTPStatus.NOT_FOUND)
+    if not analysis.user == request.api_user and not request.api_user.is_superuser:
+        return JsonResponse({"status": "forbidden", "error": "You're not allowed to access this resource."}, status=HTTPStatus.FORBIDDEN)
+    log_file_path = f"{Path(analysis.path_to_logs).parent}/emba_run.log"
+    if not os.path.isfile(log_file_path):
+        return JsonResponse({"status": "error", "error": "The log file does not exist, yet."}, status=HTTPStatus.NOT_FOUND)
+    try:
+        query = SearchQuery(
+            request.GET.get("q", ""),
+            regex=request.GET.get("regex") == "1",
+            ignore_case=request.GET.get("ignore_case") == "1",
+            whole_word=request.GET.get("whole_word") == "1",
+        )
+        after = int(request.GET.get("after", 0))
+        limit = min(int(request.GET.get("limit", SEARCH_PAGE)), SEARCH_PAGE_MAX)
+    except ValueError as error:
+        return JsonResponse({"status": "error", "error": str(error)}, status=HTTPStatus.BAD_REQUEST)
+
+    result = search_log(log_file_path, query, after=after, limit=limit, final=analysis.finished)
+    return JsonResponse({"status": "ok", **result}, status=HTTPStatus.OK)
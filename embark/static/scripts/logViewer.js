@@ -4,7 +4,6 @@
 /* global analysis_id */
 
 import { AnsiUp } from '/static/external/scripts/ansi_up.js';
-import { Base64 } from '/static/external/scripts/base64.js';
 
 window.addEventListener(
   "load",
@@ -25,6 +24,9 @@ window.addEventListener(
     };
 
     var logArea = document.getElementById("logArea");
+    // raw text of the shown lines, appends are merged into it
+    var logContent = "";
+    var decoder = new TextDecoder("utf-8");
 
     function onError(evt) {
       console.log("error", evt);
@@ -34,18 +36,54 @@ window.addEventListener(
     var socket = new WebSocket(
       wsStart + location.hostname + wsPort + "/ws/logs/" + analysis_id
     );
+    socket.binaryType = "arraybuffer";
+
+    // keeps the last <limit> lines of the text
+    function lastLines(text, limit) {
+      var pos = text.length;
+      for (var i = 0; i < limit; i++) {
+        pos = text.lastIndexOf("\n", pos - 1);
+        if (pos < 0) {
+          return text;
+        }
+      }
+      return text.substring(pos + 1);
+    }
 
-    function onMessage(evt) {
-      var message = JSON.parse(evt.data);
+    function render() {
+      var fileContent = logContent + "\u00a0"; // The nbsp is required in order to preserve trailing newlines
 
-      if (message.file_view) {
-        var fileContent = Base64.decode(message.file_view.content); // We cannot use atob because of unicode (see https://stackoverflow.com/questions/30106476/using-javascripts-atob-to-decode-base64-doesnt-properly-decode-utf-8-strings)
-        fileContent = fileContent + "\u00a0"; // The nbsp is required in order to preserve trailing newlines
+      var ansi_up = new AnsiUp();
+      var coloredFileContent = ansi_up.ansi_to_html(fileContent);
+      logArea.innerHTML = coloredFileContent;
+    }
 
-        var ansi_up = new AnsiUp();
-        var coloredFileContent = ansi_up.ansi_to_html(fileContent);
-        logArea.innerHTML = coloredFileContent;
-        window.file_view = message.file_view;
+    function onMessage(evt) {
+      if (typeof evt.data === "string") {
+        var message = JSON.parse(evt.data);
+        if (message.error) {
+          onError(message.error);
+        } else if (message.search_results) {
+          onSearchResults(message.search_results);
+        } else if (message.search_done) {
+          onSearchDone(message.search_done);
+        }
+        return;
+      }
+      // binary frame: 4 byte header length, json header, raw log content
+      var headerLength = new DataView(evt.data).getUint32(0);
+      var header = JSON.parse(decoder.decode(new Uint8Array(evt.data, 4, headerLength)));
+      var content = decoder.decode(new Uint8Array(evt.data, 4 + headerLength));
+
+      if (header.type === "file_view") {
+        logContent = content;
+      } else if (header.type === "append") {
+        // the content starts with the last line we have, it may have grown
+        logContent = lastLines(logContent.substring(0, logContent.lastIndexOf("\n") + 1) + content, header.file_view.limit);
+      }
+      window.file_view = header.file_view;
+      if (header.type !== "num_lines") {
+        render();
       }
     }
 
@@ -59,12 +97,77 @@ window.addEventListener(
 
     function requestUpdate() {
       var requestView = Object.assign({}, window.file_view);
-      requestView.content = "";
       socket.send(
         JSON.stringify({ action: "change_view", file_view: requestView })
       );
     }
 
+    // search, lines of the results are counted from the start of the log
+    var searchResults = document.getElementById("logSearchResults");
+    var searchMore = document.getElementById("logSearchMore");
+    var searchRequest = null;
+    var searchId = 0;
+    var searchNext = null;
+
+    function sendSearch(after) {
+      searchId += 1;
+      searchNext = null;
+      searchMore.disabled = true;
+      socket.send(
+        JSON.stringify(Object.assign({ action: "search", search_id: searchId, after: after }, searchRequest))
+      );
+    }
+
+    function onSearchResults(results) {
+      if (results.search_id !== searchId) {
+        return;
+      }
+      results.matches.forEach(function (match) {
+        var item = document.createElement("li");
+        item.textContent = (match.line + 1) + ": " + match.text;
+        item.onclick = function () {
+          // show the line in the middle of the view
+          window.LogControls.set_offset(Math.max(0, window.file_view.num_lines - 1 - match.line - Math.floor(window.file_view.limit / 2)));
+        };
+        searchResults.appendChild(item);
+      });
+    }
+
+    function onSearchDone(done) {
+      if (done.search_id !== searchId) {
+        return;
+      }
+      if (done.error) {
+        var item = document.createElement("li");
+        item.textContent = done.error;
+        searchResults.appendChild(item);
+        return;
+      }
+      searchNext = done.next;
+      searchMore.disabled = searchNext === null;
+    }
+
+    window.LogSearch = {
+      start: function () {
+        searchRequest = {
+          query: document.getElementById("logSearchQuery").value,
+          regex: document.getElementById("logSearchRegex").checked,
+          ignore_case: document.getElementById("logSearchIgnoreCase").checked,
+          whole_word: document.getElementById("logSearchWholeWord").checked,
+        };
+        searchResults.innerHTML = "";
+        sendSearch(0);
+      },
+      more: function () {
+        if (searchNext !== null) {
+          sendSearch(searchNext);
+        }
+      },
+      cancel: function () {
+        socket.send(JSON.stringify({ action: "cancel_search" }));
+      },
+    };
+
     window.LogControls = {
       move_offset: function (lines) {
         window.file_view.offset += lines;
@@ -87,6 +190,9 @@ window.addEventListener(
     };
 
     function checkKey(e) {
+      if (e.target.tagName === "INPUT") {
+        return;
+      }
       if (e.shiftKey) {
         if (e.keyCode == "38") {
           // Arrow Up
@@ -107,6 +107,8 @@ var socket = new WebSocket(
 var module_array = [];
 var phase_array = [];
 var cur_len = 0;
+/* cursor of the last progress snapshot */
+var progressCursor = null;
 
 /**
  * called when a websocket connection is established
@@ -114,7 +116,7 @@ var cur_len = 0;
 socket.onopen = function () { 
     "use strict";
     console.log("[open] Connection established");
-    socket.send("Reload");
+    socket.send(JSON.stringify({"version": 2, "action": "subscribe", "cursor": progressCursor}));
 };
 
 
@@ -196,6 +198,13 @@ socket.onmessage = function (event) {
     "use strict";
     console.log("Received a update");
     var data = JSON.parse(event.data);
+    if (data.version == 2) {
+        // snapshot or delta of the changed analyses
+        if (data.cursor) {
+            progressCursor = data.cursor;
+        }
+        data = data.analyses;
+    }
     try{
         // for analysis in message create container
         for (const analysis_ in data){  // jshint ignore:line
@@ -103,32 +103,28 @@ def get_report_for_device(request, device_id):
             'cve_low',
             'exploits'
         ]
+        # typed Result columns in the order of label_list
+        columns = ['strcpy', 'cve_high_count', 'cve_medium_count', 'cve_low_count', 'exploits']
         data = []
         if not analysis_queryset:
             # FIXME
             messages.error(request, "there seems to be only failed analysis for this device")
             logger.debug("No firmware analysis available for this device")
             return redirect('embark-tracker')
+        result_values = {
+            row['firmware_analysis']: row
+            for row in Result.objects.filter(firmware_analysis__in=analysis_queryset).values('firmware_analysis', *columns)
+        }
         for _analysis in analysis_queryset:
             dataset = {}
             dataset['label'] = str(_analysis.version)
-            result_queryset = Result.objects.filter(firmware_analysis=_analysis)
-            logger.debug("result object: %s", result_queryset)
-            try:
-                if not result_queryset:
-                    logger.error("result empty for %s", str(_analysis.id))
-                    dataset['data'] = [0, 0, 0, 0, 0]
-                else:
-                    result_obj = result_queryset.first()  # should only be one obj
-                    data_list = []
-                    for _label in label_list:
-                        data_list.append(getattr(result_obj, _label))
-                    dataset['data'] = data_list
-                    logger.debug("result data: %s", dataset['data'])
-            except BaseException as excep:
+            row = result_values.get(_analysis.id)
+            if row is None:
                 logger.error("result empty for %s", str(_analysis.id))
                 dataset['data'] = [0, 0, 0, 0, 0]
-                logger.error("ERROR: %s", excep)
+            else:
+                dataset['data'] = [row[column] or 0 for column in columns]
+                logger.debug("result data: %s", dataset['data'])
             dataset['fill'] = "true"
             dataset['backgroundColor'] = rnd_rgb_full()
             dataset['borderColor'] = rnd_rgb_color()
@@ -18,7 +18,7 @@ from requests import RequestException
 
 from settings.helper import get_settings
 from uploader.settings import get_emba_base_cmd
-from embark.helper import get_emba_version, disk_space_check
+from embark.helper import get_emba_version, disk_space_check, emba_module_registry
 
 logger = get_task_logger(__name__)
 
@@ -139,6 +139,8 @@ def emba_update(option):
                 return_code = proc.wait()
             # success
             logger.info("Update Successful: %s", cmd)
+            # other processes notice the new git HEAD by themselves
+            emba_module_registry.invalidate()
             if return_code != 0:
                 raise BaseException("EMBA update has non zero exit-code")
         else:
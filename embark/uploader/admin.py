@@ -4,10 +4,13 @@ __license__ = 'MIT'
 
 from django.contrib import admin
 
-from uploader.models import FirmwareAnalysis, FirmwareFile, Device, Label, Vendor
+from uploader.models import AnalysisProgressEvent, AnalysisQueueEntry, AnalysisResourceUsage, FirmwareAnalysis, FirmwareFile, Device, Label, Vendor
 
 admin.site.register(FirmwareAnalysis)
 admin.site.register(Device)
 admin.site.register(FirmwareFile)   # TODO write bulk download action
 admin.site.register(Label)
 admin.site.register(Vendor)
+admin.site.register(AnalysisQueueEntry)
+admin.site.register(AnalysisProgressEvent)
+admin.site.register(AnalysisResourceUsage)
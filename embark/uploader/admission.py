@@ -0,0 +1,337 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+import builtins
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Sum
+from django.utils import timezone
+import psutil
+
+from embark.helper import get_size
+from uploader.models import AnalysisQueueEntry, AnalysisResourceUsage
+
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+
+PROFILE_SBOM = 'sbom'
+PROFILE_DEFAULT = 'default'
+PROFILE_USER_EMULATION = 'user_emulation'
+PROFILE_SYSTEM_EMULATION = 'system_emulation'
+
+HISTORY_SIZE = 20           # runs per profile the estimate learns from
+SAMPLE_INTERVAL = 5         # s, between two samples of the host and the running emba process trees
+# queue entries waiting longer than this stop smaller ones from overtaking them
+BACKFILL_WINDOW = timezone.timedelta(hours=1)
+
+
+@dataclass
+class ResourceCost:
+    cpu: float      # cores
+    memory: int     # bytes
+    disk: int       # bytes
+
+    def merge(self, other):
+        return ResourceCost(max(self.cpu, other.cpu), max(self.memory, other.memory), max(self.disk, other.disk))
+
+
+# lower bounds per profile, emba runs most of its tools inside docker and those processes
+# are not part of the sampled process tree, so the learned values alone would be too small
+PROFILE_COSTS = {
+    PROFILE_SBOM: ResourceCost(cpu=1, memory=1 * GIB, disk=1 * GIB),
+    PROFILE_DEFAULT: ResourceCost(cpu=2, memory=4 * GIB, disk=5 * GIB),
+    PROFILE_USER_EMULATION: ResourceCost(cpu=4, memory=6 * GIB, disk=10 * GIB),
+    PROFILE_SYSTEM_EMULATION: ResourceCost(cpu=4, memory=8 * GIB, disk=20 * GIB),
+}
+
+
+def analysis_profile(analysis) -> str:
+    """
+    maps the flags of an analysis to its resource profile, same order as construct_emba_command
+
+    :param analysis: FirmwareAnalysis object
+    :return: profile name
+    """
+    if analysis.sbom_only_test is True:
+        return PROFILE_SBOM
+    if analysis.system_emulation_test is True:
+        return PROFILE_SYSTEM_EMULATION
+    if analysis.user_emulation_test is True:
+        return PROFILE_USER_EMULATION
+    return PROFILE_DEFAULT
+
+
+def estimate_cost(analysis) -> ResourceCost:
+    """
+    resource estimate of an analysis, the maximum of the profile floor and the recent history
+
+    :param analysis: FirmwareAnalysis object
+    :return: ResourceCost
+    """
+    profile = analysis_profile(analysis)
+    cost = PROFILE_COSTS[profile]
+    history = AnalysisResourceUsage.objects.filter(profile=profile).order_by('-recorded_at')[:HISTORY_SIZE]
+    for usage in history:
+        cost = cost.merge(ResourceCost(usage.mean_cpu, usage.peak_memory, usage.disk_usage))
+    return cost
+
+
+def log_dir_size(analysis_id) -> int:
+    try:
+        return get_size(f"{settings.EMBA_LOG_ROOT}/{analysis_id}")
+    except OSError:
+        # files are created and removed while emba is running
+        return 0
+
+
+class RunningAnalysis:
+    """
+    Bookkeeping of one admitted analysis, the sampled usage shrinks its reservation
+    """
+
+    def __init__(self, analysis_id, profile, cost):
+        self.analysis_id = analysis_id
+        self.profile = profile
+        self.cost = cost
+        self.process = None
+        self.started = None
+        self.cpu_time = 0.0
+        self.peak_memory = 0
+        self.current_memory = 0
+        self.current_cpu = 0.0
+        self.disk_usage = 0
+        self.last_sample = None
+
+    def attach(self, pid):
+        try:
+            self.process = psutil.Process(pid)
+        except psutil.Error:
+            self.process = None
+        self.started = time.monotonic()
+        self.last_sample = (self.started, 0.0)
+
+    def sample(self):
+        """
+        sums up memory and cpu time of the whole emba process tree and the size of its log dir
+        """
+        if self.process is None:
+            return
+        try:
+            processes = [self.process] + self.process.children(recursive=True)
+        except psutil.Error:
+            return
+        memory = 0
+        cpu_time = 0.0
+        for process in processes:
+            try:
+                memory += process.memory_info().rss
+                times = process.cpu_times()
+                cpu_time += times.user + times.system + times.children_user + times.children_system
+            except psutil.Error:
+                continue
+        now = time.monotonic()
+        last_time, last_cpu_time = self.last_sample
+        self.cpu_time = max(self.cpu_time, cpu_time)
+        if now > last_time:
+            self.current_cpu = max(0.0, cpu_time - last_cpu_time) / (now - last_time)
+        self.last_sample = (now, cpu_time)
+        self.current_memory = memory
+        self.peak_memory = max(self.peak_memory, memory)
+        self.disk_usage = log_dir_size(self.analysis_id)
+
+    def reservation(self) -> dict:
+        """
+        part of the estimate not (yet) visible in the live reading, as AnalysisQueueEntry fields
+        """
+        return {
+            'reserved_cpu': max(0.0, self.cost.cpu - self.current_cpu),
+            'reserved_memory': max(0, self.cost.memory - self.current_memory),
+            'reserved_disk': max(0, self.cost.disk - self.disk_usage),
+        }
+
+    def mean_cpu(self):
+        if self.started is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started
+        return self.cpu_time / elapsed if elapsed > 0 else 0.0
+
+
+class AdmissionController:
+    """
+    Admits local emba runs as long as the projected cpu, memory and free disk stay within the configured ceilings
+    projected = live host reading + the part of the estimate each running analysis hasn't claimed yet
+    The reservations are stored on the dispatched AnalysisQueueEntry, so the runs of all processes count
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.running = {}       # analysis id -> RunningAnalysis
+        self.reading = None     # (cpu in cores, used memory, total memory, free disk), refreshed by the sampler
+        self.sampler = None
+
+    def read_host(self):
+        """
+        cpu in cores since the last call, used memory and free disk under EMBA_LOG_ROOT
+        """
+        cpu = psutil.cpu_percent(interval=None) / 100 * psutil.cpu_count()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(settings.EMBA_LOG_ROOT)
+        self.reading = (cpu, memory.total - memory.available, memory.total, disk.free)
+
+    def live_reading(self):
+        """
+        last host reading of the sampler, doesn't block the upload path
+        """
+        self._start_sampler()
+        if self.reading is None:
+            # sampler didn't run yet, memory and disk are cheap and the first cpu reading is 0
+            self.read_host()
+        return self.reading
+
+    @staticmethod
+    def outstanding():
+        """
+        resources reserved for the dispatched analyses of all processes but not (yet) visible in the live reading
+        """
+        reserved = AnalysisQueueEntry.objects.filter(dispatched=True).aggregate(
+            cpu=Sum('reserved_cpu'), memory=Sum('reserved_memory'), disk=Sum('reserved_disk')
+        )
+        return ResourceCost(reserved['cpu'] or 0.0, reserved['memory'] or 0, reserved['disk'] or 0)
+
+    def idle(self, analysis_id) -> bool:
+        """
+        True if no other analysis runs on this host, neither in this process nor in any other
+        """
+        if any(run_id != analysis_id for run_id in self.running):
+            return False
+        return not AnalysisQueueEntry.objects.filter(dispatched=True).exclude(analysis_id=analysis_id).exists()
+
+    def fits(self, cost) -> bool:
+        cpu, memory_used, memory_total, disk_free = self.live_reading()
+        outstanding = self.outstanding()
+        cpu_percent = (cpu + outstanding.cpu + cost.cpu) / psutil.cpu_count() * 100
+        memory_percent = (memory_used + outstanding.memory + cost.memory) / memory_total * 100
+        free_disk = disk_free - outstanding.disk - cost.disk
+        logger.debug("Projected load: cpu %.1f%%, memory %.1f%%, free disk %d bytes", cpu_percent, memory_percent, free_disk)
+        return (
+            cpu_percent <= settings.EMBA_ADMISSION_MAX_CPU_PERCENT
+            and memory_percent <= settings.EMBA_ADMISSION_MAX_MEMORY_PERCENT
+            and free_disk >= settings.EMBA_ADMISSION_MIN_FREE_DISK
+        )
+
+    def reserve(self, analysis, force=False) -> bool:
+        """
+        admits the analysis if its estimate fits, an idle host always admits one analysis
+
+        :param analysis: FirmwareAnalysis object
+        :param force: reserve without checking the ceilings (already running analyses)
+        :return: True if the analysis was admitted
+        """
+        analysis_id = str(analysis.id)
+        cost = estimate_cost(analysis)
+        with self.lock:
+            if analysis_id in self.running:
+                return True
+            if not force and not self.idle(analysis_id):
+                try:
+                    if not self.fits(cost):
+                        return False
+                except builtins.Exception as error:
+                    # don't block the queue because psutil failed
+                    logger.error("Admission check failed, admitting %s: %s", analysis_id, error)
+            self.running[analysis_id] = RunningAnalysis(analysis_id, analysis_profile(analysis), cost)
+        logger.info("Admitted %s (cpu %.1f cores, memory %d MiB, disk %d MiB)", analysis_id, cost.cpu, cost.memory // 2**20, cost.disk // 2**20)
+        return True
+
+    def reservation(self, analysis_id) -> dict:
+        """
+        current reservation of an admitted analysis as AnalysisQueueEntry fields, stored when the entry is dispatched
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :return: dict, empty if the analysis isn't admitted
+        """
+        with self.lock:
+            run = self.running.get(str(analysis_id))
+            return run.reservation() if run is not None else {}
+
+    def attach(self, analysis_id, pid):
+        """
+        starts sampling the process tree of an admitted analysis
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :param pid: pid of the emba process group leader
+        """
+        with self.lock:
+            run = self.running.get(str(analysis_id))
+            if run is None:
+                return
+            run.attach(pid)
+        self._start_sampler()
+
+    def release(self, analysis_id, record=False):
+        """
+        frees the reservation, the usage of successful runs is stored for later estimates
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :param record: store the sampled usage
+        """
+        with self.lock:
+            run = self.running.pop(str(analysis_id), None)
+        if run is None or not record or run.started is None:
+            return
+        try:
+            AnalysisResourceUsage.objects.update_or_create(
+                analysis_id=analysis_id,
+                defaults={
+                    'profile': run.profile,
+                    'peak_memory': run.peak_memory,
+                    'mean_cpu': run.mean_cpu(),
+                    'disk_usage': log_dir_size(analysis_id),
+                    'recorded_at': timezone.now(),
+                }
+            )
+        except builtins.Exception as error:
+            logger.error("Could not record the resource usage of %s: %s", analysis_id, error)
+        finally:
+            close_old_connections()
+
+    def _start_sampler(self):
+        with self.lock:
+            if self.sampler is None or not self.sampler.is_alive():
+                self.sampler = threading.Thread(target=self._sample_loop, name="admission", daemon=True)
+                self.sampler.start()
+
+    def _sample_loop(self):
+        # the only place doing the expensive readings, fits() uses the cached values
+        while True:
+            try:
+                self.read_host()
+            except builtins.Exception as error:
+                logger.error("Could not read the host load: %s", error)
+            with self.lock:
+                runs = [run for run in self.running.values() if run.process is not None]
+            for run in runs:
+                run.sample()
+                try:
+                    # publish the shrinking reservation for the admissions of the other processes
+                    AnalysisQueueEntry.objects.filter(analysis_id=run.analysis_id, dispatched=True).update(**run.reservation())
+                except builtins.Exception as error:
+                    logger.error("Could not store the reservation of %s: %s", run.analysis_id, error)
+            close_old_connections()
+            time.sleep(SAMPLE_INTERVAL)
+
+
+admission_controller = AdmissionController()
+
+
+def get_admission_controller():
+    """
+    Returns the AdmissionController of this process
+    """
+    return admission_controller
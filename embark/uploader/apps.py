@@ -3,8 +3,13 @@ __author__ = 'Garima Chauhan, diegiesskanne, Benedikt Kuehne'
 __license__ = 'MIT'
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class UploaderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'uploader'
+
+    def ready(self):
+        from uploader.tasks import create_periodic_tasks  # pylint: disable=import-outside-toplevel
+        post_migrate.connect(create_periodic_tasks)
@@ -7,12 +7,13 @@ import builtins
 import logging
 import os
 import shutil
+from math import ceil
 from subprocess import Popen, PIPE
 import zipfile
 
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
-from threading import BoundedSemaphore
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore, RLock, Thread, Timer
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
@@ -20,31 +21,44 @@ from django.dispatch import receiver
 from django.utils import timezone
 from django.conf import settings
 from django.db import close_old_connections
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.db.models import Avg, Q
 import docker
 import git
+import psutil
 
 from uploader import finish_execution
+from uploader.admission import BACKFILL_WINDOW, get_admission_controller
 from uploader.archiver import Archiver
-from uploader.models import FirmwareAnalysis
+from uploader.leases import get_slot_leases
+from uploader.models import AnalysisQueueEntry, FirmwareAnalysis
 from uploader.settings import get_emba_base_cmd
+from uploader.supervisor import get_process_supervisor
+from uploader.tasks import queue_analysis_notification
 from embark.helper import get_size, zip_check
+from embark.logreader import get_log_follower
 from porter.models import LogZipFile
 from porter.importer import result_read_in
-from users.models import User
+from reporter.prerender import import_report
 
 logger = logging.getLogger(__name__)
 
-# maximum concurrent running workers
-MAX_WORKERS = 4
+# maximum concurrent emba runs of this process, the admission control and the host wide slot leases may allow less
+MAX_WORKERS = settings.EMBA_MAX_CONCURRENT_ANALYSES
+# threads for the imports, archiving and the other jobs of the pool
+POOL_WORKERS = max(4, MAX_WORKERS)
 # maximum queue bound
-MAX_QUEUE = MAX_WORKERS
+MAX_QUEUE = POOL_WORKERS
 
 # assign the threadpool max_worker_threads
-executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+executor = ThreadPoolExecutor(max_workers=POOL_WORKERS)
 # create semaphore to track queue state
 semaphore = BoundedSemaphore(MAX_QUEUE)
+# serializes the dispatching of the persistent analysis queue inside this process
+dispatch_lock = RLock()
+# retry interval if all analysis slots of the host are taken by other processes
+DISPATCH_RETRY_INTERVAL = 30
+# dispatched entries whose analysis got no pid within this time were claimed by a process that died
+DISPATCH_GRACE_PERIOD = timezone.timedelta(minutes=1)
 
 
 class BoundedException(Exception):
@@ -55,52 +69,93 @@ class BoundedExecutor:
     """
     class BoundedExecutor
     This class is a wrapper of ExecuterThreadPool to enable a limited queue
-    Used to handle concurrent emba analysis as well as emba.log analyzer
+    Used to handle concurrent emba analysis, the emba.log analyzers run in the LogFollower
     """
+    dispatch_retry = None
 
     @classmethod
     def run_emba_cmd(cls, cmd, analysis_id=None, active_analyzer_dir=None):
         """
-        run shell commands from python script as subprocess, waits for termination and evaluates returncode
+        starts emba under the process supervisor, no thread is blocked while it runs.
+        The results are imported by a pool thread once emba terminated
 
         :param cmd: shell command to be executed
         :param id: primary key for firmware entry db identification
         :param active_analyzer_dir: active analyzer dir for deletion afterwards
 
-        :return:
+        :return: future, resolves once the run is finalized
         """
 
         logger.info("Starting: %s", cmd)
 
+        def on_start(pid):
+            # mark the run as supervised by this process, see recover_running()
+            cls._claim_adoption(analysis_id)
+            get_admission_controller().attach(analysis_id, pid)
+            # Add proc to FirmwareAnalysis-Object
+            FirmwareAnalysis.objects.filter(id=analysis_id).update(pid=pid)
+            logger.debug("subprocess got pid %s", pid)
+            # write into pid file
+            with open(f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_run.pid", "w+", encoding="utf-8") as pid_file:
+                pid_file.write(str(pid))
+            close_old_connections()
+
+        finalized = Future()
+        emba_future = get_process_supervisor().launch(analysis_id, cmd, f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_run.log", on_start)
+        emba_future.add_done_callback(
+            lambda fut: cls._submit_finalize(finalized, analysis_id, cls._return_code(fut), cmd, active_analyzer_dir)
+        )
+        return finalized
+
+    @staticmethod
+    def _return_code(emba_future):
         # get return code to evaluate: 0 = success, 1 = failure,
         # see emba for further information
+        try:
+            return emba_future.result()
+        except builtins.Exception as exce:
+            # fail
+            logger.error("EMBA run was probably not successful!")
+            logger.error("run_emba_cmd error: %s", exce)
+            return -1
+
+    @classmethod
+    def _submit_finalize(cls, finalized, analysis_id, return_code, cmd, active_analyzer_dir=None):
+        """
+        hands the import of a terminated run to the pool, called from the supervisor thread which must not block
+        """
+        def finalize():
+            try:
+                cls._finalize_analysis(analysis_id, return_code, cmd, active_analyzer_dir)
+            except builtins.Exception as exce:
+                logger.error("Finalizing %s failed: %s", analysis_id, exce)
+            finally:
+                finalized.set_result(return_code)
+
+        if cls.submit(finalize) is None:
+            # the pool is busy, imports must not get lost
+            Thread(target=finalize, daemon=True).start()
+
+    @classmethod
+    def _finalize_analysis(cls, analysis_id, return_code, cmd, active_analyzer_dir=None):
+        """
+        imports the results of a terminated emba run and finalizes the db entry
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :param return_code: exit code of emba, None if unknown (adopted run)
+        :param cmd: shell command that was executed
+        :param active_analyzer_dir: active analyzer dir for deletion afterwards
+        """
         exit_fail = False
+        close_old_connections()
         analysis = FirmwareAnalysis.objects.get(id=analysis_id)
         try:
-            return_code = 0
-
-            # The os.setsid() is passed in the argument preexec_fn so it's run after the fork() and before  exec() to run the shell.
-            # attached but synchronous
-            with open(f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_run.log", "w+", encoding="utf-8") as file:
-                proc = Popen(cmd, stdin=PIPE, stdout=file, stderr=file, shell=True, start_new_session=True)   # nosec
-                # Add proc to FirmwareAnalysis-Object
-                analysis.pid = proc.pid
-                analysis.save(update_fields=["pid"])
-                logger.debug("subprocess got pid %s", proc.pid)
-                # write into pid file
-                with open(f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_run.pid", "w+", encoding="utf-8") as pid_file:
-                    pid_file.write(str(proc.pid))
-                # wait for completion
-                proc.communicate()
-                return_code = proc.wait()
-
             # success
             logger.info("Success: %s", cmd)
-            logger.info("EMBA returned: %d", return_code)
-            if return_code != 0:
+            logger.info("EMBA returned: %s", return_code)
+            if return_code is not None and return_code != 0:
                 raise BoundedException("EMBA has non zero exit-code")
 
-            close_old_connections()
             # get csv log location
             csv_log_location = f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_logs/csv_logs/f50_base_aggregator.csv"
             sbom_log_location = f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_logs/SBOM/EMBA_cyclonedx_sbom.json"
@@ -139,65 +194,334 @@ class BoundedExecutor:
             analysis.finished = True
             analysis.failed = exit_fail
             analysis.save(update_fields=["end_date", "scan_time", "duration", "finished", "failed"])
+        cls._release_adoption(analysis_id)
 
-        if settings.EMAIL_ACTIVE is True:
-            logger.debug("SEnding email with result")
-            user = analysis.user
-            mail_subject = 'Analysis completed'
-            domain = settings.DOMAIN
-            if exit_fail:
-                message = render_to_string('uploader/email_run_failed.html', context={
-                    'username': user.username,
-                    'domain': domain,
-                    'analysis_id': analysis_id
-                })
-                logger.debug("sending email to admin since we had a failure")
-                admin_email = User.objects.get(username=os.environ.get("DJANGO_SUPERUSER_USERNAME","admin")).email
-                send_mail(subject="Failed EMBA run", message=f"analysis {analysis_id} failed @{timezone.now()}", from_email='system@' + settings.DOMAIN, recipient_list=[admin_email])
-            else:
-                message = render_to_string('uploader/email_run_success.html', context={
-                    'username': user.username,
-                    'domain': domain,
-                    'analysis_id': analysis_id
-                })
-            send_mail(mail_subject, message, 'system@' + settings.DOMAIN, [user.email])
+        # mails are sent by celery, a slow mail server must not keep the analysis slot
+        queue_analysis_notification(analysis_id)
 
         logger.info("Successful cleaned up: %s", cmd)
 
+    @classmethod
+    def get_emba_process(cls, analysis):
+        """
+        finds the still running emba process of an analysis by its pid file
+
+        :param analysis: FirmwareAnalysis object
+        :return: psutil.Process or None if it is gone
+        """
+        pid = analysis.pid
+        pid_file = Path(f"{settings.EMBA_LOG_ROOT}/{analysis.id}/emba_run.pid")
+        try:
+            if pid_file.is_file():
+                pid = int(pid_file.read_text(encoding="utf-8").strip())
+        except (OSError, ValueError) as exce:
+            logger.error("Unreadable pid file %s: %s", pid_file, exce)
+        if not pid:
+            return None
+        try:
+            proc = psutil.Process(pid)
+            # make sure the pid wasn't reused, the emba command contains the log path of the analysis
+            if str(analysis.id) not in " ".join(proc.cmdline()) or proc.status() == psutil.STATUS_ZOMBIE:
+                return None
+            return proc
+        except psutil.Error:
+            return None
+
+    @classmethod
+    def _claim_adoption(cls, analysis_id):
+        """
+        marks the emba run as supervised by this process (O_EXCL marker file with pid and start time),
+        a marker of a dead process is taken over
+
+        :return: True if this process is now responsible for the run
+        """
+        marker = f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_run.adopted"
+        for _attempt in range(2):
+            try:
+                marker_fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if cls._marker_owner_alive(marker):
+                    return False
+                # stale marker of a process that is gone
+                try:
+                    os.remove(marker)
+                except FileNotFoundError:
+                    pass
+                continue
+            except OSError as exce:
+                logger.error("Could not create adoption marker %s: %s", marker, exce)
+                return False
+            with os.fdopen(marker_fd, "w", encoding="utf-8") as marker_file:
+                marker_file.write(f"{os.getpid()} {psutil.Process().create_time()}")
+            return True
+        return False
+
+    @classmethod
+    def _marker_owner_alive(cls, marker) -> bool:
+        """
+        the marker holds pid and start time of its owner, a reused pid doesn't keep the marker alive
+        """
+        try:
+            owner, create_time = Path(marker).read_text(encoding="utf-8").split()
+            return psutil.Process(int(owner)).create_time() == float(create_time)
+        except (OSError, ValueError, psutil.Error):
+            # unreadable, old format or the owner is gone
+            return False
+
+    @classmethod
+    def _release_adoption(cls, analysis_id):
+        try:
+            os.remove(f"{settings.EMBA_LOG_ROOT}/{analysis_id}/emba_run.adopted")
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def supervise_adopted(cls, analysis_id, pid, cmd, active_analyzer_dir=None):
+        """
+        awaits an adopted emba run in the process supervisor and finalizes it like run_emba_cmd
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :param pid: pid of the emba process group leader, None if it already terminated
+        :return: future, resolves once the run is finalized
+        """
+        logger.info("Supervising adopted EMBA run of %s (pid %s)", analysis_id, pid)
+        finalized = Future()
+        finalized.add_done_callback(lambda _: cls._release_run(analysis_id))
+        if pid is None:
+            cls._submit_finalize(finalized, analysis_id, None, cmd, active_analyzer_dir)
+        else:
+            get_process_supervisor().watch(analysis_id, pid).add_done_callback(
+                lambda _: cls._submit_finalize(finalized, analysis_id, None, cmd, active_analyzer_dir)
+            )
+        return finalized
+
+    @classmethod
+    def _release_run(cls, analysis_id, record=False):
+        """
+        frees everything a finalized local run held and looks for the next queued analysis
+        """
+        get_slot_leases().release(analysis_id)
+        get_admission_controller().release(analysis_id, record=record)
+        AnalysisQueueEntry.objects.filter(analysis_id=analysis_id).delete()
+        close_old_connections()
+        cls.dispatch_queue()
+
+    @classmethod
+    def recover_running(cls):
+        """
+        re-adopts local emba runs that survived a restart of the web server,
+        runs that ended in the meantime are finalized right away
+        """
+        unfinished = FirmwareAnalysis.objects.filter(finished=False, failed=False, running_on_worker=False, pid__isnull=False)
+        for analysis in unfinished:
+            if not cls._claim_adoption(analysis.id):
+                # still supervised by a living process
+                continue
+            entry = AnalysisQueueEntry.objects.filter(analysis=analysis).first()
+            if entry is not None and not entry.dispatched:
+                # queued again but never started
+                cls._release_adoption(analysis.id)
+                continue
+            cmd = entry.emba_cmd if entry else ""
+            active_analyzer_dir = entry.active_analyzer_dir if entry else None
+            proc = cls.get_emba_process(analysis)
+            if proc is None:
+                logger.info("EMBA run of %s ended while nobody was watching, finalizing", analysis.id)
+                pid = None
+            else:
+                logger.info("Adopting running EMBA process %s of %s", proc.pid, analysis.id)
+                pid = proc.pid
+                # it runs anyway, but its usage counts for the next admissions
+                get_admission_controller().reserve(analysis, force=True)
+                get_admission_controller().attach(analysis.id, pid)
+            # continues at the stored offset
+            cls.submit_log_reader(analysis.id)
+            if pid is not None and not get_slot_leases().acquire(analysis.id):
+                logger.error("Adopted EMBA run of %s exceeds the host limit", analysis.id)
+            cls.supervise_adopted(analysis.id, pid, cmd, active_analyzer_dir)
+
     @classmethod
     def kill_emba_cmd(cls, analysis_id):
         """
-        run shell commands from python script as subprocess, waits for termination and evaluates returncode
+        terminates the process group of a local emba run
 
         :param analysis_id: primary key for firmware-analysis entry
-        :param active_analyzer_dir: active analyzer dir for deletion afterwards
 
         :return:
         """
         logger.info("Killing ID: %s", analysis_id)
         try:
-            # logger.debug("%s", id)
-            cmd = f"sudo pkill -f {analysis_id}"
-            with open(f"{settings.EMBA_LOG_ROOT}/{analysis_id}_kill.log", "w+", encoding="utf-8") as file:
-                proc = Popen(cmd, stdin=PIPE, stdout=file, stderr=file, shell=True)   # nosec
-                # wait for completion
-                proc.communicate()
-            # success
-            logger.info("Kill Successful: %s", cmd)
+            analysis = FirmwareAnalysis.objects.get(id=analysis_id)
+            if get_process_supervisor().terminate(analysis_id, pid=analysis.pid):
+                # success
+                logger.info("Kill Successful: %s", analysis_id)
         except BaseException as exce:
             logger.error("kill_emba_cmd error: %s", exce)
             raise BoundedException("Killing EMBA process might have failed") from exce
 
     @classmethod
     def submit_kill(cls, uuid):
-        # submit command to executor threadpool
-        emba_fut = BoundedExecutor.submit(cls.kill_emba_cmd, uuid)
+        # signalling the process group doesn't block, no need for the threadpool
+        cls.kill_emba_cmd(uuid)
         analysis = FirmwareAnalysis.objects.get(id=uuid)
         analysis.status['finished'] = True
         analysis.failed = True
         analysis.finished = True
         analysis.save(update_fields=["status", "finished", "failed"])
-        return emba_fut
+
+    @classmethod
+    def queue_analysis(cls, analysis_id, emba_cmd, active_analyzer_dir=None, priority=0):
+        """
+        persists a local emba run inside the analysis queue and dispatches it as soon as a slot is free
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :param emba_cmd: shell command to be executed
+        :param active_analyzer_dir: active analyzer dir for deletion afterwards
+        :param priority: entries with higher priority are dispatched first
+
+        :return: queue entry of the analysis
+        """
+        entry = AnalysisQueueEntry.objects.create(
+            analysis_id=analysis_id,
+            emba_cmd=emba_cmd,
+            active_analyzer_dir=active_analyzer_dir,
+            priority=priority
+        )
+        logger.info("Queued analysis %s with priority %d", analysis_id, priority)
+        cls.dispatch_queue()
+        entry.refresh_from_db()
+        return entry
+
+    @classmethod
+    def queue_eta(cls, position):
+        """
+        rough estimate of the waiting time for a queue position,
+        based on the mean duration of finished local analyses
+
+        :return: timedelta or None if there is no history yet
+        """
+        if position <= 0:
+            return timezone.timedelta(0)
+        mean_scan_time = FirmwareAnalysis.objects.filter(
+            finished=True, failed=False, running_on_worker=False, scan_time__isnull=False
+        ).aggregate(Avg('scan_time'))['scan_time__avg']
+        if mean_scan_time is None:
+            return None
+        return mean_scan_time * ceil(position / MAX_WORKERS)
+
+    @classmethod
+    def _claim_next_entry(cls):
+        """
+        atomically marks the next admissible queue entry as dispatched,
+        smaller analyses may overtake one that doesn't fit for up to BACKFILL_WINDOW
+
+        :return: claimed entry or None if the queue is empty or nothing fits right now
+        """
+        admission = get_admission_controller()
+        for entry in AnalysisQueueEntry.objects.filter(dispatched=False).select_related('analysis')[:MAX_QUEUE]:
+            if not admission.reserve(entry.analysis):
+                logger.debug("Analysis %s doesn't fit on this host right now", entry.analysis_id)
+                # nobody notifies us when the load drops
+                cls._schedule_dispatch_retry()
+                if entry.queued_at < timezone.now() - BACKFILL_WINDOW:
+                    # let the host drain for it
+                    return None
+                continue
+            # the conditional update makes sure only one process claims the entry
+            if AnalysisQueueEntry.objects.filter(pk=entry.pk, dispatched=False).update(
+                dispatched=True, dispatched_at=timezone.now(), **admission.reservation(entry.analysis_id)
+            ):
+                return entry
+            admission.release(entry.analysis_id)
+        return None
+
+    @classmethod
+    def dispatch_queue(cls):
+        """
+        hands queued analyses to the executor as long as there are free slots
+        """
+        with dispatch_lock:
+            if cls._requeue_orphans():
+                # nobody else notices once they are old enough
+                cls._schedule_dispatch_retry()
+            while True:
+                if len(get_process_supervisor().groups) >= MAX_WORKERS:
+                    # the next finalized run dispatches again
+                    logger.info("All %d workers of this process are busy", MAX_WORKERS)
+                    return
+                entry = cls._claim_next_entry()
+                if entry is None:
+                    return
+                if not get_slot_leases().acquire(entry.analysis_id):
+                    # the host limit is reached by other processes, they don't notify us when they are done
+                    get_admission_controller().release(entry.analysis_id)
+                    AnalysisQueueEntry.objects.filter(pk=entry.pk).update(dispatched=False, dispatched_at=None)
+                    cls._schedule_dispatch_retry()
+                    return
+                try:
+                    cls.run_queued_analysis(entry)
+                except builtins.Exception as exce:
+                    # e.g. the supervisor is gone (shutdown) or the db failed, put the entry back into the queue
+                    logger.error("Dispatching %s failed: %s", entry.analysis_id, exce)
+                    get_log_follower().unfollow(entry.analysis_id)
+                    get_slot_leases().release(entry.analysis_id)
+                    get_admission_controller().release(entry.analysis_id)
+                    AnalysisQueueEntry.objects.filter(pk=entry.pk).update(dispatched=False, dispatched_at=None)
+                    return
+
+    @classmethod
+    def _requeue_orphans(cls):
+        """
+        puts dispatched entries back into the queue whose process died before emba was started
+
+        :return: True if there are dispatched entries without pid still inside DISPATCH_GRACE_PERIOD
+        """
+        unstarted = AnalysisQueueEntry.objects.filter(
+            dispatched=True, analysis__pid__isnull=True, analysis__finished=False, analysis__failed=False
+        ).exclude(analysis_id__in=list(get_process_supervisor().groups))
+        orphaned = unstarted.filter(Q(dispatched_at__isnull=True) | Q(dispatched_at__lt=timezone.now() - DISPATCH_GRACE_PERIOD))
+        requeued = orphaned.update(dispatched=False, dispatched_at=None, reserved_cpu=0.0, reserved_memory=0, reserved_disk=0)
+        if requeued:
+            logger.info("Put %d orphaned queue entries back into the queue", requeued)
+        return unstarted.exists()
+
+    @classmethod
+    def _schedule_dispatch_retry(cls):
+        with dispatch_lock:
+            if cls.dispatch_retry is None or not cls.dispatch_retry.is_alive():
+                cls.dispatch_retry = Timer(DISPATCH_RETRY_INTERVAL, cls.dispatch_queue)
+                cls.dispatch_retry.daemon = True
+                cls.dispatch_retry.start()
+
+    @classmethod
+    def run_queued_analysis(cls, entry):
+        """
+        starts a dispatched queue entry, it is removed from the queue once the run is finalized
+
+        :param entry: claimed AnalysisQueueEntry
+        """
+        analysis_id = entry.analysis_id
+        # the analysis starts now, not when it was queued
+        FirmwareAnalysis.objects.filter(id=analysis_id).update(start_date=timezone.now())
+        cls.submit_log_reader(analysis_id)
+        finalized = cls.run_emba_cmd(entry.emba_cmd, analysis_id, entry.active_analyzer_dir)
+        # only complete runs are representative for the next estimates
+        finalized.add_done_callback(lambda _: cls._release_run(
+            analysis_id, record=FirmwareAnalysis.objects.filter(id=analysis_id, finished=True, failed=False).exists()
+        ))
+
+    @classmethod
+    def resume_queue(cls):
+        """
+        drops stale queue entries and dispatches everything still waiting (incl. orphaned entries),
+        called once the web server (re)started
+        """
+        stale_entries = AnalysisQueueEntry.objects.filter(dispatched=True).filter(
+            Q(analysis__finished=True) | Q(analysis__failed=True)
+        )
+        logger.info("Removing %d stale queue entries", stale_entries.count())
+        stale_entries.delete()
+        cls.dispatch_queue()
 
     @classmethod
     def submit(cls, function_cmd, *args, **kwargs):
@@ -226,14 +550,30 @@ class BoundedExecutor:
         future.add_done_callback(lambda x: semaphore.release())
         return future
 
+    @classmethod
+    def submit_log_reader(cls, analysis_id):
+        """
+        starts following the emba.log of the analysis,
+        all logs share the single LogFollower thread so this doesn't take a slot of the semaphore
+        """
+        logger.info("submit log reader for: %s", analysis_id)
+        get_log_follower().follow(analysis_id)
+
     @classmethod
     def shutdown(cls, wait=True):
         """See concurrent.futures.Executor#shutdown"""
         logger.info("shutting down Boundedexecutor")
+        get_log_follower().stop()
+        get_process_supervisor().stop()
         executor.shutdown(wait)
-        # set all running analysis to failed
-        running_analysis_list = FirmwareAnalysis.objects.filter(finished=False).exclude(failed=True)
+        # set all running analysis to failed, queued ones are picked up again after restart
+        # and the ones with a living emba process get adopted again (see recover_running)
+        running_analysis_list = FirmwareAnalysis.objects.filter(finished=False).exclude(failed=True).exclude(queue_entry__dispatched=False)
         for analysis_ in running_analysis_list:
+            if not analysis_.running_on_worker and cls.get_emba_process(analysis_) is not None:
+                logger.info("EMBA of %s keeps running", analysis_.id)
+                continue
+            AnalysisQueueEntry.objects.filter(analysis=analysis_).delete()
             analysis_.failed = True
             analysis_.finished = True
             analysis_.save(update_fields=["finished", "failed"])
@@ -243,8 +583,30 @@ class BoundedExecutor:
     def csv_read(cls, analysis_id, _path, _cmd):
         """
         This job reads the F50_aggregator file and stores its content into the Result model
+        and runs the import stages of the html-report
+        """
+        result = result_read_in(analysis_id=analysis_id)
+        import_report(analysis_id)
+        return result
+
+    @classmethod
+    def retry_import(cls, analysis_id):
         """
-        return result_read_in(analysis_id=analysis_id)
+        reads the results of an analysis in again and runs the import stages of the html-report,
+        the analysis is finished once both are done
+        :param analysis_id: primary key for firmware-analysis entry
+        """
+        result = result_read_in(analysis_id)
+        if result is None:
+            logger.error("Re-import of %s failed", analysis_id)
+            return None
+        import_report(analysis_id)
+        analysis = FirmwareAnalysis.objects.get(id=analysis_id)
+        analysis.finished = True
+        analysis.failed = False
+        analysis.save(update_fields=["finished", "failed"])
+        logger.info("Re-imported %s", analysis_id)
+        return result
 
     @classmethod
     def zip_log(cls, analysis_id):
@@ -337,6 +699,7 @@ class BoundedExecutor:
             return
 
         logger.debug("Got %s from zip", result_obj)
+        import_report(analysis_id)
 
         analysis.end_date = timezone.now()
         analysis.scan_time = timezone.now() - analysis.start_date
@@ -471,6 +834,12 @@ class BoundedExecutor:
         emba_fut = BoundedExecutor.submit(cls.zip_log, uuid)
         return emba_fut
 
+    @classmethod
+    def submit_retry_import(cls, uuid):
+        # submit re-import to executor threadpool
+        emba_fut = BoundedExecutor.submit(cls.retry_import, uuid)
+        return emba_fut
+
     @classmethod
     def submit_unzip(cls, uuid, file_loc):
         # submit zip req to executor threadpool
@@ -11,7 +11,6 @@ from uploader.models import FirmwareAnalysis, FirmwareFile
 from uploader.archiver import Archiver
 from uploader.boundedexecutor import BoundedExecutor
 from workers.orchestrator import OrchestratorTask, get_orchestrator
-from embark.logreader import LogReader
 from settings.helper import workers_enabled
 
 
@@ -25,7 +24,7 @@ def submit_firmware(firmware_analysis: FirmwareAnalysis, firmware_file: Firmware
     params firmware_analysis: firmware model with flags and metadata
     params firmware_file: firmware file model to be analyzed
 
-    return: emba process future on success, None on failure
+    return: truthy on success (queue entry for local runs), None on failure
     """
     active_analyzer_dir = f"{settings.ACTIVE_FW}/{firmware_analysis.id}/"
     logger.info("submitting firmware %s to emba", active_analyzer_dir)
@@ -51,11 +50,9 @@ def submit_firmware(firmware_analysis: FirmwareAnalysis, firmware_file: Firmware
     if workers_enabled():
         orchestrator = get_orchestrator()
         orchestrator.queue_task(OrchestratorTask(firmware_analysis.id, emba_cmd, firmware_file.file.path, image_file_location))
-        BoundedExecutor.submit(LogReader, firmware_analysis.id)
+        BoundedExecutor.submit_log_reader(firmware_analysis.id)
 
         return True
     else:
-        emba_fut = BoundedExecutor.submit(BoundedExecutor.run_emba_cmd, emba_cmd, firmware_analysis.id, active_analyzer_dir)
-        BoundedExecutor.submit(LogReader, firmware_analysis.id)
-
-        return bool(emba_fut)
+        # the log reader is started together with the run once the entry is dispatched
+        return BoundedExecutor.queue_analysis(firmware_analysis.id, emba_cmd, active_analyzer_dir)
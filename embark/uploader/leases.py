@@ -0,0 +1,111 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from redis import Redis
+from redis.exceptions import RedisError
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_CLIENT = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+LEASE_KEY = "embark_analysis_slot"
+LEASE_TTL = 60     # s, leases of crashed processes are free again after this
+HEARTBEAT_INTERVAL = LEASE_TTL / 4
+
+# only touch the lease if we still own it
+RENEW_SCRIPT = REDIS_CLIENT.register_script(
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) else return 0 end"
+)
+RELEASE_SCRIPT = REDIS_CLIENT.register_script(
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+)
+
+
+class SlotLeases:
+    """
+    Host wide limit of concurrent local emba runs
+    Every run holds one of max_slots redis keys (SET NX EX), a heartbeat thread keeps the leases
+    of this process alive. If the process dies the keys expire and the slots are free again.
+    """
+
+    def __init__(self, max_slots):
+        self.max_slots = max_slots
+        self.lock = threading.Lock()
+        self.held = {}      # analysis id -> (key, token)
+        self.heartbeat = None
+
+    def acquire(self, analysis_id) -> bool:
+        """
+        takes a free slot for the analysis
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :return: True on success, False if all slots of the host are taken
+        """
+        analysis_id = str(analysis_id)
+        with self.lock:
+            if analysis_id in self.held:
+                return True
+        token = f"{socket.gethostname()}:{os.getpid()}:{analysis_id}"
+        try:
+            for slot in range(self.max_slots):
+                key = f"{LEASE_KEY}_{slot}"
+                if REDIS_CLIENT.set(key, token, nx=True, ex=LEASE_TTL):
+                    with self.lock:
+                        self.held[analysis_id] = (key, token)
+                        self._start_heartbeat()
+                    logger.info("Analysis %s got slot %d", analysis_id, slot)
+                    return True
+        except RedisError as redis_error:
+            # don't block all analyses because redis is gone, dispatch_queue still caps each process at MAX_WORKERS runs
+            logger.error("Slot leases not available, falling back to the process limit: %s", redis_error)
+            return True
+        logger.info("All %d analysis slots of this host are taken", self.max_slots)
+        return False
+
+    def release(self, analysis_id):
+        with self.lock:
+            key, token = self.held.pop(str(analysis_id), (None, None))
+        if key is None:
+            return
+        try:
+            RELEASE_SCRIPT(keys=[key], args=[token])
+        except RedisError as redis_error:
+            logger.error("Could not release %s, it expires in %ds: %s", key, LEASE_TTL, redis_error)
+
+    def _start_heartbeat(self):
+        if self.heartbeat is None or not self.heartbeat.is_alive():
+            self.heartbeat = threading.Thread(target=self._renew_loop, name="slotleases", daemon=True)
+            self.heartbeat.start()
+
+    def _renew_loop(self):
+        while True:
+            with self.lock:
+                held = list(self.held.items())
+                if not held:
+                    self.heartbeat = None
+                    return
+            for analysis_id, (key, token) in held:
+                try:
+                    if not RENEW_SCRIPT(keys=[key], args=[token, LEASE_TTL]):
+                        # expired (e.g. redis restart), take it again if nobody else did
+                        if not REDIS_CLIENT.set(key, token, nx=True, ex=LEASE_TTL):
+                            logger.error("Lost the slot of analysis %s, host limit is exceeded", analysis_id)
+                except RedisError as redis_error:
+                    logger.error("Could not renew %s: %s", key, redis_error)
+            time.sleep(HEARTBEAT_INTERVAL)
+
+
+slot_leases = SlotLeases(settings.EMBA_MAX_CONCURRENT_ANALYSES)
+
+
+def get_slot_leases():
+    """
+    Returns the SlotLeases of this process
+    """
+    return slot_leases
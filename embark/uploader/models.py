@@ -38,6 +38,7 @@ def scan_modules_default_value():
 def jsonfield_default_value():
     """
     keys: percentage, analysis, firmwarename, last_update, last_module, module_list, last_phase, phase_list
+    module_list and phase_list are shown in the livelog, every entry is also stored as AnalysisProgressEvent
     """
     return {
         "percentage": 0,
@@ -333,6 +334,8 @@ class FirmwareAnalysis(models.Model):
 
     # status/logreader-stuff
     status = models.JSONField(null=False, default=jsonfield_default_value)
+    # time of the last status change, cursor for the progress websocket
+    status_updated = models.DateTimeField(default=timezone.now, db_index=True)
 
     # additional Labels
     label = models.ManyToManyField(Label, help_text='tag/label', related_query_name='analysis-label', editable=True, max_length=MAX_LENGTH, blank=True)
@@ -353,6 +356,18 @@ class FirmwareAnalysis(models.Model):
     def __str__(self):
         return f"{self.id}({self.firmware})"
 
+    # writes of these fields move the progress cursor
+    STATUS_CURSOR_FIELDS = {'status', 'finished', 'failed', 'end_date'}
+
+    def save(self, *args, **kwargs):
+        # every status write (incl. finishing and failing) moves the progress cursor
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.STATUS_CURSOR_FIELDS.intersection(update_fields):
+            self.status_updated = timezone.now()
+            if update_fields is not None and 'status_updated' not in update_fields:
+                kwargs['update_fields'] = list(update_fields) + ['status_updated']
+        super().save(*args, **kwargs)
+
     def get_flags(self):
         """
         build shell command from input fields
@@ -475,6 +490,114 @@ def delete_analysis_pre_delete(sender, instance, **kwargs):
         logger.error("Error durring delete of: %s - %s", str(sender), _error)
 
 
+class AnalysisQueueEntry(models.Model):
+    """
+    class AnalysisQueueEntry
+    Persistent queue entry of a local EMBA run waiting for a free executor slot
+    (1 FirmwareAnalysis --> 0/1 AnalysisQueueEntry)
+    """
+    analysis = models.OneToOneField(FirmwareAnalysis, on_delete=models.CASCADE, primary_key=True, related_name='queue_entry')
+    emba_cmd = models.TextField(help_text='EMBA command to execute')
+    active_analyzer_dir = models.CharField(max_length=255, blank=True, null=True)
+    priority = models.IntegerField(default=0, help_text='entries with higher priority are dispatched first')
+    queued_at = models.DateTimeField(default=timezone.now)
+    dispatched = models.BooleanField(default=False)
+    dispatched_at = models.DateTimeField(default=None, null=True, blank=True)
+    # part of the resource estimate the dispatched run hasn't claimed yet, shared by all processes for the admission
+    reserved_cpu = models.FloatField(default=0.0, help_text='cores')
+    reserved_memory = models.BigIntegerField(default=0, help_text='bytes')
+    reserved_disk = models.BigIntegerField(default=0, help_text='bytes')
+
+    class Meta:
+        app_label = 'uploader'
+        ordering = ['-priority', 'queued_at']
+        indexes = [
+            models.Index(fields=['dispatched', '-priority', 'queued_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.analysis_id}(priority={self.priority}, dispatched={self.dispatched})"
+
+    def queue_position(self) -> int:
+        """
+        position inside the queue, 0 if already dispatched
+        """
+        if self.dispatched:
+            return 0
+        ahead = AnalysisQueueEntry.objects.filter(dispatched=False).filter(
+            models.Q(priority__gt=self.priority) | models.Q(priority=self.priority, queued_at__lt=self.queued_at)
+        ).count()
+        return ahead + 1
+
+
+class AnalysisProgressEvent(models.Model):
+    """
+    class AnalysisProgressEvent
+    Append-only progress log of an analysis, the current state stays in FirmwareAnalysis.status
+    (1 FirmwareAnalysis --> n AnalysisProgressEvent)
+    """
+    PHASE = 'phase'
+    MODULE_FINISHED = 'module_finished'
+    FAILED = 'failed'
+    TEST_ENDED = 'test_ended'
+
+    analysis = models.ForeignKey(FirmwareAnalysis, on_delete=models.CASCADE, related_name='progress_events')
+    event_type = models.CharField(
+        max_length=20,
+        choices=[(PHASE, 'Phase'), (MODULE_FINISHED, 'Module finished'), (FAILED, 'Failed'), (TEST_ENDED, 'Test ended')]
+    )
+    timestamp = models.DateTimeField(default=timezone.now)
+    phase = models.CharField(max_length=255, blank=True, default='')
+    module = models.CharField(max_length=100, blank=True, default='')
+    percentage = models.FloatField(default=0.0)
+
+    class Meta:
+        app_label = 'uploader'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['analysis', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.analysis_id}({self.event_type}: {self.module or self.phase})"
+
+    def to_dict(self):
+        """
+        json representation, the id is the cursor for incremental fetching
+        """
+        return {
+            "id": self.id,
+            "type": self.event_type,
+            "timestamp": self.timestamp.isoformat(),
+            "phase": self.phase,
+            "module": self.module,
+            "percentage": self.percentage,
+        }
+
+
+class AnalysisResourceUsage(models.Model):
+    """
+    class AnalysisResourceUsage
+    Sampled resource usage of a finished local EMBA run, used to estimate the next runs of the same profile
+    (1 FirmwareAnalysis --> 0/1 AnalysisResourceUsage)
+    """
+    analysis = models.OneToOneField(FirmwareAnalysis, on_delete=models.CASCADE, primary_key=True, related_name='resource_usage')
+    profile = models.CharField(max_length=32, help_text='resource profile derived from the scan flags')
+    peak_memory = models.BigIntegerField(default=0, help_text='bytes')
+    mean_cpu = models.FloatField(default=0.0, help_text='cores')
+    disk_usage = models.BigIntegerField(default=0, help_text='bytes')
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        app_label = 'uploader'
+        indexes = [
+            models.Index(fields=['profile', '-recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.analysis_id}({self.profile})"
+
+
 class ResourceTimestamp(models.Model):
     """
     class ResourceTimestamp
@@ -0,0 +1,151 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+import asyncio
+import builtins
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+ADOPTED_POLL_INTERVAL = 5     # s, adopted runs aren't our children, their exit can't be awaited directly
+
+
+class ProcessSupervisor:
+    """
+    One asyncio event loop in one thread that launches and awaits all local emba runs
+    Every run is started in its own session, so its pid is also the id of its process group
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.groups = {}    # analysis id -> process group id, None while starting
+
+    def _get_loop(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.loop = asyncio.new_event_loop()
+                if sys.version_info < (3, 12):
+                    # the loop doesn't run in the main thread, so no watcher gets attached to it automatically.
+                    # The threaded fallback blocks one thread per child in waitpid()
+                    watcher = asyncio.PidfdChildWatcher() if hasattr(os, 'pidfd_open') else asyncio.ThreadedChildWatcher()
+                    watcher.attach_loop(self.loop)
+                    asyncio.set_child_watcher(watcher)
+                self.thread = threading.Thread(target=self.loop.run_forever, name="emba-supervisor", daemon=True)
+                self.thread.start()
+            return self.loop
+
+    def launch(self, analysis_id, cmd, log_path, on_start=None):
+        """
+        starts the emba command, stdout and stderr go to log_path
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :param cmd: shell command to be executed
+        :param log_path: path of the run log
+        :param on_start: called with the pid from a pool thread once the process is running
+        :return: concurrent.futures.Future with the return code
+        """
+        # counts as running right away, the pgid is known once the process started
+        self.groups[str(analysis_id)] = None
+        try:
+            return asyncio.run_coroutine_threadsafe(self._run(str(analysis_id), cmd, log_path, on_start), self._get_loop())
+        except RuntimeError:
+            self.groups.pop(str(analysis_id), None)
+            raise
+
+    def watch(self, analysis_id, pid):
+        """
+        awaits a process that was started by an earlier server process
+
+        :return: concurrent.futures.Future, resolves to None once the process is gone
+        """
+        return asyncio.run_coroutine_threadsafe(self._watch(str(analysis_id), pid), self._get_loop())
+
+    async def _run(self, analysis_id, cmd, log_path, on_start):
+        loop = asyncio.get_running_loop()
+        try:
+            with open(log_path, "w+", encoding="utf-8") as log_file:
+                proc = await asyncio.create_subprocess_shell(
+                    cmd, stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file, start_new_session=True
+                )
+            self.groups[analysis_id] = proc.pid
+            if on_start is not None:
+                try:
+                    await loop.run_in_executor(None, on_start, proc.pid)
+                except builtins.Exception as error:
+                    logger.error("Start hook of %s failed: %s", analysis_id, error)
+            return await proc.wait()
+        finally:
+            self.groups.pop(analysis_id, None)
+
+    async def _watch(self, analysis_id, pid):
+        self.groups[analysis_id] = pid
+        try:
+            while True:
+                try:
+                    if psutil.Process(pid).status() == psutil.STATUS_ZOMBIE:
+                        return None
+                except psutil.Error:
+                    return None
+                await asyncio.sleep(ADOPTED_POLL_INTERVAL)
+        finally:
+            self.groups.pop(analysis_id, None)
+
+    def terminate(self, analysis_id, pid=None, sig=signal.SIGTERM) -> bool:
+        """
+        signals the whole process group of an emba run,
+        killpg only reaches the processes of the server user, sudo and emba belong to root and are always signalled through sudo pkill
+
+        :param analysis_id: primary key for firmware-analysis entry
+        :param pid: pid of the group leader, if the run isn't supervised by this process
+        :return: True if the group was signalled
+        """
+        pgid = self.groups.get(str(analysis_id))
+        if pgid is None and pid:
+            try:
+                pgid = os.getpgid(pid)
+            except ProcessLookupError:
+                pgid = None
+        if pgid is None:
+            logger.info("No EMBA process group for %s", analysis_id)
+            return False
+        logger.info("Sending %s to process group %d of %s", signal.Signals(sig).name, pgid, analysis_id)
+        signalled = False
+        try:
+            os.killpg(pgid, sig)
+            signalled = True
+        except (ProcessLookupError, PermissionError):
+            pass
+        # pkill exits with 1 if no process of the group was left
+        result = subprocess.run(["sudo", "/bin/pkill", f"-{int(sig)}", "-g", str(pgid)], check=False)   # nosec
+        if result.returncode not in (0, 1):
+            logger.error("sudo pkill of process group %d failed with %d", pgid, result.returncode)
+            return False
+        return signalled or result.returncode == 0
+
+    def stop(self):
+        """
+        stops the event loop, the emba runs keep running and can be adopted again
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.thread = None
+
+
+process_supervisor = ProcessSupervisor()
+
+
+def get_process_supervisor():
+    """
+    Returns the ProcessSupervisor of this process
+    """
+    return process_supervisor
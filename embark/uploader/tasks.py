@@ -0,0 +1,121 @@
+__copyright__ = 'Copyright 2026 Siemens Energy AG'
+__license__ = 'MIT'
+
+import builtins
+import os
+from smtplib import SMTPException
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django_celery_beat.models import PeriodicTask, IntervalSchedule
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from uploader.models import FirmwareAnalysis
+from users.models import User
+
+logger = get_task_logger(__name__)
+
+REDIS_CLIENT = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+# failed analyses waiting for the next admin digest
+FAILURE_DIGEST_KEY = "embark_failure_digest"
+FAILURE_DIGEST_INTERVAL = 15    # minutes
+MAIL_RETRIES = 5
+
+
+def create_periodic_tasks(**kwargs):
+    """
+    Create periodic tasks with the start of the application. (called in ready() method of the app config)
+    """
+    schedule, _ = IntervalSchedule.objects.get_or_create(
+        every=FAILURE_DIGEST_INTERVAL,
+        period=IntervalSchedule.MINUTES
+    )
+    PeriodicTask.objects.get_or_create(
+        interval=schedule,
+        name="Send failed analyses digest",
+        task="uploader.tasks.send_failure_digest",
+    )
+
+
+def queue_analysis_notification(analysis_id):
+    """
+    hands the completion notification of a local analysis to celery, never blocks on the mail server
+
+    :param analysis_id: primary key for firmware-analysis entry
+    """
+    if settings.EMAIL_ACTIVE is not True:
+        return
+    try:
+        send_analysis_notification.delay(str(analysis_id))
+    except builtins.Exception as error:
+        # broker not reachable, the analysis itself is finished anyway
+        logger.error("Could not queue the notification for %s: %s", analysis_id, error)
+
+
+@shared_task(bind=True, autoretry_for=(SMTPException, OSError), retry_backoff=True, max_retries=MAIL_RETRIES)
+def send_analysis_notification(self, analysis_id):
+    """
+    Mails the result of an analysis to its user, failures are collected for the admin digest
+
+    :param analysis_id: primary key for firmware-analysis entry
+    """
+    try:
+        analysis = FirmwareAnalysis.objects.select_related('user').get(id=analysis_id)
+    except FirmwareAnalysis.DoesNotExist:
+        logger.info("Analysis %s was deleted before its notification", analysis_id)
+        return
+    if analysis.failed and self.request.retries == 0:
+        try:
+            REDIS_CLIENT.rpush(FAILURE_DIGEST_KEY, analysis_id)
+        except RedisError as error:
+            logger.error("Could not add %s to the failure digest: %s", analysis_id, error)
+    user = analysis.user
+    if user is None or not user.email:
+        return
+    template = 'uploader/email_run_failed.html' if analysis.failed else 'uploader/email_run_success.html'
+    message = render_to_string(template, context={
+        'username': user.username,
+        'domain': settings.DOMAIN,
+        'analysis_id': analysis_id
+    })
+    send_mail('Analysis completed', message, 'system@' + settings.DOMAIN, [user.email])
+
+
+@shared_task(bind=True, max_retries=MAIL_RETRIES)
+def send_failure_digest(self, analysis_ids=None):
+    """
+    Mails one summary of all analyses that failed since the last digest to the admin
+
+    :param analysis_ids: ids of a digest that has to be retried
+    """
+    if analysis_ids is None:
+        try:
+            with REDIS_CLIENT.pipeline() as pipe:
+                pipe.lrange(FAILURE_DIGEST_KEY, 0, -1)
+                pipe.delete(FAILURE_DIGEST_KEY)
+                analysis_ids, _ = pipe.execute()
+        except RedisError as error:
+            logger.error("Failure digest not available: %s", error)
+            return
+        analysis_ids = [analysis_id.decode() for analysis_id in analysis_ids]
+    if not analysis_ids or settings.EMAIL_ACTIVE is not True:
+        return
+    try:
+        admin_email = User.objects.get(username=os.environ.get("DJANGO_SUPERUSER_USERNAME", "admin")).email
+    except User.DoesNotExist:
+        logger.error("No admin to send the failure digest of %d analyses to", len(analysis_ids))
+        return
+    lines = [f"{len(analysis_ids)} EMBA run(s) failed until {timezone.now()}:", ""]
+    lines += [f"http://{settings.DOMAIN}{reverse('embark-show-logviewer', kwargs={'analysis_id': analysis_id})}" for analysis_id in analysis_ids]
+    try:
+        send_mail(subject="Failed EMBA runs", message="\n".join(lines), from_email='system@' + settings.DOMAIN, recipient_list=[admin_email])
+    except (SMTPException, OSError) as error:
+        # the ids are already taken from the digest list, retry exactly this digest
+        raise self.retry(exc=error, kwargs={'analysis_ids': analysis_ids}, countdown=60 * 2 ** self.request.retries)
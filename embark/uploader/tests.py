@@ -4,13 +4,25 @@ __license__ = 'MIT'
 
 import secrets
 import os
+import shutil
+import subprocess
+import tempfile
 
 from unittest.mock import patch
 
+from django.conf import settings
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework.test import APITestCase
 from rest_framework import status
 
+from uploader.admission import GIB, PROFILE_COSTS, PROFILE_SBOM, PROFILE_SYSTEM_EMULATION, AdmissionController, analysis_profile, estimate_cost
+from uploader.boundedexecutor import MAX_WORKERS, BoundedExecutor
+from uploader.models import AnalysisQueueEntry, AnalysisResourceUsage, FirmwareAnalysis
+from uploader.supervisor import get_process_supervisor
+from uploader.tasks import send_analysis_notification
 from users.models import User
 
 
@@ -73,3 +85,206 @@ class TestUploader(APITestCase):
         self.assertEqual(len(str(response.data["id"])), 36)
 
         os.remove(file_name)
+
+
+class TestAnalysisQueue(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.first = AnalysisQueueEntry.objects.create(  # pylint: disable=attribute-defined-outside-init
+            analysis=FirmwareAnalysis.objects.create(), emba_cmd="true", queued_at=now - timezone.timedelta(minutes=2))
+        self.second = AnalysisQueueEntry.objects.create(  # pylint: disable=attribute-defined-outside-init
+            analysis=FirmwareAnalysis.objects.create(), emba_cmd="true", queued_at=now - timezone.timedelta(minutes=1))
+
+    def test_queue_position_fifo(self):
+        """
+        Test that entries of the same priority are handed out first in, first out.
+        """
+        self.assertEqual(self.first.queue_position(), 1)
+        self.assertEqual(self.second.queue_position(), 2)
+
+    def test_queue_position_priority(self):
+        """
+        Test that a later entry with a higher priority jumps the queue and dispatched entries don't count.
+        """
+        urgent = AnalysisQueueEntry.objects.create(analysis=FirmwareAnalysis.objects.create(), emba_cmd="true", priority=10)
+        self.assertEqual(urgent.queue_position(), 1)
+        self.assertEqual(self.first.queue_position(), 2)
+
+        AnalysisQueueEntry.objects.filter(pk=urgent.pk).update(dispatched=True)
+        urgent.refresh_from_db()
+        self.assertEqual(urgent.queue_position(), 0)
+        self.assertEqual(self.second.queue_position(), 2)
+
+    def test_process_cap(self):
+        """
+        Test that nothing is dispatched while all workers of the process are busy, even if redis is gone.
+        """
+        busy = {f"busy-{index}": None for index in range(MAX_WORKERS)}
+        with patch.dict(get_process_supervisor().groups, busy), patch.object(BoundedExecutor, 'run_queued_analysis') as run:
+            BoundedExecutor.dispatch_queue()
+            run.assert_not_called()
+        self.assertFalse(AnalysisQueueEntry.objects.filter(dispatched=True).exists())
+
+
+    def test_requeue_orphans(self):
+        """
+        Test that entries claimed by a process that died before emba started go back into the queue.
+        """
+        now = timezone.now()
+        AnalysisQueueEntry.objects.filter(pk=self.first.pk).update(dispatched=True, dispatched_at=now - timezone.timedelta(minutes=10), reserved_cpu=2)
+        AnalysisQueueEntry.objects.filter(pk=self.second.pk).update(dispatched=True, dispatched_at=now)
+        # the second one may still be starting in another process
+        self.assertTrue(BoundedExecutor._requeue_orphans())  # pylint: disable=protected-access
+        self.first.refresh_from_db()
+        self.assertFalse(self.first.dispatched)
+        self.assertEqual(self.first.reserved_cpu, 0)
+        self.assertTrue(AnalysisQueueEntry.objects.get(pk=self.second.pk).dispatched)
+
+    def test_dispatch_rollback(self):
+        """
+        Test that a failing start puts the entry back into the queue.
+        """
+        with patch('uploader.boundedexecutor.get_slot_leases') as leases, \
+                patch('uploader.boundedexecutor.get_admission_controller') as admission, \
+                patch.object(BoundedExecutor, 'run_queued_analysis', side_effect=OSError):
+            admission.return_value.reserve.return_value = True
+            admission.return_value.reservation.return_value = {}
+            BoundedExecutor.dispatch_queue()
+            leases.return_value.release.assert_called_once_with(self.first.analysis_id)
+            admission.return_value.release.assert_called_once_with(self.first.analysis_id)
+        self.assertFalse(AnalysisQueueEntry.objects.filter(dispatched=True).exists())
+
+class TestStatusCursor(TestCase):
+    def test_finish_moves_cursor(self):
+        """
+        Test that finishing an analysis moves the progress cursor, other field writes don't.
+        """
+        analysis = FirmwareAnalysis.objects.create()
+        cursor = analysis.status_updated
+        analysis.save(update_fields=['hidden'])
+        self.assertEqual(FirmwareAnalysis.objects.get(id=analysis.id).status_updated, cursor)
+        analysis.finished = True
+        analysis.save(update_fields=['finished'])
+        self.assertGreater(FirmwareAnalysis.objects.get(id=analysis.id).status_updated, cursor)
+
+
+class TestRecovery(TestCase):
+    def setUp(self):
+        self.analysis = FirmwareAnalysis.objects.create()
+        self.log_dir = f"{settings.EMBA_LOG_ROOT}/{self.analysis.id}"
+        os.makedirs(self.log_dir, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_adoption_marker(self):
+        self.assertTrue(BoundedExecutor._claim_adoption(self.analysis.id))    # pylint: disable=protected-access
+        # already supervised by this (living) process
+        self.assertFalse(BoundedExecutor._claim_adoption(self.analysis.id))   # pylint: disable=protected-access
+        BoundedExecutor._release_adoption(self.analysis.id)     # pylint: disable=protected-access
+        self.assertTrue(BoundedExecutor._claim_adoption(self.analysis.id))    # pylint: disable=protected-access
+        # the pid of the owner belongs to a process that started later (reused pid)
+        with open(f"{self.log_dir}/emba_run.adopted", "w", encoding="utf-8") as marker_file:
+            marker_file.write(f"{os.getpid()} 1.0")
+        self.assertTrue(BoundedExecutor._claim_adoption(self.analysis.id))    # pylint: disable=protected-access
+
+    def test_emba_process_lookup(self):
+        # stands in for the emba shell, the command line contains the analysis id like the emba log path does
+        with subprocess.Popen(f"sleep 30; echo {self.analysis.id}", shell=True, start_new_session=True) as proc:   # nosec
+            with open(f"{self.log_dir}/emba_run.pid", "w", encoding="utf-8") as pid_file:
+                pid_file.write(str(proc.pid))
+            self.assertEqual(BoundedExecutor.get_emba_process(self.analysis).pid, proc.pid)
+            proc.kill()
+            proc.wait()
+        self.assertIsNone(BoundedExecutor.get_emba_process(self.analysis))
+        # pid of an unrelated process
+        self.analysis.pid = os.getpid()
+        os.remove(f"{self.log_dir}/emba_run.pid")
+        self.assertIsNone(BoundedExecutor.get_emba_process(self.analysis))
+
+
+class TestAdmission(TestCase):
+    def test_profile_estimate(self):
+        """
+        Test that the estimate follows the scan flags and learns from runs exceeding the profile floor.
+        """
+        sbom = FirmwareAnalysis.objects.create(sbom_only_test=True)
+        emulation = FirmwareAnalysis.objects.create(system_emulation_test=True)
+        self.assertEqual(analysis_profile(sbom), PROFILE_SBOM)
+        self.assertEqual(analysis_profile(emulation), PROFILE_SYSTEM_EMULATION)
+        self.assertEqual(estimate_cost(sbom), PROFILE_COSTS[PROFILE_SBOM])
+        self.assertLess(estimate_cost(sbom).memory, estimate_cost(emulation).memory)
+
+        AnalysisResourceUsage.objects.create(analysis=FirmwareAnalysis.objects.create(), profile=PROFILE_SBOM, peak_memory=3 * GIB, mean_cpu=0.5, disk_usage=0)
+        cost = estimate_cost(sbom)
+        self.assertEqual(cost.memory, 3 * GIB)
+        self.assertEqual(cost.cpu, PROFILE_COSTS[PROFILE_SBOM].cpu)
+
+    def test_idle_host_admits(self):
+        """
+        Test that an idle host admits one analysis even if it exceeds the ceilings.
+        """
+        controller = AdmissionController()
+        first = FirmwareAnalysis.objects.create(system_emulation_test=True)
+        second = FirmwareAnalysis.objects.create(system_emulation_test=True)
+        with patch.object(controller, 'fits', return_value=False):
+            self.assertTrue(controller.reserve(first))
+            self.assertFalse(controller.reserve(second))
+            controller.release(first.id)
+            self.assertTrue(controller.reserve(second))
+
+    def test_shared_reservations(self):
+        """
+        Test that analyses dispatched by other processes count for the admission of this one.
+        """
+        controller = AdmissionController()
+        other = FirmwareAnalysis.objects.create()
+        AnalysisQueueEntry.objects.create(analysis=other, emba_cmd="true", dispatched=True, reserved_cpu=2, reserved_memory=GIB, reserved_disk=GIB)
+        AnalysisQueueEntry.objects.create(analysis=FirmwareAnalysis.objects.create(), emba_cmd="true", reserved_cpu=8)
+        self.assertEqual(controller.outstanding().cpu, 2)
+        self.assertEqual(controller.outstanding().memory, GIB)
+
+        analysis = FirmwareAnalysis.objects.create(system_emulation_test=True)
+        with patch.object(controller, 'fits', return_value=False):
+            self.assertFalse(controller.reserve(analysis))
+            AnalysisQueueEntry.objects.filter(analysis=other).delete()
+            self.assertTrue(controller.reserve(analysis))
+        reservation = controller.reservation(analysis.id)
+        self.assertEqual(reservation['reserved_memory'], estimate_cost(analysis).memory)
+
+    def test_fits_cached_readings(self):
+        """
+        Test that the admission check only uses the readings cached by the sampler.
+        """
+        controller = AdmissionController()
+        analysis = FirmwareAnalysis.objects.create(sbom_only_test=True)
+        controller.reserve(analysis, force=True)
+        controller.running[str(analysis.id)].disk_usage = 10 * GIB
+        controller.reading = (0.0, 0, 1000 * GIB, 1000 * GIB)
+        with patch.object(controller, '_start_sampler'), patch('uploader.admission.get_size', side_effect=AssertionError), \
+                patch('psutil.cpu_percent', side_effect=AssertionError):
+            self.assertTrue(controller.fits(PROFILE_COSTS[PROFILE_SBOM]))
+
+
+class TestSupervisor(TestCase):
+    def test_launch(self):
+        """
+        Test that the supervisor loop starts a command and reports its return code.
+        """
+        with tempfile.TemporaryDirectory() as log_dir:
+            self.assertEqual(get_process_supervisor().launch("launch-true", "true", f"{log_dir}/true.log").result(timeout=10), 0)
+            self.assertEqual(get_process_supervisor().launch("launch-false", "false", f"{log_dir}/false.log").result(timeout=10), 1)
+        self.assertNotIn("launch-true", get_process_supervisor().groups)
+
+
+@override_settings(EMAIL_ACTIVE=True, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class TestNotification(TestCase):
+    def test_completion_mail(self):
+        """
+        Test that the notification task mails the result to the owner of the analysis.
+        """
+        user = User.objects.create(username='mailuser', email='mailuser@example.com')
+        analysis = FirmwareAnalysis.objects.create(user=user, finished=True)
+        send_analysis_notification.apply(args=[str(analysis.id)])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['mailuser@example.com'])
@@ -23,7 +23,8 @@ from rest_framework import serializers
 from embark.helper import disk_space_check, user_is_auth
 from uploader.executor import submit_firmware
 from uploader.forms import DeviceForm, DownloadFirmwareForm, FirmwareAnalysisForm, DeleteFirmwareForm, LabelForm, VendorForm
-from uploader.models import FirmwareFile
+from uploader.boundedexecutor import BoundedExecutor
+from uploader.models import AnalysisQueueEntry, FirmwareFile
 from uploader.serializers import FirmwareAnalysisSerializer
 from users.decorators import require_api_key
 
@@ -116,7 +117,14 @@ class UploaderView(APIView):
 
         try:
             analysis_id = start_analysis_serialized(query_dict)
-            return Response({'status': 'success', 'id': analysis_id}, status=201)
+            response_data = {'status': 'success', 'id': analysis_id}
+            queue_entry = AnalysisQueueEntry.objects.filter(analysis_id=analysis_id).first()
+            if queue_entry:
+                position = queue_entry.queue_position()
+                eta = BoundedExecutor.queue_eta(position)
+                response_data['queue_position'] = position
+                response_data['eta'] = eta.total_seconds() if eta is not None else None
+            return Response(response_data, status=201)
         except BufferFullException:
             return Response({'status': 'Error: Buffer full'}, status=503)
         except serializers.ValidationError as exception:
@@ -164,8 +164,8 @@ def _new_analysis_from(old_analysis: FirmwareAnalysis) -> FirmwareAnalysis:
     #   If they have been archived (old_analysis.archived=True), the archived logs (old_analysis.zip_file) will be deleted.
     # - We may want to set keep_parents=True in case the analysis is still referenced by a parent object.
     #   This is how it was previously done in dashboard/views::delete_analysis().
-    # - We don't need to worry about an unterminated LogReader.read_loop() since this only gets started for local analyses
-    #   via BoundedExecutor.submit() of LogReader.__init__() with the analysis ID.
+    # - We don't need to worry about an unterminated LogReader since the LogFollower drops it
+    #   once the analysis is deleted, finished or failed.
     # - Since we assume that the old analysis was running on an unreachable worker, we don't need to check
     #   if the analysis is still running (old_analysis.finished) but we do need to reset the worker once it becomes reachable again.
     # - We have to explicitly reset the worker once it reconnects because the monitoring task
@@ -441,7 +441,7 @@ def _fetch_analysis_logs(worker) -> None:
         logger.info("[Worker %s] Downloaded emba_run.log.", worker.id)
         worker.write_log(f"\nDownloaded emba_run.log.\n")
 
-        # Note: The LogReader.read_loop() will look for logfiles in <analysis.path_to_logs>/emba.log
+        # Note: The LogFollower will look for logfiles in <analysis.path_to_logs>/emba.log
         #       where path_to_logs will be set to settings.EMBA_LOG_ROOT/<analysis.id>/emba_logs/
         unzip_cmd = ["7z", "x", "-y", local_zip_path, f"-o{local_log_dir}/"]
         subprocess.run(unzip_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True)  # nosec
@@ -39,6 +39,8 @@ STRICT_MODE=0
 EMBARK_BASEDIR="$(realpath "$(dirname "${0}")")"
 
 CELERY_PID=0
+# running EMBA analyses survive a restart and get adopted again, -k stops them on shutdown
+KILL_ANALYSES=0
 PIPENV_CHANGED=0
 
 import_helper()
@@ -62,12 +64,14 @@ cleaner() {
   # stops ALL emba processes started from within embark that were not killed successfully
   # timeout 30s pkill -u root -f "embark/emba/emba"
   local PID_FILES=()
-  mapfile -d '' PID_FILES < <(find "${EMBA_LOG_ROOT:-emba_logs}" -type f -name "emba_run.pid" -print0 2> /dev/null)
+  if [[ ${KILL_ANALYSES} -eq 1 ]]; then
+    mapfile -d '' PID_FILES < <(find "${EMBA_LOG_ROOT:-emba_logs}" -type f -name "emba_run.pid" -print0 2> /dev/null)
+  fi
 
   if [[ ${#PID_FILES[@]} -ne 0 ]]; then
     for FILE in "${PID_FILES[@]}"; do
-      echo -e "${RED}""${BOLD}""Making sure the EMBA process with PID ""$(cat "${FILE}")"" from ""${FILE}"" is stopped""${NC}"
-      timeout 3s pkill -F "${FILE}"
+      echo -e "${RED}""${BOLD}""Making sure the EMBA process group with PID ""$(cat "${FILE}")"" from ""${FILE}"" is stopped""${NC}"
+      timeout 3s pkill -g "$(cat "${FILE}")"
     done
   fi
 
@@ -93,7 +97,7 @@ cleaner() {
 # main
 echo -e "\\n${ORANGE}""${BOLD}""EMBArk Startup""${NC}\\n""${BOLD}=================================================================${NC}"
 
-while getopts "ha:b:i:" OPT ; do
+while getopts "ha:b:i:k" OPT ; do
   case ${OPT} in
     h)
       echo -e "\\n""${CYAN}""USAGE""${NC}"
@@ -101,6 +105,7 @@ while getopts "ha:b:i:" OPT ; do
       echo -e "${CYAN}-a <IP/Name>${NC} Add a server Virtualhost alias"
       echo -e "${CYAN}-b <IP/Range>${NC} Add a ipv4 to access the admin pages from"
       echo -e "${CYAN}-i <IP>${NC} specify the ipv4 to host the server on (default=0.0.0.0)"
+      echo -e "${CYAN}-k${NC}           Stop running EMBA analyses on shutdown (default: they keep running and are adopted after the restart)"
       echo -e "---------------------------------------------------------------------------"
       if ip addr show eth0 &>/dev/null ; then
         IP=$(ip addr show eth0 | grep "inet\b" | awk '{print $2}' | cut -d/ -f1)
@@ -125,8 +130,11 @@ while getopts "ha:b:i:" OPT ; do
       BIND_IP="${OPTARG}"
       echo -e "${GREEN} Bind IP set to: ${BIND_IP}""${NC}"
       ;;
+    k)
+      KILL_ANALYSES=1
+      ;;
     :)
-      echo -e "${CYAN} Usage: [-a <IP/HOSTNAME>] [-b <IP/Range>] [-i <IP>] ${NC}"
+      echo -e "${CYAN} Usage: [-a <IP/HOSTNAME>] [-b <IP/Range>] [-i <IP>] [-k] ${NC}"
       exit 1
       ;;
     *)
@@ -325,6 +333,13 @@ fi
   echo -e "  Require wsgi-group Administration_Group"
   echo -e "</IfVersion>"
   echo -e "</Location>"
+  echo -e ""
+  # report files and log zips are sent by apache if mod_xsendfile is available (EMBARK_SENDFILE=x-sendfile)
+  echo -e "<IfModule mod_xsendfile.c>"
+  echo -e "  XSendFile On"
+  echo -e "  XSendFilePath /var/www/emba_logs"
+  echo -e "  XSendFilePath /var/www/media"
+  echo -e "</IfModule>"
   # echo -e "<Directory /var/www/embark/embark>"
   # echo -e "  <Files wsgi_auth.py>"
   # echo -e "    Require all granted"
@@ -398,6 +413,7 @@ echo -e "\n[""${BLUE} JOB""${NC}""] Starting Apache"
 --url-alias /media/ /var/www/media/ \
 --allow-localhost --working-directory /var/www/embark/ --server-root /var/www/httpd80/ \
 --include-file /var/www/conf/embark.conf \
+--enable-sendfile \
 --processes 4 --threads 4 \
 --graceful-timeout 5 \
 --log-level debug \